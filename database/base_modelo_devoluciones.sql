@@ -1,8 +1,42 @@
+CREATE TABLE IF NOT EXISTS base_modelo_devoluciones (
+    -- Identificadores (solo para merges y cálculos)
+    item_id             TEXT PRIMARY KEY,
+    ticket_id           TEXT,
+    customer_id         TEXT,
+    id_producto         TEXT,
+    sku                 TEXT,
+-- Datos de la venta
+    canal               TEXT,
+    store_id            TEXT,
+    provincia_tienda    TEXT,
+    fecha_compra        TIMESTAMP,
+    descuento           REAL,
+    precio_neto         REAL,
+    coste_bruto         REAL,
+    margen              REAL,
+    promotion_id        TEXT,
+    devuelto            INTEGER,
+-- Datos del cliente
+    provincia_cliente   TEXT,
+    comunidad           TEXT,
+    fecha_primer_compra TIMESTAMP,
+    fecha_ultima_compra TIMESTAMP,
+    n_pedidos           INTEGER,
+    n_items_comprados   INTEGER,
+    anio_nacimiento     INTEGER,
+    edad_alta           INTEGER,
+-- Datos físicos del cliente
+    altura_cm           REAL,
+    peso_kg             REAL,
+-- Datos del producto
+    categoria           TEXT,
+    color               TEXT,
+    talla               TEXT
+);
 
-DROP TABLE IF EXISTS base_modelo_devoluciones;
-
-
-CREATE TABLE base_modelo_devoluciones AS
+-- Solo los items que aún no están (re-ejecutable). En el refresco incremental de
+-- cargador_sqlite, items_6 es una vista TEMP con los items posteriores a la marca de agua
+INSERT INTO base_modelo_devoluciones
 SELECT
     -- Identificadores (solo para merges y cálculos)
     i.item_id,
@@ -38,4 +72,5 @@ SELECT
     i.color,
     i.talla
 FROM items_6 i
-LEFT JOIN clientes c ON i.customer_id = c.customer_id;
+LEFT JOIN clientes c ON i.customer_id = c.customer_id
+WHERE NOT EXISTS (SELECT 1 FROM base_modelo_devoluciones b WHERE b.item_id = CAST(i.item_id AS TEXT));
@@ -1,6 +1,22 @@
-DROP TABLE IF EXISTS dataset_modelo_a_tallas;
+CREATE TABLE IF NOT EXISTS dataset_modelo_a_tallas (
+    item_id     TEXT PRIMARY KEY,
+    ticket_id   TEXT,
+    customer_id TEXT,
+    canal       TEXT,
+    sku         TEXT,
+    id_producto TEXT,
+    categoria   TEXT,
+    talla       TEXT,
+    altura_cm   REAL,
+    peso_kg     REAL,
+    bmi         REAL,
+    fecha_item  TEXT,
+    devuelto    INTEGER
+);
 
-CREATE TABLE dataset_modelo_a_tallas AS
+-- Solo los items que aún no están (re-ejecutable). En el refresco incremental de
+-- cargador_sqlite, items_6 es una vista TEMP con los items posteriores a la marca de agua
+INSERT INTO dataset_modelo_a_tallas
 SELECT
     CAST(i.item_id     AS TEXT)  AS item_id,
     CAST(i.ticket_id   AS TEXT)  AS ticket_id,
@@ -25,4 +41,5 @@ WHERE
     AND i.altura_cm IS NOT NULL
     AND i.peso_kg IS NOT NULL
     AND i.altura_cm BETWEEN 120 AND 230
-    AND i.peso_kg  BETWEEN 30  AND 250;
+    AND i.peso_kg  BETWEEN 30  AND 250
+    AND NOT EXISTS (SELECT 1 FROM dataset_modelo_a_tallas d WHERE d.item_id = CAST(i.item_id AS TEXT));
@@ -0,0 +1,185 @@
+# ajuste_mix.py
+# Autor: proyecto "ropa"
+# Objetivo: ajustar el mix de categorías por grupo (ym, canal, zona) con swaps puros de bundles:
+#   - Grupos y categorías como códigos enteros; conteos (grupo × categoría) con np.bincount
+#   - Mix objetivo, capping y objetivos enteros (resto mayor) para todos los grupos a la vez
+#   - Calendario del catálogo como bitmap (producto × mes) precalculado: se reconstruye
+#     en cada llamada, así que basta con volver a ejecutar si cambia productos.csv
+#   - Swaps entre grupos del mismo bloque (canal, zona), por lotes, acumulados en una
+#     permutación de filas que se aplica al final (ver refuerzo_cooc.aplicar_permutacion)
+
+from __future__ import annotations
+from typing import Callable, Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 0) Parámetros
+
+CAP_ABS_PP = 8.0   # max ±8pp por categoría en un grupo
+CAP_REL    = 0.35  # max ±35% relativo vs mix original
+MAX_SWAPS_POR_GRUPO = 40_000
+
+# P0 (G × K), mes de cada grupo (G), categorías (K) → mix objetivo (G × K)
+FuncionObjetivo = Callable[[np.ndarray, np.ndarray, Sequence[str]], np.ndarray]
+
+
+# 1) Mix objetivo en forma matricial (una fila por grupo)
+
+def conteos_grupo(grupo: np.ndarray, cat: np.ndarray, G: int, K: int) -> np.ndarray:
+    """C[g, c] = filas del grupo g con categoría c."""
+    return np.bincount(grupo.astype(np.int64) * K + cat, minlength=G * K).reshape(G, K)
+
+def renormalizar(Q: np.ndarray) -> np.ndarray:
+    """Recorta negativos y divide por la suma original; filas con suma <= 0 → uniforme."""
+    s = Q.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.maximum(Q, 0.0) / s
+    return np.where(s > 0, out, 1.0 / Q.shape[1])
+
+def aplicar_deltas_pp(Q: np.ndarray,
+                      filas: np.ndarray,
+                      deltas_pp: Mapping[str, float],
+                      cats: Sequence[str]) -> np.ndarray:
+    """Suma `deltas_pp` (puntos porcentuales) en las filas marcadas; categorías ausentes se ignoran."""
+    Q = Q.copy()
+    pos = {c: i for i, c in enumerate(cats)}
+    for c, dv in deltas_pp.items():
+        if c in pos:
+            Q[filas, pos[c]] += dv / 100.0
+    return Q
+
+def cap_cambios(P0: np.ndarray, Q: np.ndarray, cap_abs_pp: float, cap_rel: float) -> np.ndarray:
+    """Limita Q a ±cap_rel relativo y ±cap_abs_pp absoluto respecto a P0, y renormaliza."""
+    low = np.maximum(np.maximum(0.0, P0 * (1 - cap_rel)), np.maximum(0.0, P0 - cap_abs_pp / 100.0))
+    high = np.minimum(np.minimum(1.0, P0 * (1 + cap_rel)), np.minimum(1.0, P0 + cap_abs_pp / 100.0))
+    return renormalizar(np.minimum(np.maximum(Q, low), high))
+
+def objetivos_resto_mayor(Q: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """
+    Objetivos enteros por grupo (suman n): suelo de Q·n y el resto a las mayores partes
+    fraccionarias; empates por orden de categoría.
+    """
+    raw = Q * n[:, None]
+    suelos = np.floor(raw).astype(np.int64)
+    resto = n - suelos.sum(axis=1)
+    K = Q.shape[1]
+    rango = np.argsort(np.argsort(-(raw - suelos), axis=1, kind="stable"), axis=1, kind="stable")
+    return suelos + resto[:, None] // K + (rango < (resto % K)[:, None])
+
+
+# 2) Calendario
+
+def bitmap_calendario(ym_inicio: np.ndarray, ym_fin: np.ndarray, meses: np.ndarray) -> np.ndarray:
+    """activo[p, m] = el producto p está a la venta en meses[m] (YYYYMM)."""
+    return (ym_inicio[:, None] <= meses[None, :]) & (meses[None, :] <= ym_fin[:, None])
+
+
+# 3) Ajuste
+
+def ajustar_mix(df: pd.DataFrame,
+                catalogo: pd.DataFrame,
+                objetivo: FuncionObjetivo,
+                *,
+                mes_col: str = "_ym",
+                bloque_cols: Sequence[str] = ("_canal", "_zona"),
+                cat_col: str = "_cat_norm",
+                prod_col: str = "id_producto",
+                cap_abs_pp: float = CAP_ABS_PP,
+                cap_rel: float = CAP_REL,
+                max_swaps_por_grupo: int = MAX_SWAPS_POR_GRUPO,
+                semilla: int = 42) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Lleva el mix de cada grupo (mes, bloque) hacia objetivo(P0) con capping, moviendo
+    bundles entre grupos del mismo bloque. Un swap (i ∈ g, j ∈ g2) solo es válido si el
+    producto de i está activo en el mes de g2 y el de j en el de g (bitmap del catálogo,
+    columnas id_producto, ym_start, ym_end). No modifica `df`: devuelve la permutación de
+    filas (fila i ← fila perm[i]) y un resumen por grupo (n, deficit0, deficit1, swaps).
+    """
+    rng = np.random.default_rng(semilla)
+    claves = [mes_col, *bloque_cols]
+    cats = sorted(df[cat_col].unique().tolist())
+    K = len(cats)
+    cat = pd.Categorical(df[cat_col], categories=cats).codes.astype(np.int64)
+
+    gb = df.groupby(claves, sort=True)
+    grupo = gb.ngroup().to_numpy()
+    valores = gb.size().index.to_frame(index=False)
+    G = len(valores)
+    mes_g = valores[mes_col].to_numpy(dtype=np.int64)
+    bloque_g = valores.groupby(list(bloque_cols), sort=True).ngroup().to_numpy()
+
+    # calendario: producto × mes (solo los meses que aparecen en los grupos)
+    meses = np.unique(mes_g)
+    m_idx_g = np.searchsorted(meses, mes_g)
+    cal = catalogo.drop_duplicates("id_producto").set_index("id_producto")
+    prod = pd.Index(cal.index).get_indexer(df[prod_col].astype(str).str.strip())
+    if (prod < 0).any():
+        raise ValueError("Hay id_producto en los items que no están en el catálogo")
+    activo = bitmap_calendario(cal["ym_start"].to_numpy(np.int64), cal["ym_end"].to_numpy(np.int64), meses)
+
+    # objetivos para todos los grupos a la vez
+    C = conteos_grupo(grupo, cat, G, K)
+    n = C.sum(axis=1)
+    P0 = C / np.maximum(n, 1)[:, None]
+    Q = cap_cambios(P0, objetivo(P0, mes_g % 100, cats), cap_abs_pp, cap_rel)
+    T = objetivos_resto_mayor(Q, n)
+    D = np.maximum(T - C, 0)
+    S = np.maximum(C - T, 0)
+    deficit0 = D.sum(axis=1)
+
+    orden = np.argsort(grupo, kind="stable")
+    inicio = np.searchsorted(grupo[orden], np.arange(G + 1))
+    perm = np.arange(len(df))
+    swaps_g = np.zeros(G, dtype=np.int64)
+
+    for g in range(G):  # orden (mes, bloque) → dentro de cada bloque, meses en orden
+        mismos = np.flatnonzero((bloque_g == bloque_g[g]) & (np.arange(G) != g))
+        filas_g = orden[inicio[g]:inicio[g + 1]]
+        while swaps_g[g] < max_swaps_por_grupo and D[g].sum() > 0:
+            dar = np.flatnonzero(S[g] > 0)
+            if len(dar) == 0:
+                break
+            b = int(rng.choice(np.flatnonzero(D[g] > 0)))  # categoría que falta en g
+            a = int(rng.choice(dar))                         # categoría que sobra en g
+            donantes = mismos[S[mismos, b] > 0]
+            if len(donantes) == 0:
+                D[g, b] = 0
+                continue
+
+            # unidades a mover, repartidas al azar entre donantes (como swaps sueltos)
+            q = int(min(D[g, b], S[g, a], max_swaps_por_grupo - swaps_g[g]))
+            reparto = np.bincount(rng.integers(0, len(donantes), q), minlength=len(donantes))
+            movidas = 0
+            for g2, q2 in zip(donantes.tolist(), np.minimum(reparto, S[donantes, b]).tolist()):
+                if q2 == 0:
+                    continue
+                filas_g2 = orden[inicio[g2]:inicio[g2 + 1]]
+                ci = filas_g[(cat[filas_g] == a) & activo[prod[filas_g], m_idx_g[g2]]]
+                cj = filas_g2[(cat[filas_g2] == b) & activo[prod[filas_g2], m_idx_g[g]]]
+                q2 = min(q2, len(ci), len(cj))
+                if q2 == 0:
+                    continue
+                i = rng.choice(ci, size=q2, replace=False)
+                j = rng.choice(cj, size=q2, replace=False)
+                perm[i], perm[j] = perm[j], perm[i]
+                cat[i], cat[j] = b, a
+                prod[i], prod[j] = prod[j], prod[i]
+                S[g2, b] -= q2
+                D[g2, a] = max(0, D[g2, a] - q2)
+                movidas += q2
+
+            if movidas == 0:
+                D[g, b] = 0
+                continue
+            D[g, b] -= movidas
+            S[g, a] -= movidas
+            swaps_g[g] += movidas
+
+    resumen = valores.copy()
+    resumen["n"] = n
+    resumen["deficit0"] = deficit0
+    resumen["deficit1"] = D.sum(axis=1)
+    resumen["swaps"] = swaps_g
+    return perm, resumen
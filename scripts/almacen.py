@@ -0,0 +1,319 @@
+# almacen.py
+# Autor: proyecto "ropa"
+# Objetivo: capa de almacenamiento única para las etapas items_1 … items_6:
+#   - Parquet tipado (diccionario + zstd) particionado por año-mes de fecha_item
+#   - Lectura por columnas y con filtros empujados a Parquet (particiones + row groups)
+#   - Orden de filas preservado entre escritura y lectura (también si la etapa se escribe
+#     por partes desde varios procesos: un fichero por parte, cada fila con su posición global)
+#   - Volcado a SQLite solo bajo demanda (scripts de database/*.sql), y solo si cambió
+#   - Compatibilidad: si una etapa no existe en Parquet se lee su CSV histórico
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+import json, os, shutil, time, uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cargador_sqlite import cargar_tabla, conectar
+
+
+# 0) Rutas y etapas
+
+ROOT_DIR  = Path(__file__).resolve().parent.parent
+DATA_DIR  = Path(os.environ.get("ROPA_DATA_DIR", ROOT_DIR / "data"))
+ITEMS_DIR = DATA_DIR / "items"
+SQLITE_DB = ROOT_DIR / "database" / "mi_base.db"
+
+# etapa → CSV histórico (se mantiene como nombre de exportación y como fallback de lectura)
+ETAPAS_ITEMS: Dict[str, str] = {
+    "items_1":   "items_venta.csv",
+    "items_mix": "items_venta_ajustado.csv",
+    "items_2":   "items_venta_cooc.csv",
+    "items_3":   "items_tallas_ajustadas.csv",
+    "items_4":   "items_colores_ajustados.csv",
+    "items_5":   "items_altura_peso_ajustados.csv",
+    "items_6":   "items_devoluciones_ajustadas.csv",
+}
+
+DATE_COL   = "fecha_item"
+PART_COL   = "ym"       # partición hive: ym=YYYYMM
+ORDEN_COL  = "_fila"    # posición original de la fila
+MANIFIESTO = "_manifest.json"
+META_SQLITE = "_almacen"  # tabla de control en SQLite (etapa → firma volcada)
+
+COMPRESION = "zstd"
+ROW_GROUP  = 128_000
+
+
+# 1) Utilidades internas
+
+def _dir_etapa(etapa: str) -> Path:
+    return ITEMS_DIR / etapa
+
+def _leer_manifiesto(etapa: str) -> Optional[dict]:
+    try:
+        with open(_dir_etapa(etapa) / MANIFIESTO, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+def _ym_de_fechas(s: pd.Series) -> np.ndarray:
+    dt = pd.to_datetime(s, errors="coerce")
+    ym = (dt.dt.year * 100 + dt.dt.month).fillna(0)
+    return ym.to_numpy(dtype=np.int32)  # 0 = fecha inválida
+
+def _a_arrow(df: pd.DataFrame) -> pa.Table:
+    """DataFrame → Arrow; columnas object con tipos mezclados se pasan a texto (como en CSV)."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for c in df.columns[df.dtypes == object]:
+            if pd.api.types.infer_dtype(df[c], skipna=True) not in ("string", "empty"):
+                df[c] = df[c].where(df[c].isna(), df[c].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+def _sin_internas(df: pd.DataFrame) -> pd.DataFrame:
+    """Quita _fila y ym si ya vienen en df (p. ej. releído y guardado de nuevo): se recalculan al escribir."""
+    internas = [c for c in (ORDEN_COL, PART_COL) if c in df.columns]
+    return df.drop(columns=internas) if internas else df
+
+def _ym_filtro(desde: Optional[Union[int, str]], hasta: Optional[Union[int, str]]) -> List[Tuple]:
+    f = []
+    if desde is not None:
+        f.append((PART_COL, ">=", int(str(desde).replace("-", "")[:6])))
+    if hasta is not None:
+        f.append((PART_COL, "<=", int(str(hasta).replace("-", "")[:6])))
+    return f
+
+
+# 2) Escritura
+
+def directorio_temporal(etapa: str) -> Path:
+    """Directorio donde se escriben las partes de una etapa antes de publicarla."""
+    return _dir_etapa(etapa).with_name(f".{etapa}.{uuid.uuid4().hex[:8]}")
+
+def escribir_parte_items(df: pd.DataFrame,
+                         directorio: Path,
+                         filas: np.ndarray,
+                         *,
+                         parte: int = 0,
+                         esquema: Optional[pa.Schema] = None) -> int:
+    """
+    Escribe un trozo de la etapa como un único fichero parte-NNNNN.parquet en `directorio`
+    (ver directorio_temporal). `filas` es la posición global de cada fila (orden de lectura).
+    Procesos distintos pueden escribir partes distintas a la vez; `esquema` fija los tipos
+    para que todas coincidan. ym va como columna y el fichero ordenado por ym: los filtros
+    desde/hasta podan por estadísticas de row group en vez de por directorio.
+    """
+    if len(df) == 0:
+        return 0
+    df = _sin_internas(df)
+    tabla = _a_arrow(df)
+    if esquema is not None:
+        tabla = tabla.select(esquema.names).cast(esquema)
+    tabla = tabla.append_column(ORDEN_COL, pa.array(np.asarray(filas, dtype=np.int64)))
+    if DATE_COL in df.columns:
+        tabla = tabla.append_column(PART_COL, pa.array(_ym_de_fechas(df[DATE_COL])))
+        tabla = tabla.sort_by([(PART_COL, "ascending"), (ORDEN_COL, "ascending")])
+
+    directorio.mkdir(parents=True, exist_ok=True)
+    pq.write_table(
+        tabla, directorio / f"parte-{parte:05d}.parquet",
+        compression=COMPRESION,
+        use_dictionary=True,
+        row_group_size=ROW_GROUP,
+    )
+    return int(len(df))
+
+def publicar_items(directorio: Path, etapa: str, columnas: Sequence[str], filas: int) -> Path:
+    """Escribe el manifiesto e intercambia `directorio` por la etapa publicada (atómico por etapa)."""
+    destino = _dir_etapa(etapa)
+    directorio.mkdir(parents=True, exist_ok=True)
+    manifiesto = {
+        "etapa": etapa,
+        "filas": int(filas),
+        "columnas": [str(c) for c in columnas],
+        "particion": [PART_COL] if DATE_COL in columnas else None,
+        "firma": uuid.uuid4().hex,
+        "escrito": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(directorio / MANIFIESTO, "w", encoding="utf-8") as fh:
+        json.dump(manifiesto, fh, ensure_ascii=False, indent=1)
+
+    if destino.exists():
+        viejo = destino.with_name(f".{etapa}.old")
+        shutil.rmtree(viejo, ignore_errors=True)
+        os.replace(destino, viejo)
+        os.replace(directorio, destino)
+        shutil.rmtree(viejo, ignore_errors=True)
+    else:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(directorio, destino)
+    return destino
+
+def guardar_items(df: pd.DataFrame, etapa: str, *, exportar_csv: bool = False) -> Path:
+    """
+    Escribe la etapa como dataset Parquet particionado por año-mes (ym=YYYYMM).
+    La escritura va a un directorio temporal y se intercambia al final (atómica por etapa).
+    `exportar_csv=True` deja además el CSV histórico (para consumo externo).
+    """
+    tmp = directorio_temporal(etapa)
+
+    df = _sin_internas(df)
+    tabla = _a_arrow(df)
+    tabla = tabla.append_column(ORDEN_COL, pa.array(np.arange(len(df), dtype=np.int64)))
+    if DATE_COL in df.columns:
+        tabla = tabla.append_column(PART_COL, pa.array(_ym_de_fechas(df[DATE_COL])))
+
+    pq.write_to_dataset(
+        tabla, tmp,
+        partition_cols=[PART_COL] if DATE_COL in df.columns else None,
+        compression=COMPRESION,
+        use_dictionary=True,
+        row_group_size=ROW_GROUP,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    destino = publicar_items(tmp, etapa, list(df.columns), len(df))
+
+    if exportar_csv:
+        df.to_csv(DATA_DIR / ETAPAS_ITEMS.get(etapa, f"{etapa}.csv"), index=False)
+    return destino
+
+
+# 3) Lectura
+
+def existe_items(etapa: str) -> bool:
+    return _leer_manifiesto(etapa) is not None
+
+def columnas_items(etapa: str) -> List[str]:
+    """Columnas de la etapa en su orden original (sin leer datos)."""
+    man = _leer_manifiesto(etapa)
+    if man is None:
+        return list(pd.read_csv(DATA_DIR / ETAPAS_ITEMS[etapa], nrows=0).columns)
+    return list(man["columnas"])
+
+def leer_items(etapa: str,
+               columnas: Optional[Sequence[str]] = None,
+               *,
+               desde: Optional[Union[int, str]] = None,
+               hasta: Optional[Union[int, str]] = None,
+               filtros: Optional[Iterable[Tuple]] = None,
+               tipos: Optional[Mapping[str, str]] = None) -> pd.DataFrame:
+    """
+    Lee una etapa con solo las columnas pedidas.
+    - desde/hasta: rango de año-mes (201901 o "2019-01"), poda particiones enteras
+    - filtros: predicados pyarrow [(col, op, valor), ...] evaluados dentro de Parquet
+    - tipos: dtypes pandas a aplicar tras la carga (equivalente a dtype= de read_csv)
+    Las filas se devuelven en el orden en que se escribieron.
+    """
+    man = _leer_manifiesto(etapa)
+    if man is None:
+        return _leer_csv_historico(etapa, columnas, desde, hasta, tipos)
+
+    cols = list(man["columnas"]) if columnas is None else list(columnas)
+    faltan = [c for c in cols if c not in man["columnas"]]
+    if faltan:
+        raise KeyError(f"{etapa}: columnas inexistentes {faltan}")
+
+    expr = None
+    preds = (_ym_filtro(desde, hasta) if man["particion"] else []) + list(filtros or [])
+    if preds:
+        expr = pq.filters_to_expression(preds)
+
+    dataset = ds.dataset(_dir_etapa(etapa), format="parquet", partitioning="hive")
+    tabla = dataset.to_table(columns=cols + [ORDEN_COL], filter=expr)
+    if len(tabla) and not pc.all(pc.greater_equal(
+            pc.pairwise_diff(tabla[ORDEN_COL].combine_chunks()), 0)).as_py():
+        tabla = tabla.sort_by(ORDEN_COL)
+    df = tabla.drop_columns([ORDEN_COL]).to_pandas()
+    if tipos:
+        df = df.astype({c: t for c, t in tipos.items() if c in df.columns})
+    return df
+
+def _leer_csv_historico(etapa: str,
+                        columnas: Optional[Sequence[str]],
+                        desde, hasta,
+                        tipos: Optional[Mapping[str, str]]) -> pd.DataFrame:
+    path = DATA_DIR / ETAPAS_ITEMS[etapa]
+    if not path.exists():
+        raise FileNotFoundError(f"{etapa}: no hay dataset Parquet ni CSV ({path})")
+    df = pd.read_csv(path, usecols=columnas, dtype=dict(tipos) if tipos else None, low_memory=False)
+    if (desde is not None or hasta is not None) and DATE_COL in df.columns:
+        ym = _ym_de_fechas(df[DATE_COL])
+        m = np.ones(len(df), dtype=bool)
+        for _, op, v in _ym_filtro(desde, hasta):
+            m &= (ym >= v) if op == ">=" else (ym <= v)
+        df = df.loc[m].reset_index(drop=True)
+    return df
+
+
+# 4) SQLite bajo demanda
+
+def materializar_sqlite(etapa: str,
+                        db_path: Union[str, Path] = SQLITE_DB,
+                        tabla: Optional[str] = None,
+                        forzar: bool = False) -> bool:
+    """
+    Vuelca la etapa a una tabla SQLite (por defecto con el mismo nombre) para los
+    scripts SQL. Solo reescribe si la firma del Parquet cambió desde el último volcado.
+    Devuelve True si se escribió.
+    """
+    tabla = tabla or etapa
+    man = _leer_manifiesto(etapa)
+    if man is None:
+        raise FileNotFoundError(f"{etapa}: no hay dataset Parquet que materializar")
+
+    con = conectar(db_path)
+    try:
+        con.execute(f"CREATE TABLE IF NOT EXISTS {META_SQLITE} (tabla TEXT PRIMARY KEY, etapa TEXT, firma TEXT)")
+        fila = con.execute(f"SELECT firma FROM {META_SQLITE} WHERE tabla = ?", (tabla,)).fetchone()
+        existe = con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabla,)).fetchone()
+        if not forzar and existe and fila and fila[0] == man["firma"]:
+            return False
+
+        cargar_tabla(leer_items(etapa), tabla, con)
+        con.execute(f"INSERT OR REPLACE INTO {META_SQLITE} (tabla, etapa, firma) VALUES (?, ?, ?)",
+                    (tabla, etapa, man["firma"]))
+        return True
+    finally:
+        con.close()
+
+
+# 5) Benchmark (CSV + to_sql vs Parquet)
+
+def benchmark_almacen(df: pd.DataFrame, etapa: str = "_bench") -> Dict[str, float]:
+    """Tiempos de ida y vuelta CSV vs Parquet para un DataFrame de items."""
+    out: Dict[str, float] = {}
+    csv_path = DATA_DIR / f"{etapa}.csv"
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+
+    t = time.perf_counter(); df.to_csv(csv_path, index=False); out["csv_escritura_s"] = time.perf_counter() - t
+    t = time.perf_counter(); pd.read_csv(csv_path, low_memory=False); out["csv_lectura_s"] = time.perf_counter() - t
+    out["csv_mb"] = csv_path.stat().st_size / 1e6
+    csv_path.unlink()
+
+    t = time.perf_counter(); guardar_items(df, etapa); out["parquet_escritura_s"] = time.perf_counter() - t
+    t = time.perf_counter(); leer_items(etapa); out["parquet_lectura_s"] = time.perf_counter() - t
+    if DATE_COL in df.columns and len(df):
+        ym = int(_ym_de_fechas(df[DATE_COL].iloc[[-1]])[0])
+        t = time.perf_counter(); leer_items(etapa, list(df.columns[:3]), desde=ym, hasta=ym)
+        out["parquet_lectura_mes_3cols_s"] = time.perf_counter() - t
+    out["parquet_mb"] = sum(p.stat().st_size for p in _dir_etapa(etapa).rglob("*.parquet")) / 1e6
+    shutil.rmtree(_dir_etapa(etapa), ignore_errors=True)
+    return out
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        etapa = next((a for a in sys.argv[1:] if not a.startswith("--")), "items_6")
+        df = leer_items(etapa)
+        for k, v in benchmark_almacen(df).items():
+            print(f"{k:>28}: {v:.3f}")
@@ -0,0 +1,219 @@
+# arboles_numpy.py
+# Autor: proyecto "ropa"
+# Objetivo: evaluar un booster de XGBoost (JSON guardado con save_model) solo con NumPy:
+#   - Árboles aplanados en matrices (árbol × nodo): feature, umbral, hijo izq/der, rama por
+#     defecto para ausentes y valor de hoja
+#   - Recorrido por niveles: todos los árboles y todas las filas avanzan un nivel a la vez
+#     (profundidad máxima iteraciones), las hojas apuntan a sí mismas
+#   - Mismo criterio que XGBoost: x < umbral en float32, NaN → default_left
+#   - Sin importar xgboost: útil para workers de scoring ligeros y lotes pequeños
+
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence, Union
+import json
+import time
+
+import numpy as np
+
+
+# 0) Parámetros
+
+FILAS_POR_BLOQUE = 128  # filas por bloque: las matrices filas × árboles caben en caché
+
+_OBJETIVOS_LOGISTICOS = {"binary:logistic", "reg:logistic", "binary:logitraw"}
+_OBJETIVOS_IDENTIDAD = {"reg:squarederror", "reg:linear", "reg:absoluteerror", "reg:pseudohubererror"}
+
+
+# 1) Bosque compilado
+
+@dataclass(frozen=True)
+class BosqueCompilado:
+    """
+    Árboles como matrices (T × N, N = máximo de nodos). Hojas: izq = der = el propio nodo,
+    así un recorrido de `profundidad` niveles deja cada fila en su hoja.
+    """
+    feature: np.ndarray       # int32, índice de columna (0 en hojas)
+    umbral: np.ndarray        # float32, ir a la izquierda si x < umbral
+    izq: np.ndarray           # int32
+    der: np.ndarray           # int32
+    defecto_izq: np.ndarray   # bool, rama para NaN
+    valor: np.ndarray         # float32, valor de hoja (0 en nodos internos)
+    profundidad: int
+    margen_base: float
+    objetivo: str
+    n_features: int
+
+    @property
+    def n_arboles(self) -> int:
+        return int(self.feature.shape[0])
+
+    def margen(self, X) -> np.ndarray:
+        """Margen (suma de hojas + base) por fila; X denso (NaN = ausente) o CSR (ausente = no almacenado)."""
+        X = matriz_densa(X, self.n_features)
+        out = np.empty(len(X), dtype=np.float64)
+        for a in range(0, len(X), FILAS_POR_BLOQUE):
+            out[a:a + FILAS_POR_BLOQUE] = self._margen_bloque(X[a:a + FILAS_POR_BLOQUE])
+        return out
+
+    def predecir(self, X) -> np.ndarray:
+        """Igual que booster.predict(DMatrix(X), iteration_range=(0, n_arboles)) (float32)."""
+        m = self.margen(X)
+        if self.objetivo in _OBJETIVOS_LOGISTICOS and self.objetivo != "binary:logitraw":
+            return (1.0 / (1.0 + np.exp(-m))).astype(np.float32)
+        return m.astype(np.float32)
+
+    def _margen_bloque(self, X: np.ndarray) -> np.ndarray:
+        B, T, N = len(X), self.n_arboles, self.feature.shape[1]
+        base = (np.arange(T, dtype=np.int64) * N)[None, :]       # desplazamiento de cada árbol
+        filas = (np.arange(B, dtype=np.int64) * X.shape[1])[:, None]
+        feature, umbral = self.feature.ravel(), self.umbral.ravel()
+        izq, der, defecto = self.izq.ravel(), self.der.ravel(), self.defecto_izq.ravel()
+        Xf = X.ravel()
+
+        nodo = np.zeros((B, T), dtype=np.int64)
+        for _ in range(self.profundidad):
+            k = base + nodo
+            x = Xf[filas + feature[k]]
+            ir_izq = np.where(np.isnan(x), defecto[k], x < umbral[k])
+            nodo = np.where(ir_izq, izq[k], der[k])
+        return self.valor.ravel()[base + nodo].sum(axis=1, dtype=np.float64) + self.margen_base
+
+
+# 2) Carga
+
+def _escalar(valor) -> float:
+    """base_score guardado como '0.5' o '[5E-1]' según la versión de XGBoost."""
+    return float(str(valor).strip("[]"))
+
+def cargar_bosque(path: Union[str, Path], iteraciones: Optional[int] = None) -> BosqueCompilado:
+    """
+    Compila el JSON de booster.save_model. `iteraciones`: nº de rondas a usar (como
+    iteration_range=(0, iteraciones)); None → best_iteration + 1 si el modelo lo guarda,
+    si no todas.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        modelo = json.load(fh)
+    learner = modelo["learner"]
+    objetivo = learner["objective"]["name"]
+    if objetivo not in _OBJETIVOS_LOGISTICOS | _OBJETIVOS_IDENTIDAD:
+        raise ValueError(f"Objetivo no soportado: {objetivo}")
+    param = learner["learner_model_param"]
+    if int(param.get("num_class", 0)) > 1 or int(param.get("num_target", 1)) > 1:
+        raise ValueError("Solo modelos de una salida (binario o regresión)")
+
+    gb = learner["gradient_booster"]
+    if gb["name"] != "gbtree":
+        raise ValueError(f"Booster no soportado: {gb['name']}")
+    arboles = gb["model"]["trees"]
+    indptr = gb["model"].get("iteration_indptr") or list(range(len(arboles) + 1))
+    if iteraciones is None:
+        best = learner.get("attributes", {}).get("best_iteration")
+        iteraciones = int(best) + 1 if best is not None else len(indptr) - 1
+    arboles = arboles[:indptr[min(int(iteraciones), len(indptr) - 1)]]
+
+    T = len(arboles)
+    N = max(int(a["tree_param"]["num_nodes"]) for a in arboles) if T else 1
+    feature = np.zeros((T, N), dtype=np.int32)
+    umbral = np.zeros((T, N), dtype=np.float32)
+    izq = np.tile(np.arange(N, dtype=np.int32), (T, 1))
+    der = izq.copy()
+    defecto = np.zeros((T, N), dtype=bool)
+    valor = np.zeros((T, N), dtype=np.float32)
+    profundidad = 0
+
+    for t, a in enumerate(arboles):
+        if any(a.get("split_type", [])):
+            raise ValueError("Splits categóricos no soportados")
+        n = int(a["tree_param"]["num_nodes"])
+        L = np.asarray(a["left_children"], dtype=np.int32)
+        R = np.asarray(a["right_children"], dtype=np.int32)
+        cond = np.asarray(a["split_conditions"], dtype=np.float32)
+        hoja = L == -1
+        feature[t, :n] = np.where(hoja, 0, a["split_indices"])
+        umbral[t, :n] = np.where(hoja, 0, cond)
+        izq[t, :n] = np.where(hoja, np.arange(n), L)
+        der[t, :n] = np.where(hoja, np.arange(n), R)
+        defecto[t, :n] = np.asarray(a["default_left"], dtype=bool)
+        valor[t, :n] = np.where(hoja, cond, 0)
+
+        # profundidad: nivel de cada nodo a partir de parents (padre siempre antes que hijo)
+        nivel = np.zeros(n, dtype=np.int64)
+        padres = np.asarray(a["parents"], dtype=np.int64)
+        for i in range(1, n):
+            nivel[i] = nivel[padres[i]] + 1
+        profundidad = max(profundidad, int(nivel.max()) if n else 0)
+
+    base = _escalar(param["base_score"])
+    if objetivo in _OBJETIVOS_LOGISTICOS and objetivo != "binary:logitraw":
+        base = float(np.log(base / (1.0 - base)))
+
+    return BosqueCompilado(
+        feature=feature, umbral=umbral, izq=izq, der=der, defecto_izq=defecto, valor=valor,
+        profundidad=profundidad, margen_base=base, objetivo=objetivo,
+        n_features=int(param["num_feature"]),
+    )
+
+
+# 3) Entrada
+
+def matriz_densa(X, n_features: Optional[int] = None) -> np.ndarray:
+    """
+    float32 C-contiguo con NaN como ausente. Para CSR (salida de preprocess.pkl) las entradas
+    no almacenadas son ausentes, como en xgb.DMatrix(csr).
+    """
+    if hasattr(X, "tocsr"):
+        M = X.tocsr()
+        out = np.full(M.shape, np.nan, dtype=np.float32)
+        filas = np.repeat(np.arange(M.shape[0]), np.diff(M.indptr))
+        out[filas, M.indices] = M.data
+        X = out
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    if X.ndim == 1:
+        X = X[None, :]
+    if n_features is not None and X.shape[1] != n_features:
+        raise ValueError(f"Se esperaban {n_features} columnas y llegan {X.shape[1]}")
+    return X
+
+
+# 4) Comparación con XGBoost
+
+def comparar_con_xgboost(bosque: BosqueCompilado,
+                         booster,
+                         X,
+                         *,
+                         lotes: Sequence[int] = (1, 10, 1_000, 100_000),
+                         repeticiones: int = 20) -> "pd.DataFrame":
+    """
+    Por tamaño de lote: diferencia máxima con booster.predict y mediana de tiempo por llamada
+    (NumPy vs DMatrix + predict vs inplace_predict). Filas de X repetidas si el lote es mayor.
+    """
+    import pandas as pd
+    import xgboost as xgb
+
+    X = matriz_densa(X, bosque.n_features)
+    rango = (0, bosque.n_arboles)
+    filas = []
+    for lote in lotes:
+        Xb = X[np.arange(lote) % len(X)]
+        rep = max(1, min(repeticiones, 200_000 // lote))
+
+        def _mediana(fn) -> float:
+            fn()
+            t = []
+            for _ in range(rep):
+                t0 = time.perf_counter()
+                fn()
+                t.append(time.perf_counter() - t0)
+            return float(np.median(t) * 1e3)
+
+        ref = booster.predict(xgb.DMatrix(Xb, missing=np.nan), iteration_range=rango)
+        filas.append({
+            "lote": int(lote),
+            "max_abs_diff": float(np.abs(bosque.predecir(Xb) - ref).max()),
+            "numpy_ms": _mediana(lambda: bosque.predecir(Xb)),
+            "xgb_dmatrix_ms": _mediana(lambda: booster.predict(xgb.DMatrix(Xb, missing=np.nan), iteration_range=rango)),
+            "xgb_inplace_ms": _mediana(lambda: booster.inplace_predict(Xb, iteration_range=rango)),
+        })
+    return pd.DataFrame(filas)
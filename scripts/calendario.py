@@ -2,10 +2,13 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import date, timedelta
-from typing import Dict, Iterable, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Sequence, Tuple
 import hashlib
 import math
 
+import numpy as np
+
 
 PROJECT_START = date(2017, 8, 1)
 PROJECT_END = date(2025, 9, 30)
@@ -22,6 +25,7 @@ def month_iter(start: date, end: date) -> Iterable[Tuple[int, int]]:
             m = 1
 
 
+@lru_cache(maxsize=None)
 def days_in_month(year: int, month: int) -> int:
     """Devuelve el número de días del mes."""
     if month == 12:
@@ -39,6 +43,24 @@ def stable_int_seed(*parts: str, mod: int = 2_147_483_647) -> int:
     return int(h[:15], 16) % mod
 
 
+MINSTD_A = 48271
+MINSTD_M = 2_147_483_647
+
+_MINSTD_POW = np.array([1], dtype=np.int64)  # a^k mod m, k = 0..len-1
+
+
+def _minstd_powers(n: int) -> np.ndarray:
+    """
+    a^k mod m para k = 1..n (salto hacia delante). La caché crece por duplicación:
+    el bloque nuevo es el anterior por a^len, sin bucle por elemento (productos < 2^62).
+    """
+    global _MINSTD_POW
+    while len(_MINSTD_POW) <= n:
+        jump = int(_MINSTD_POW[-1]) * MINSTD_A % MINSTD_M
+        _MINSTD_POW = np.concatenate([_MINSTD_POW, _MINSTD_POW * jump % MINSTD_M])
+    return _MINSTD_POW[1:n + 1]
+
+
 class SimpleLCG:
     """
     PRNG determinista (Park–Miller / MINSTD). Suficiente para sampling reproducible.
@@ -47,11 +69,19 @@ class SimpleLCG:
         self.state = (seed % 2_147_483_647) or 1
 
     def rand(self) -> float:
-        a = 48271
-        m = 2_147_483_647
+        a = MINSTD_A
+        m = MINSTD_M
         self.state = (a * self.state) % m
         return self.state / m
 
+    def rand_array(self, n: int) -> np.ndarray:
+        """Equivale a n llamadas a rand(): misma secuencia, calculada por salto a^k mod m."""
+        if n <= 0:
+            return np.empty(0, dtype=np.float64)
+        states = _minstd_powers(n) * self.state % MINSTD_M
+        self.state = int(states[-1])
+        return states / MINSTD_M
+
     def randint(self, low: int, high: int) -> int:
         """Entero en [low, high], ambos inclusive."""
         if low > high:
@@ -59,6 +89,13 @@ class SimpleLCG:
         span = high - low + 1
         return low + int(math.floor(self.rand() * span))
 
+    def randint_array(self, low: int, high: int, n: int) -> np.ndarray:
+        """n llamadas a randint(low, high) de golpe."""
+        if low > high:
+            raise ValueError("low > high en randint")
+        span = high - low + 1
+        return low + np.floor(self.rand_array(n) * span).astype(np.int64)
+
 
 @dataclass(frozen=True)
 class DateOverrides:
@@ -108,6 +145,105 @@ def sample_random_day_in_month(
     return date(year, month, rng.randint(1, dim))
 
 
+@lru_cache(maxsize=4096)
+def _day_pool(year: int, month: int, allowed_days: Optional[Tuple[int, ...]]) -> Tuple[int, ...]:
+    """Días candidatos del mes (1..n_días o allowed_days filtrado y ordenado)."""
+    dim = days_in_month(year, month)
+    if allowed_days is None:
+        return tuple(range(1, dim + 1))
+    pool = tuple(sorted(d for d in allowed_days if 1 <= d <= dim))
+    if not pool:
+        raise ValueError("allowed_days no contiene días válidos para este mes.")
+    return pool
+
+
+def _seeds_batch(prefixes: Sequence[str], month_idx: np.ndarray, unique_keys: Optional[Sequence]) -> np.ndarray:
+    """
+    stable_int_seed por fila: SHA-256 de "prefijo||clave" reutilizando el prefijo ya hasheado
+    (los 15 primeros dígitos hex son los 60 bits altos del digest).
+    """
+    hashers = [hashlib.sha256(p.encode("utf-8")) for p in prefixes]
+    if unique_keys is None:
+        per_month = np.array([int(h.hexdigest()[:15], 16) % MINSTD_M for h in hashers], dtype=np.int64)
+        return per_month[month_idx]
+    def _digest8(k: int, key) -> bytes:
+        h = hashers[k].copy()
+        h.update(f"||{key}".encode("utf-8"))
+        return h.digest()[:8]
+
+    raw = b"".join(map(_digest8, month_idx.tolist(), unique_keys))
+    top60 = np.frombuffer(raw, dtype=">u8") >> np.uint64(4)
+    return (top60 % np.uint64(MINSTD_M)).astype(np.int64)
+
+
+def minstd_first_rand(seeds: np.ndarray) -> np.ndarray:
+    """Primer rand() de SimpleLCG(seed) para muchas semillas a la vez (a·x < 2^47, cabe en int64)."""
+    state = np.asarray(seeds, dtype=np.int64) % MINSTD_M
+    state = np.where(state == 0, 1, state)
+    return (MINSTD_A * state) % MINSTD_M / MINSTD_M
+
+
+def minstd_rands(seeds: np.ndarray, n: int) -> np.ndarray:
+    """Los n primeros rand() de SimpleLCG(seed) por semilla (filas = semillas, columnas = k)."""
+    state = np.asarray(seeds, dtype=np.int64).reshape(-1) % MINSTD_M
+    state = np.where(state == 0, 1, state)
+    return state[:, None] * _minstd_powers(n)[None, :] % MINSTD_M / MINSTD_M
+
+
+def sample_random_days_in_month(
+    years: Sequence[int],
+    months: Sequence[int],
+    *,
+    base_seed: str = "global",
+    period_scope: str = "cohort",
+    unique_keys: Optional[Sequence] = None,
+    overrides: Optional[DateOverrides] = None,
+    allowed_days: Optional[Iterable[int]] = None,
+) -> np.ndarray:
+    """
+    Versión por lotes de sample_random_day_in_month: una fecha por fila (datetime64[D]),
+    idéntica a llamar a la función escalar fila a fila con los mismos argumentos.
+    """
+    years = np.asarray(years, dtype=np.int64).reshape(-1)
+    months = np.asarray(months, dtype=np.int64).reshape(-1)
+    if len(years) != len(months):
+        raise ValueError("years y months deben tener la misma longitud")
+    if unique_keys is not None:
+        unique_keys = np.asarray(unique_keys, dtype=object).tolist()
+        if len(unique_keys) != len(years):
+            raise ValueError("unique_keys debe tener la misma longitud que years")
+    allowed = None if allowed_days is None else tuple(allowed_days)
+
+    ym = years * 12 + (months - 1)
+    uniq, month_idx = np.unique(ym, return_inverse=True)
+    month_idx = month_idx.reshape(-1)
+    meses = [(int(k) // 12, int(k) % 12 + 1) for k in uniq]
+
+    fixed = np.zeros(len(uniq), dtype=np.int64)  # 0 = sin override
+    pools = []
+    for j, (y, m) in enumerate(meses):
+        dim = days_in_month(y, m)
+        f = overrides.get_fixed_day(y, m) if overrides is not None else None
+        if f is not None:
+            fixed[j] = min(max(1, f), dim)
+            pools.append((dim,))  # no se usa
+        else:
+            pools.append(_day_pool(y, m, allowed))
+
+    prefixes = [f"{base_seed}||{period_scope}||{y:04d}-{m:02d}" for y, m in meses]
+    u = minstd_first_rand(_seeds_batch(prefixes, month_idx, unique_keys))
+
+    pool_len = np.array([len(p) for p in pools], dtype=np.int64)[month_idx]
+    pick = np.floor(u * pool_len).astype(np.int64)
+    offsets = np.cumsum([0] + [len(p) for p in pools])[:-1]
+    flat_pool = np.fromiter((d for p in pools for d in p), dtype=np.int64)
+    day = flat_pool[offsets[month_idx] + pick]
+    day = np.where(fixed[month_idx] > 0, fixed[month_idx], day)
+
+    first = ym.astype("datetime64[M]") - np.timedelta64(1970 * 12, "M")
+    return first.astype("datetime64[D]") + (day - 1)
+
+
 def build_project_months(start: date = PROJECT_START, end: date = PROJECT_END):
     """
     Devuelve una lista de dicts con metadatos por mes del proyecto.
@@ -0,0 +1,323 @@
+# cargador_sqlite.py
+# Autor: proyecto "ropa"
+# Objetivo: carga masiva e indexada en database/mi_base.db:
+#   - Tablas con esquema tipado explícito (INTEGER / REAL / TEXT / TIMESTAMP)
+#   - executemany por lotes dentro de una única transacción, con PRAGMAs de carga
+#   - Índices creados *después* de insertar (customer_id, ticket_id, id_producto, fecha_item)
+#   - Tablas derivadas (database/*.sql) con esquema fijo e INSERT … SELECT en lugar de DROP + CTAS
+#   - Refresco incremental de las derivadas por marca de agua (fecha_item, item_id) de items_6
+
+from __future__ import annotations
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import sqlite3, tempfile, time
+
+import numpy as np
+import pandas as pd
+
+
+# 0) Parámetros
+
+ROOT_DIR  = Path(__file__).resolve().parent.parent
+SQLITE_DB = ROOT_DIR / "database" / "mi_base.db"
+SQL_DIR   = ROOT_DIR / "database"
+
+PRAGMAS: Dict[str, Union[str, int]] = {
+    "journal_mode": "WAL",
+    "synchronous":  "NORMAL",
+    "cache_size":   -262_144,      # KiB (negativo) → 256 MiB
+    "temp_store":   "MEMORY",
+    "mmap_size":    268_435_456,   # 256 MiB
+}
+
+LOTE = 50_000
+
+# Columnas indexadas en cualquier tabla que las tenga
+COLUMNAS_INDICE: Tuple[str, ...] = ("customer_id", "ticket_id", "id_producto", "fecha_item")
+# Claves únicas por tabla (índice UNIQUE en lugar del normal)
+CLAVES_UNICAS: Dict[str, str] = {
+    "clientes": "customer_id",
+    "productos": "id_producto",
+    "productos_variantes": "sku",
+}
+
+# Tablas derivadas: script SQL y columnas a indexar tras construirlas
+DERIVADAS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "base_modelo_devoluciones": ("base_modelo_devoluciones.sql", ("customer_id", "fecha_compra")),
+    "dataset_modelo_a_tallas":  ("dataset_modelo_a_tallas.sql",  ("customer_id", "categoria")),
+}
+
+# Columnas copiadas de `clientes` que cambian con cada compra nueva (refresco incremental)
+COLUMNAS_CLIENTE: Dict[str, Tuple[str, ...]] = {
+    "base_modelo_devoluciones": ("fecha_primer_compra", "fecha_ultima_compra", "n_pedidos", "n_items_comprados"),
+}
+
+# Marca de agua (fecha_item, item_id) del último item de items_6 volcado en cada derivada
+META_DERIVADAS = "_derivadas_marca"
+ORIGEN_DERIVADAS = "items_6"
+
+
+# 1) Conexión
+
+def conectar(db_path: Union[str, Path] = SQLITE_DB) -> sqlite3.Connection:
+    """Conexión en modo autocommit (transacciones explícitas) con los PRAGMAs de carga."""
+    con = sqlite3.connect(db_path, isolation_level=None)
+    for k, v in PRAGMAS.items():
+        con.execute(f"PRAGMA {k} = {v}")
+    return con
+
+def _q(nombre: str) -> str:
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+# 2) Tipos y conversión de columnas
+
+def tipo_sqlite(s: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_integer_dtype(s):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(s):
+        return "REAL"
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return "TIMESTAMP"
+    return "TEXT"
+
+def _valores(s: pd.Series) -> List:
+    """Columna → lista de valores Python aptos para sqlite3 (nulos como None)."""
+    nulos = s.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(s):
+        vals = s.dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object)  # mismo texto que to_sql
+    elif pd.api.types.is_bool_dtype(s) and not nulos.any():
+        vals = s.to_numpy(dtype=np.int64)
+    elif (pd.api.types.is_integer_dtype(s) or pd.api.types.is_float_dtype(s)) and not nulos.any():
+        return s.to_numpy().tolist()
+    else:
+        vals = s.to_numpy(dtype=object)
+    out = vals.tolist()
+    if nulos.any():
+        for i in np.flatnonzero(nulos).tolist():
+            out[i] = None
+    return out
+
+def _lotes(filas: Iterable[tuple], n: int) -> Iterable[List[tuple]]:
+    it = iter(filas)
+    while True:
+        lote = list(islice(it, n))
+        if not lote:
+            return
+        yield lote
+
+
+# 3) Carga de tablas
+
+def crear_indices(con: sqlite3.Connection, tabla: str, columnas: Optional[Sequence[str]] = None) -> List[str]:
+    """Crea (si no existen) los índices de `tabla` sobre las columnas presentes."""
+    presentes = {r[1] for r in con.execute(f"PRAGMA table_info({_q(tabla)})")}
+    columnas = COLUMNAS_INDICE if columnas is None else columnas
+    creados = []
+    unica = CLAVES_UNICAS.get(tabla)
+    for c in columnas:
+        if c not in presentes:
+            continue
+        tipo = "UNIQUE INDEX" if c == unica else "INDEX"
+        nombre = f"ix_{tabla}_{c}"
+        con.execute(f"CREATE {tipo} IF NOT EXISTS {_q(nombre)} ON {_q(tabla)} ({_q(c)})")
+        creados.append(nombre)
+    return creados
+
+def cargar_tabla(df: pd.DataFrame,
+                 tabla: str,
+                 con: Optional[sqlite3.Connection] = None,
+                 *,
+                 db_path: Union[str, Path] = SQLITE_DB,
+                 indices: Optional[Sequence[str]] = None,
+                 lote: int = LOTE) -> int:
+    """
+    Sustituye `tabla` por el contenido de `df` (equivalente a to_sql(if_exists="replace")).
+    Esquema tipado, inserción por lotes en una sola transacción e índices al final.
+    Devuelve el número de filas insertadas.
+    """
+    propia = con is None
+    con = conectar(db_path) if propia else con
+    cols = [str(c) for c in df.columns]
+    ddl = ", ".join(f"{_q(c)} {tipo_sqlite(df[c])}" for c in df.columns)
+    insert = f"INSERT INTO {_q(tabla)} VALUES ({', '.join('?' * len(cols))})"
+    try:
+        con.execute("BEGIN")
+        con.execute(f"DROP TABLE IF EXISTS {_q(tabla)}")
+        con.execute(f"CREATE TABLE {_q(tabla)} ({ddl})")
+        filas = zip(*(_valores(df[c]) for c in df.columns))
+        for bloque in _lotes(filas, lote):
+            con.executemany(insert, bloque)
+        crear_indices(con, tabla, indices)
+        con.execute("COMMIT")
+    except BaseException:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+    finally:
+        if propia:
+            con.close()
+    return len(df)
+
+
+# 4) Tablas derivadas
+
+def construir_derivadas(con: Optional[sqlite3.Connection] = None,
+                        *,
+                        db_path: Union[str, Path] = SQLITE_DB,
+                        completo: bool = True,
+                        tablas: Optional[Sequence[str]] = None) -> Dict[str, int]:
+    """
+    Ejecuta los scripts de database/*.sql (CREATE TABLE IF NOT EXISTS + INSERT … SELECT).
+    `completo=True` rehace la tabla desde todo items_6 (histórico reescrito).
+    `completo=False` es el refresco incremental: solo lee los items desde el día de la marca
+    de agua (fecha_item, item_id) y actualiza las columnas de cliente solo de los clientes
+    que aparecen en ellos; sin marca previa se construye completa. Devuelve filas por tabla.
+    """
+    propia = con is None
+    con = conectar(db_path) if propia else con
+    out: Dict[str, int] = {}
+    try:
+        con.execute(f"CREATE TABLE IF NOT EXISTS {META_DERIVADAS} (tabla TEXT PRIMARY KEY, fecha_item, item_id)")
+        for tabla in (tablas or DERIVADAS):
+            con.execute("BEGIN")
+            try:
+                marca = None if completo else leer_marca(con, tabla)
+                if marca is None:
+                    _construir_completa(con, tabla)
+                else:
+                    _refrescar_incremental(con, tabla, marca)
+                con.execute("COMMIT")
+            except BaseException:
+                if con.in_transaction:
+                    con.execute("ROLLBACK")
+                raise
+            out[tabla] = con.execute(f"SELECT COUNT(*) FROM {_q(tabla)}").fetchone()[0]
+    finally:
+        if propia:
+            con.close()
+    return out
+
+def leer_marca(con: sqlite3.Connection, tabla: str) -> Optional[Tuple]:
+    """(fecha_item, item_id) del último item de items_6 volcado en `tabla`, o None."""
+    existe = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+    meta = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (META_DERIVADAS,)).fetchone()
+    if not existe or not meta:
+        return None
+    fila = con.execute(f"SELECT fecha_item, item_id FROM {META_DERIVADAS} WHERE tabla = ?", (tabla,)).fetchone()
+    return tuple(fila) if fila else None
+
+def _guardar_marca(con: sqlite3.Connection, tabla: str, origen: str) -> None:
+    fila = con.execute(f"SELECT fecha_item, item_id FROM {origen} "
+                       "ORDER BY fecha_item DESC, item_id DESC LIMIT 1").fetchone()
+    if fila is None:  # origen vacío: se mantiene la marca anterior (si la hay)
+        return
+    con.execute(f"INSERT OR REPLACE INTO {META_DERIVADAS} (tabla, fecha_item, item_id) VALUES (?, ?, ?)",
+                (tabla, *fila))
+
+def _construir_completa(con: sqlite3.Connection, tabla: str) -> None:
+    script, cols_idx = DERIVADAS[tabla]
+    con.execute(f"DROP TABLE IF EXISTS {_q(tabla)}")  # DROP también elimina los índices
+    con.execute(f"DELETE FROM {META_DERIVADAS} WHERE tabla = ?", (tabla,))
+    for stmt in _sentencias((SQL_DIR / script).read_text(encoding="utf-8")):
+        con.execute(stmt)
+    crear_indices(con, tabla, cols_idx)
+    _guardar_marca(con, tabla, f"main.{_q(ORIGEN_DERIVADAS)}")
+
+def _refrescar_incremental(con: sqlite3.Connection, tabla: str, marca: Tuple) -> int:
+    """
+    Vuelca solo los items de items_6 desde el día de `marca`. Los scripts leen `items_6`
+    sin esquema, así que una vista TEMP con ese nombre (tiene prioridad sobre main)
+    les da únicamente las filas nuevas sin tocar el SQL. Devuelve filas insertadas.
+    """
+    script, cols_idx = DERIVADAS[tabla]
+    origen = _q(ORIGEN_DERIVADAS)
+    fecha, _ = marca
+    # Se relee el día entero de la marca: las fechas de ticket no tienen hora, así que un
+    # item que llega tarde ese mismo día puede tener item_id menor que la marca. Los
+    # duplicados los descarta el NOT EXISTS de los scripts.
+    con.execute(f"CREATE TEMP TABLE _items_nuevos AS SELECT * FROM main.{origen} "
+                "WHERE fecha_item >= ?", (str(fecha)[:10],))
+    con.execute(f"CREATE TEMP VIEW {origen} AS SELECT * FROM temp._items_nuevos")
+    antes = con.total_changes
+    for stmt in _sentencias((SQL_DIR / script).read_text(encoding="utf-8")):
+        con.execute(stmt)
+    insertadas = con.total_changes - antes
+    crear_indices(con, tabla, cols_idx)
+
+    cols = COLUMNAS_CLIENTE.get(tabla)
+    if cols:
+        lista = ", ".join(_q(c) for c in cols)
+        con.execute(f"UPDATE {_q(tabla)} SET ({lista}) = "
+                    f"(SELECT {lista} FROM clientes c WHERE c.customer_id = {_q(tabla)}.customer_id) "
+                    "WHERE customer_id IN (SELECT DISTINCT customer_id FROM temp._items_nuevos)")
+
+    _guardar_marca(con, tabla, "temp._items_nuevos")
+    con.execute(f"DROP VIEW temp.{origen}")
+    con.execute("DROP TABLE temp._items_nuevos")
+    return insertadas
+
+def _sentencias(sql: str) -> List[str]:
+    """Divide un script en sentencias completas (respeta ';' dentro de literales)."""
+    out, buf = [], ""
+    for linea in sql.splitlines(keepends=True):
+        buf += linea
+        if sqlite3.complete_statement(buf):
+            if buf.strip():
+                out.append(buf.strip())
+            buf = ""
+    if buf.strip():
+        out.append(buf.strip())
+    return out
+
+
+# 5) Benchmark (refresco completo vs incremental de un mes)
+
+def benchmark_derivadas(db_path: Union[str, Path] = SQLITE_DB) -> Dict[str, float]:
+    """
+    Sobre una copia temporal de la base: retira de items_6 el último mes, construye las
+    derivadas, lo devuelve a items_6 y cronometra el refresco incremental frente al completo.
+    """
+    out: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        copia = Path(tmp) / "bench.db"
+        src = sqlite3.connect(db_path)
+        con = conectar(copia)
+        try:
+            src.backup(con)
+            src.close()
+            origen = _q(ORIGEN_DERIVADAS)
+            mes = con.execute(f"SELECT substr(MAX(fecha_item), 1, 7) FROM {origen}").fetchone()[0]
+            if mes is None:
+                raise ValueError(f"{ORIGEN_DERIVADAS} vacío: nada que medir")
+            desde = f"{mes}-01"
+            con.execute("BEGIN")
+            con.execute(f"CREATE TEMP TABLE _bench_mes AS SELECT * FROM {origen} WHERE fecha_item >= ?", (desde,))
+            con.execute(f"DELETE FROM {origen} WHERE fecha_item >= ?", (desde,))
+            con.execute("COMMIT")
+            construir_derivadas(con, completo=True)
+
+            con.execute("BEGIN")
+            con.execute(f"INSERT INTO {origen} SELECT * FROM temp._bench_mes")
+            con.execute("COMMIT")
+            out["filas_mes"] = con.execute("SELECT COUNT(*) FROM temp._bench_mes").fetchone()[0]
+            out["filas_total"] = con.execute(f"SELECT COUNT(*) FROM {origen}").fetchone()[0]
+
+            t = time.perf_counter(); inc = construir_derivadas(con, completo=False)
+            out["incremental_s"] = time.perf_counter() - t
+            t = time.perf_counter(); full = construir_derivadas(con, completo=True)
+            out["completo_s"] = time.perf_counter() - t
+            if inc != full:
+                raise AssertionError(f"refresco incremental {inc} != completo {full}")
+        finally:
+            con.close()
+    return out
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        db = next((a for a in sys.argv[1:] if not a.startswith("--")), SQLITE_DB)
+        for k, v in benchmark_derivadas(db).items():
+            print(f"{k:>14}: {v:,.3f}")
@@ -0,0 +1,257 @@
+# coocurrencias.py
+# Autor: proyecto "ropa"
+# Objetivo: métricas de co-ocurrencia de categorías a nivel ticket sin sets de Python:
+#   - Matriz dispersa ticket × categoría (CSR booleana) construida una sola vez
+#   - Conteos de todos los pares de categorías con un único producto XᵀX
+#   - support / confidence / lift / lift_vs_sinA / diff_pp para todos los pares o solo para reglas
+#   - Cubo de pares por cualquier clave de agrupación (ym, canal, …) en una sola pasada:
+#     ZᵀZ diagonal por bloques, opcionalmente repartido por meses entre procesos
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# 0) Columnas por defecto y orden de salida
+
+TICKET_COL = "ticket_id"
+CAT_COL    = "_cat"
+
+COLUMNAS_METRICAS: Tuple[str, ...] = (
+    "tickets", "count_A", "count_B", "count_AB",
+    "support_AB", "confidence", "pB", "pB_sinA",
+    "lift", "lift_vs_sinA", "diff_pp", "A", "B",
+)
+
+Pares = Optional[Sequence[Tuple[str, str]]]
+
+
+# 1) Matriz ticket × categoría
+
+@dataclass(frozen=True)
+class MatrizTickets:
+    """Presencia de categorías por ticket (CSR booleana) + atributos de cada ticket."""
+    X: sparse.csr_matrix          # n_tickets × n_categorias
+    tickets: np.ndarray           # id de ticket por fila de X
+    categorias: np.ndarray        # categoría por columna de X (ordenadas)
+    atributos: pd.DataFrame       # una fila por ticket (mismo orden que X), p. ej. ym, canal
+
+    @property
+    def n_tickets(self) -> int:
+        return self.X.shape[0]
+
+    def filtrar(self, filas: Union[np.ndarray, Sequence[int]]) -> "MatrizTickets":
+        """Subconjunto de tickets (posiciones o máscara booleana) con las mismas columnas."""
+        filas = np.asarray(filas)
+        if filas.dtype == bool:
+            filas = np.flatnonzero(filas)
+        return MatrizTickets(self.X[filas], self.tickets[filas], self.categorias,
+                             self.atributos.iloc[filas].reset_index(drop=True))
+
+
+def matriz_tickets(df: pd.DataFrame,
+                   ticket_col: str = TICKET_COL,
+                   cat_col: str = CAT_COL,
+                   atributos: Sequence[str] = ()) -> MatrizTickets:
+    """
+    Codifica los items como matriz CSR ticket × categoría (True si el ticket tiene la
+    categoría). `atributos` se toman de la primera fila de cada ticket, como el
+    groupby(...).agg("first") del notebook.
+    """
+    t_cod, tickets = pd.factorize(df[ticket_col], sort=False)
+    c_cod, cats = pd.factorize(df[cat_col], sort=True)
+    ok = (t_cod >= 0) & (c_cod >= 0)
+    X = sparse.csr_matrix(
+        (np.ones(int(ok.sum()), dtype=np.int32), (t_cod[ok], c_cod[ok])),
+        shape=(len(tickets), len(cats)),
+    )
+    X = (X > 0).astype(bool)  # varias unidades de la misma categoría cuentan una vez
+
+    # factorize numera por primera aparición → la primera fila de cada código
+    _, primera = np.unique(t_cod[t_cod >= 0], return_index=True)
+    filas = np.flatnonzero(t_cod >= 0)[primera]
+    attrs = df.iloc[filas][list(atributos)].reset_index(drop=True)
+    return MatrizTickets(X.tocsr(), np.asarray(tickets), np.asarray(cats), attrs)
+
+
+# 2) Conteos y métricas
+
+def conteos_pares(X: sparse.spmatrix) -> Tuple[int, np.ndarray]:
+    """(N tickets, C) con C[a, b] = tickets con a y b; la diagonal son los tickets con a."""
+    Xi = X.astype(np.int64)
+    return X.shape[0], (Xi.T @ Xi).toarray()
+
+def _metricas(N: np.ndarray, nA: np.ndarray, nB: np.ndarray, nAB: np.ndarray) -> Dict[str, np.ndarray]:
+    N, nA, nB, nAB = (np.asarray(v, dtype=np.float64) for v in (N, nA, nB, nAB))
+    nan = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        support = np.where(N > 0, nAB / N, nan)
+        conf = np.where(nA > 0, nAB / nA, nan)
+        pB = np.where(N > 0, nB / N, nan)
+        sin_a = N - nA
+        pB_sin_a = np.where(sin_a > 0, (nB - nAB) / sin_a, nan)
+        lift = np.where(pB > 0, conf / pB, nan)
+        lift_vs = np.where(pB_sin_a > 0, conf / pB_sin_a, nan)
+        diff_pp = (conf - pB_sin_a) * 100
+    return {
+        "support_AB": support, "confidence": conf, "pB": pB, "pB_sinA": pB_sin_a,
+        "lift": lift, "lift_vs_sinA": lift_vs, "diff_pp": diff_pp,
+    }
+
+def _indices_pares(categorias: np.ndarray, pares: Pares) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Posiciones (a, b) y nombres (A, B); sin `pares` son todos los pares ordenados A ≠ B."""
+    if pares is None:
+        a, b = np.nonzero(~np.eye(len(categorias), dtype=bool))
+        return a, b, categorias[a], categorias[b]
+    pos = {c: i for i, c in enumerate(categorias.tolist())}
+    A = np.array([p[0] for p in pares], dtype=object)
+    B = np.array([p[1] for p in pares], dtype=object)
+    a = np.array([pos.get(x, -1) for x in A], dtype=np.int64)
+    b = np.array([pos.get(x, -1) for x in B], dtype=np.int64)
+    return a, b, A, B
+
+def metricas_pares(N: int,
+                   C: np.ndarray,
+                   categorias: np.ndarray,
+                   pares: Pares = None) -> pd.DataFrame:
+    """
+    Métricas de co-ocurrencia desde la matriz de conteos C (ver `conteos_pares`).
+    Categorías de `pares` que no aparecen cuentan como 0 tickets (métricas NaN).
+    """
+    a, b, A, B = _indices_pares(categorias, pares)
+    K = len(categorias)
+    Cz = np.zeros((K + 1, K + 1), dtype=np.int64)  # fila/columna K = categoría ausente
+    Cz[:K, :K] = C
+    a = np.where(a < 0, K, a)
+    b = np.where(b < 0, K, b)
+    nA, nB, nAB = Cz[a, a], Cz[b, b], Cz[a, b]
+    out = pd.DataFrame({
+        "tickets": np.full(len(a), N, dtype=np.int64),
+        "count_A": nA,
+        "count_B": nB,
+        "count_AB": nAB,
+        **_metricas(np.full(len(a), N), nA, nB, nAB),
+        "A": A,
+        "B": B,
+    })
+    return out[list(COLUMNAS_METRICAS)]
+
+def metricas_reglas(mt: MatrizTickets, pares: Pares = None) -> pd.DataFrame:
+    """Métricas de `pares` (o de todos los pares) sobre todos los tickets de `mt`."""
+    N, C = conteos_pares(mt.X)
+    return metricas_pares(N, C, mt.categorias, pares)
+
+
+# 3) Cubo de pares por grupos (una sola pasada)
+
+def _codigos_grupo(mt: MatrizTickets, claves: List[str]) -> Tuple[np.ndarray, pd.DataFrame]:
+    """Código de grupo por ticket (orden de las claves) y valores de las claves por código."""
+    g = mt.atributos.groupby(claves, sort=True, dropna=False)
+    return g.ngroup().to_numpy(), g.size().index.to_frame(index=False)
+
+def _conteos_bloque(X: sparse.csr_matrix, cod: np.ndarray, G: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Celdas no nulas (fila, columna, valor) de ZᵀZ, con Z[t, g(t)·K + c] = X[t, c]:
+    ZᵀZ es diagonal por bloques y el bloque g es la matriz de conteos del grupo g.
+    """
+    X = X.tocsr()
+    K = X.shape[1]
+    g_nnz = np.repeat(cod.astype(np.int64), np.diff(X.indptr))
+    Z = sparse.csr_matrix((np.ones(X.nnz, dtype=np.int64), X.indices + K * g_nnz, X.indptr),
+                          shape=(X.shape[0], G * K))
+    P = (Z.T @ Z).tocoo()
+    return P.row.astype(np.int64), P.col.astype(np.int64), P.data.astype(np.int64)
+
+def cubo_pares(mt: MatrizTickets,
+               claves: Sequence[str],
+               *,
+               procesos: int = 1,
+               particion: Optional[str] = None) -> pd.DataFrame:
+    """
+    Conteos de pares de todos los grupos de `claves` con un único producto disperso, en
+    formato largo: claves + A, B, tickets (del grupo), count_AB. Solo celdas no nulas;
+    las filas A == B llevan los tickets del grupo con A.
+    `procesos > 1` reparte los tickets por valores de `particion` (por defecto la primera
+    clave, p. ej. ym) entre procesos; los conteos son aditivos y se suman al final.
+    """
+    claves = list(claves)
+    cod, valores = _codigos_grupo(mt, claves)
+    G, K = len(valores), len(mt.categorias)
+
+    if procesos > 1 and G > 1:
+        bloques = list(mt.atributos.groupby(particion or claves[0], sort=True, dropna=False).indices.values())
+        with ProcessPoolExecutor(max_workers=procesos) as ex:
+            res = list(ex.map(_conteos_bloque, (mt.X[b] for b in bloques), (cod[b] for b in bloques), repeat(G)))
+        r, c, v = (np.concatenate([x[i] for x in res]) if res else np.zeros(0, np.int64) for i in range(3))
+    else:
+        r, c, v = _conteos_bloque(mt.X, cod, G)
+
+    P = sparse.coo_matrix((v, (r, c)), shape=(G * K, G * K)).tocsr().tocoo()  # suma duplicados y ordena
+    g, a, b = P.row // K, P.row % K, P.col % K
+    tickets = np.bincount(cod, minlength=G)
+    out = valores.iloc[g].reset_index(drop=True)
+    out["A"] = mt.categorias[a]
+    out["B"] = mt.categorias[b]
+    out["tickets"] = tickets[g]
+    out["count_AB"] = P.data.astype(np.int64)
+    return out
+
+def metricas_cubo(cubo: pd.DataFrame,
+                  claves: Sequence[str],
+                  pares: Pares = None,
+                  *,
+                  min_tickets: int = 0) -> pd.DataFrame:
+    """
+    Métricas de `pares` (o de todos los pares) en cada grupo del cubo, en formato largo:
+    COLUMNAS_METRICAS + claves. Los grupos con menos de `min_tickets` se omiten.
+    """
+    claves = list(claves)
+    if cubo.empty:
+        return pd.DataFrame(columns=list(COLUMNAS_METRICAS) + claves)
+    grp = cubo.groupby(claves, sort=True, dropna=False)
+    g_cod = grp.ngroup().to_numpy()
+    valores = grp.size().index.to_frame(index=False)
+    N = grp["tickets"].first().to_numpy()
+
+    cats = np.unique(cubo["A"].to_numpy())  # toda categoría presente tiene su fila A == B
+    K = len(cats)
+    clave = (g_cod * K + np.searchsorted(cats, cubo["A"].to_numpy())) * K + np.searchsorted(cats, cubo["B"].to_numpy())
+    orden = np.argsort(clave, kind="stable")
+    clave, conteo = clave[orden], cubo["count_AB"].to_numpy()[orden]
+
+    def buscar(g: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        k = (g * K + a) * K + b
+        pos = np.minimum(np.searchsorted(clave, k), len(clave) - 1)
+        return np.where((a >= 0) & (b >= 0) & (clave[pos] == k), conteo[pos], 0)
+
+    a, b, A, B = _indices_pares(cats, pares)
+    gs = np.flatnonzero(N >= min_tickets)
+    g = np.repeat(gs, len(a))
+    a, b = np.tile(a, len(gs)), np.tile(b, len(gs))
+    nA, nB, nAB = buscar(g, a, a), buscar(g, b, b), buscar(g, a, b)
+
+    out = pd.DataFrame({
+        "tickets": N[g].astype(np.int64),
+        "count_A": nA,
+        "count_B": nB,
+        "count_AB": nAB,
+        **_metricas(N[g], nA, nB, nAB),
+        "A": np.tile(A, len(gs)),
+        "B": np.tile(B, len(gs)),
+    })[list(COLUMNAS_METRICAS)]
+    return pd.concat([out, valores.iloc[g].reset_index(drop=True)], axis=1)
+
+def cooc_por_grupo(mt: MatrizTickets,
+                   claves: Sequence[str],
+                   pares: Pares = None,
+                   *,
+                   min_tickets: int = 0,
+                   procesos: int = 1) -> pd.DataFrame:
+    """Métricas por cada combinación de `claves` (columnas de mt.atributos); ver `metricas_cubo`."""
+    return metricas_cubo(cubo_pares(mt, claves, procesos=procesos), claves, pares, min_tickets=min_tickets)
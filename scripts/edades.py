@@ -1,10 +1,15 @@
 # edades.py
 from __future__ import annotations
-from typing import Dict, Tuple, List, Optional
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple, List, Optional, Sequence
 import numpy as np
 import hashlib
 from datetime import date
 
+from calendario import build_project_months
+from geografia import PROVINCIAS
+
 # Tramos y pesos objetivo base (Nude Project-like)
 AGE_BUCKETS: List[Tuple[int, int]] = [
     (16, 17),   # idx 0
@@ -15,10 +20,13 @@ AGE_BUCKETS: List[Tuple[int, int]] = [
 ]
 TARGET = np.array([0.07, 0.40, 0.35, 0.15, 0.03], dtype=float)
 
+def _seed_from_key(key: str) -> int:
+    """Semilla entera (SHA-1 mod 2^32-1) asociada a una clave."""
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % (2**32 - 1)
+
 def _rng_from_key(key: str) -> np.random.Generator:
     """RNG determinista por clave (mes/provincia) para reproducibilidad."""
-    seed = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16) % (2**32 - 1)
-    return np.random.default_rng(seed)
+    return np.random.default_rng(_seed_from_key(key))
 
 def _apply_drift(weights: np.ndarray, base_year: int, current_year: int) -> np.ndarray:
     """
@@ -81,3 +89,132 @@ def build_month_samplers(month_key: str,
     rng = _rng_from_key(f"RNG|{month_key}|{provincia or ''}")
     weights = sample_weights_for_month(month_key, year, provincia=provincia)
     return rng, weights
+
+
+# ---------------------------------------------------------------------
+# Muestreo por lotes: tensor de pesos (meses × provincias × tramos)
+# ---------------------------------------------------------------------
+_LO = np.array([lo for lo, _ in AGE_BUCKETS], dtype=np.uint64)
+_SPAN = np.array([hi - lo + 1 for lo, hi in AGE_BUCKETS], dtype=np.uint64)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+@dataclass(frozen=True)
+class TensorPesosEdad:
+    """
+    Pesos por (mes, provincia, tramo) con drift y sesgo geográfico ya aplicados.
+    `semillas[i, j]` es la semilla del RNG de muestreo de `build_month_samplers`.
+    """
+    month_keys: Tuple[str, ...]
+    provincias: Tuple[str, ...]
+    pesos: np.ndarray      # (M, P, len(AGE_BUCKETS))
+    semillas: np.ndarray   # (M, P) uint64
+
+    def grupo(self, month_key: str, provincia: Optional[str]) -> Tuple[np.ndarray, int]:
+        """(pesos, semilla) de un grupo; fuera del tensor se calculan al vuelo."""
+        i = self._idx_mes.get(month_key)
+        j = self._idx_prov.get(provincia)
+        if i is not None and j is not None:
+            return self.pesos[i, j], int(self.semillas[i, j])
+        w = sample_weights_for_month(month_key, int(month_key[:4]), provincia=provincia)
+        return w, _seed_from_key(f"RNG|{month_key}|{provincia or ''}")
+
+    @property
+    def _idx_mes(self) -> Dict[str, int]:
+        return _indice(self.month_keys)
+
+    @property
+    def _idx_prov(self) -> Dict[str, int]:
+        return _indice(self.provincias)
+
+
+@lru_cache(maxsize=None)
+def _indice(claves: Tuple[str, ...]) -> Dict[str, int]:
+    return {k: i for i, k in enumerate(claves)}
+
+
+@lru_cache(maxsize=8)
+def tensor_pesos_edad(month_keys: Optional[Tuple[str, ...]] = None,
+                      provincias: Optional[Tuple[str, ...]] = None) -> TensorPesosEdad:
+    """
+    Precalcula una sola vez los pesos de todos los (mes, provincia).
+    Por defecto: meses del proyecto (calendario) y provincias de geografia.
+    """
+    if month_keys is None:
+        month_keys = tuple(m["period"] for m in build_project_months())
+    if provincias is None:
+        provincias = PROVINCIAS
+    pesos = np.empty((len(month_keys), len(provincias), len(AGE_BUCKETS)), dtype=float)
+    semillas = np.empty((len(month_keys), len(provincias)), dtype=np.uint64)
+    for i, mk in enumerate(month_keys):
+        yr = int(mk[:4])
+        for j, prov in enumerate(provincias):
+            pesos[i, j] = sample_weights_for_month(mk, yr, provincia=prov)
+            semillas[i, j] = _seed_from_key(f"RNG|{mk}|{prov or ''}")
+    pesos.setflags(write=False)
+    semillas.setflags(write=False)
+    return TensorPesosEdad(tuple(month_keys), tuple(provincias), pesos, semillas)
+
+
+def _sample_group(seed: int, weights: np.ndarray, n: int) -> np.ndarray:
+    """
+    n edades de un grupo reproduciendo bit a bit n llamadas a
+    `sample_age_from_weights` sobre `default_rng(seed)`.
+
+    Consumo de PCG64 por fila: `choice(p=)` usa un uint64 completo (random());
+    `integers` en rango pequeño usa un uint32 de Lemire, y next_uint32 parte cada
+    uint64 en (bajo, alto). Por cada par de filas: [choice, int|int, choice].
+    Si Lemire rechazaría alguna muestra se repite el grupo por la vía escalar.
+    """
+    pares = (n + 1) // 2
+    raw = np.random.PCG64(seed).random_raw(3 * pares).reshape(pares, 3)
+    u = np.empty(2 * pares, dtype=np.uint64)
+    u[0::2], u[1::2] = raw[:, 0], raw[:, 2]
+    x = np.empty(2 * pares, dtype=np.uint64)
+    x[0::2], x[1::2] = raw[:, 1] & _MASK32, raw[:, 1] >> np.uint64(32)
+    u, x = u[:n], x[:n]
+
+    cdf = weights.cumsum()
+    cdf /= cdf[-1]
+    idx = cdf.searchsorted((u >> np.uint64(11)) * (1.0 / 9007199254740992.0), side="right")
+
+    span = _SPAN[idx]
+    m = x * span
+    resto = m & _MASK32
+    umbral = (np.uint64(2**32) - span) % span
+    if np.any(resto < umbral):
+        rng = np.random.default_rng(seed)
+        return np.array([sample_age_from_weights(rng, weights) for _ in range(n)], dtype=np.int64)
+    return (_LO[idx] + (m >> np.uint64(32))).astype(np.int64)
+
+
+def sample_ages_batch(month_keys: Sequence[str],
+                      provincias: Sequence[Optional[str]],
+                      rng_keys: Optional[Sequence] = None,
+                      tensor: Optional[TensorPesosEdad] = None) -> np.ndarray:
+    """
+    Edades para muchas filas a la vez, agrupando por (mes, provincia).
+
+    Cada grupo usa el mismo RNG que `build_month_samplers` y consume las filas
+    en orden de entrada (o según `rng_keys`, estable), de modo que el resultado
+    coincide con llamar a `sample_age_from_weights` fila a fila por grupo.
+    """
+    mk = np.asarray(month_keys, dtype=object)
+    pv = np.asarray([p or "" for p in provincias], dtype=object)
+    n = len(mk)
+    if len(pv) != n or (rng_keys is not None and len(rng_keys) != n):
+        raise ValueError("month_keys, provincias y rng_keys deben tener la misma longitud")
+    out = np.empty(n, dtype=np.int64)
+    if n == 0:
+        return out
+    tensor = tensor if tensor is not None else tensor_pesos_edad()
+
+    claves, grupo = np.unique(mk + "|" + pv, return_inverse=True)
+    orden_fila = np.arange(n) if rng_keys is None else np.argsort(np.asarray(rng_keys), kind="stable")
+    orden = orden_fila[np.argsort(grupo[orden_fila], kind="stable")]
+    cortes = np.flatnonzero(np.diff(grupo[orden])) + 1
+    for filas in np.split(orden, cortes):
+        k = filas[0]
+        w, seed = tensor.grupo(mk[k], pv[k] or None)
+        out[filas] = _sample_group(seed, w, len(filas))
+    return out
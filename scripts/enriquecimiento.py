@@ -0,0 +1,179 @@
+# enriquecimiento.py
+# Autor: proyecto "ropa"
+# Objetivo: enriquecimiento de items (tallas, SKU, colores, medidas corporales) sin bucles por fila:
+#   - Funciones de texto evaluadas una vez por valor distinto, SKU reescrito con operaciones .str
+#   - Muestreo categórico sobre tablas de probabilidad precalculadas (una fila por combinación
+#     de claves): con el mismo uniforme elige lo mismo que Generator.choice(p=...)
+#   - Muestreo en dos pasos (categoría y luego elemento) reproduciendo el flujo PCG64 del bucle
+#     por fila: mismos resultados y mismo estado final del Generator
+#   - Moda por cliente con groupby, sin lambdas
+#   - Normales truncadas por CDF inversa (un uniforme por valor, sin rechazo)
+
+from __future__ import annotations
+from typing import Callable, Sequence, Tuple
+import hashlib
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from calendario import minstd_rands
+
+
+# 1) Texto
+
+def mapear_unicos(s: pd.Series, fn: Callable[[object], object]) -> pd.Series:
+    """s.map(fn) evaluando fn una sola vez por valor distinto (nulos incluidos)."""
+    codigos, uniq = pd.factorize(s, use_na_sentinel=False)
+    valores = np.empty(len(uniq), dtype=object)
+    valores[:] = [fn(u) for u in uniq]
+    return pd.Series(valores[codigos], index=s.index)
+
+def token_talla(talla: pd.Series) -> pd.Series:
+    """Talla → token de SKU: ropa → XS..XL, calzado → número, OneSize → OS, nulo → ""."""
+    t = talla.astype("string").str.strip()
+    tok = t.where(t.str.isdigit(), t.str.upper())
+    tok = tok.mask(t.str.lower().eq("onesize"), "OS")
+    return tok.fillna("")
+
+def actualizar_sku(sku: pd.Series, talla: pd.Series) -> pd.Series:
+    """
+    Sustituye el último token del SKU (separado por "-" o, si no hay, por "_") por la talla;
+    sin separador añade "-talla". SKU o talla nulos → SKU sin cambios.
+    """
+    s = sku.astype(str)
+    tok = token_talla(talla).astype(object)
+    guion = s.str.contains("-", regex=False)
+    bajo = s.str.contains("_", regex=False) & ~guion
+    nuevo = np.where(
+        guion, s.str.rsplit("-", n=1).str[0] + "-" + tok,
+        np.where(bajo, s.str.rsplit("_", n=1).str[0] + "_" + tok, s + "-" + tok),
+    )
+    return pd.Series(np.where(sku.isna() | talla.isna(), sku.to_numpy(dtype=object), nuevo), index=sku.index, dtype=object)
+
+
+# 2) Muestreo categórico
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+_DOBLE = 1.0 / 9007199254740992.0  # 2**-53, como next_double
+
+def _tabla_probabilidades(prob_fn: Callable[..., np.ndarray],
+                          claves: Sequence[pd.Series]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(combinación de cada fila, P por combinación, CDF normalizada); prob_fn una vez por combinación."""
+    if len(claves[0]) == 0:
+        return np.empty(0, dtype=np.intp), np.empty((0, 0)), np.empty((0, 0))
+    codigos, combos = pd.MultiIndex.from_arrays([np.asarray(c, dtype=object) for c in claves]).factorize()
+    P = np.array([prob_fn(*combo) for combo in combos], dtype=float)
+    cdf = np.cumsum(P, axis=1)
+    cdf /= cdf[:, -1:]
+    return codigos, P, cdf
+
+def muestreo_categorico(prob_fn: Callable[..., np.ndarray],
+                        claves: Sequence[pd.Series],
+                        u: np.ndarray) -> np.ndarray:
+    """
+    Índice de categoría por fila con probabilidades prob_fn(*claves de la fila). prob_fn se
+    evalúa una vez por combinación distinta; con el mismo uniforme `u` el resultado es el de
+    Generator.choice(K, p=...) (CDF acumulada y normalizada, búsqueda por la derecha).
+    """
+    codigos, _, cdf = _tabla_probabilidades(prob_fn, claves)
+    return (cdf[codigos] <= np.asarray(u)[:, None]).sum(axis=1)
+
+def muestreo_dos_pasos(prob_fn: Callable[..., np.ndarray],
+                       claves: Sequence[pd.Series],
+                       tamanos: Sequence[int],
+                       rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (categoría, elemento) por fila, igual que el bucle
+        c = rng.choice(K, p=prob_fn(*claves de la fila)); j = rng.choice(tamanos[c])
+    sobre el mismo Generator (PCG64), que queda en el mismo estado.
+
+    Consumo del flujo en bruto (como edades._sample_group): choice(p=) usa un uint64 completo
+    (random()) y choice(n) un uint32 de Lemire; next_uint32 parte cada uint64 en (bajo, alto) y
+    guarda el alto para la siguiente llamada. Una fila en la que Lemire rechazaría (o n = 1, que
+    no consume) se hace por la vía escalar y se sigue vectorizado desde el estado resultante.
+    """
+    codigos, P, cdf = _tabla_probabilidades(prob_fn, claves)
+    tamanos = np.asarray(tamanos, dtype=np.uint64)
+    bg = rng.bit_generator
+    n = len(codigos)
+    cat = np.empty(n, dtype=np.int64)
+    elem = np.empty(n, dtype=np.int64)
+
+    i = 0
+    while i < n:
+        inicio = bg.state
+        guardado = int(inicio["has_uint32"])  # 1: el primer uint32 ya está guardado
+        m = n - i
+        r = np.arange(m, dtype=np.int64)
+        q = r - guardado                                        # nº de uint32 nuevo de cada fila
+        pos = r + np.maximum(0, (q + 1) // 2)                   # palabra del random() de cada fila
+        raw = bg.random_raw(m + max(0, (m - guardado + 1) // 2))
+
+        c = (cdf[codigos[i:]] <= ((raw[pos] >> np.uint64(11)) * _DOBLE)[:, None]).sum(axis=1)
+        x = np.full(m, inicio["uinteger"], dtype=np.uint64)
+        bajo = (q >= 0) & (q % 2 == 0)
+        alto = np.flatnonzero((q >= 0) & (q % 2 == 1))
+        x[bajo] = raw[pos[bajo] + 1] & _MASK32
+        x[alto] = raw[pos[alto - 1] + 1] >> np.uint64(32)
+
+        span = tamanos[c]
+        mult = x * span
+        umbral = (np.uint64(2**32) - span) % span
+        malas = np.flatnonzero(((mult & _MASK32) < umbral) | (span == 1))
+        k = int(malas[0]) if len(malas) else m
+        cat[i:i + k] = c[:k]
+        elem[i:i + k] = (mult[:k] >> np.uint64(32)).astype(np.int64)
+
+        # estado tras las k primeras filas: palabras consumidas y uint32 guardado
+        if k < m:
+            bg.state = inicio
+            bg.random_raw(int(pos[k]))
+        estado, f = bg.state, k - guardado
+        if f >= 0:
+            estado["has_uint32"] = f % 2
+        if f > 0:  # alto de la última palabra nueva (se queda aunque ya se haya usado)
+            g = f - 1 if f % 2 else f - 2
+            estado["uinteger"] = int(raw[pos[g + guardado] + 1] >> np.uint64(32))
+        bg.state = estado
+        i += k
+        if k < m:
+            cat[i] = rng.choice(P.shape[1], p=P[codigos[i]])
+            elem[i] = rng.choice(int(tamanos[cat[i]]))
+            i += 1
+    return cat, elem
+
+
+# 3) Agregados por cliente
+
+def moda_por_grupo(claves: pd.Series, valores: pd.Series) -> pd.Series:
+    """
+    Moda de `valores` por clave (la menor si hay empate, como Series.mode().iat[0]). Índice:
+    claves no nulas en orden de primera aparición; NaN si la clave solo tiene valores nulos.
+    """
+    d = pd.DataFrame({"k": claves.to_numpy(dtype=object), "v": valores.to_numpy(dtype=object)})
+    d = d[d["k"].notna()]
+    orden = pd.unique(d["k"])
+    n = d[d["v"].notna()].groupby(["k", "v"], sort=False).size().rename("n").reset_index()
+    n = n.sort_values(["n", "v"], ascending=[False, True], kind="stable").drop_duplicates("k")
+    return n.set_index("k")["v"].reindex(orden)
+
+
+# 4) Aleatoriedad determinista por clave + normales truncadas
+
+def semillas_md5(claves: pd.Series) -> np.ndarray:
+    """Semilla por clave: 32 bits altos del MD5 de str(clave)."""
+    return np.fromiter(
+        (int(hashlib.md5(str(k).encode("utf-8")).hexdigest()[:8], 16) for k in claves),
+        dtype=np.int64, count=len(claves),
+    )
+
+def uniformes_por_clave(claves: pd.Series, n: int) -> np.ndarray:
+    """n uniformes en (0, 1) por clave (filas), deterministas: SimpleLCG sembrado con semillas_md5."""
+    return minstd_rands(semillas_md5(claves), n)
+
+def normal_truncada(u: np.ndarray, low, high, mean, sd) -> np.ndarray:
+    """Normal(mean, sd) truncada a [low, high] por CDF inversa: un valor por uniforme."""
+    a = ndtr((np.asarray(low, dtype=float) - mean) / sd)
+    b = ndtr((np.asarray(high, dtype=float) - mean) / sd)
+    return np.clip(mean + sd * ndtri(a + np.asarray(u) * (b - a)), low, high)
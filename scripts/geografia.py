@@ -11,16 +11,26 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date, datetime as _dt
-from typing import Dict, Tuple, Optional, Any
-import math, hashlib
+from bisect import bisect_left, bisect_right
+from functools import cached_property, lru_cache
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Tuple, Optional, Any, Sequence
+import math, hashlib, json, os
 import numbers
 
+import numpy as np
+
 
 # 0) Parámetros globales
 
 PROJECT_START = date(2017, 8, 1)
 PROJECT_END   = date(2025, 9, 30)  # inclusive
 PROJECT_SEED  = "ropa:v4.4"  # cambia para otra simulación
+RNG_MODE      = "legacy"     # "legacy": SHA-256 por clave (datasets históricos) | "counter": SplitMix64 vectorizable
+
+# Caché en disco de la tabla de pesos precalculada (una por PROJECT_SEED + parámetros)
+CACHE_DIR = Path(os.environ.get("ROPA_CACHE_DIR", Path(__file__).resolve().parent.parent / "data" / "cache"))
 
 # Amplitudes de aleatoriedad (pueden afinarse)
 BASE_JITTER_PROV   = 0.02   # ±2% multiplicativo sobre pesos intra-CCAA
@@ -122,20 +132,105 @@ CRECIMIENTO_PRE_APERTURA: Dict[str, Dict[int, float]] = {
 # Utilidades de aleatoriedad determinista
 
 
+# Cada sorteo se identifica por una clave estructurada (stream, parte1, parte2, ...), p.ej.
+# ("drift-prov", "Madrid", 202105). En modo "legacy" se une con ":" y se hashea con SHA-256
+# (idéntico a las claves f-string históricas); en modo "counter" se mezcla como enteros de
+# 64 bits con SplitMix64, lo que permite sortear arrays completos con NumPy.
+
+_MASK64 = (1 << 64) - 1
+_INV_2_53 = 1.0 / float(1 << 53)
+
 def _hash_to_float01(key: str) -> float:
     h = hashlib.sha256((PROJECT_SEED + "|" + key).encode("utf-8")).digest()
     n = int.from_bytes(h[:8], "big")
     return (n & ((1 << 53) - 1)) / float(1 << 53)  # [0,1)
 
-def _randu(key: str, a: float = 0.0, b: float = 1.0) -> float:
-    return a + (b - a) * _hash_to_float01(key)
+@lru_cache(maxsize=65536)
+def _id64(s: str) -> int:
+    """Entero estable de 64 bits para una parte textual de la clave (provincia, stream...)."""
+    return int.from_bytes(hashlib.sha256(s.encode("utf-8")).digest()[:8], "big")
+
+def _as_int64(p: Any) -> int:
+    if type(p) is int:
+        return p & _MASK64
+    if type(p) is str:
+        return _id64(p)
+    if isinstance(p, numbers.Integral):
+        return int(p) & _MASK64
+    return _id64(str(p))
+
+def _splitmix64(x: int) -> int:
+    z = (x + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+def _splitmix64_np(x: np.ndarray) -> np.ndarray:
+    z = x + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+@lru_cache(maxsize=1024)
+def _counter_root_seed(seed: str, stream: str) -> int:
+    return _splitmix64(_id64(seed) ^ _id64(stream))
+
+def _counter_root(stream: str) -> int:
+    return _counter_root_seed(PROJECT_SEED, stream)
+
+def _randu(clave: Tuple, a: float = 0.0, b: float = 1.0) -> float:
+    """Uniforme en [a, b) para la clave (stream, *partes)."""
+    if RNG_MODE == "counter":
+        x = _counter_root(clave[0])
+        for p in clave[1:]:
+            x = _splitmix64(x ^ _as_int64(p))
+        return a + (b - a) * ((x >> 11) * _INV_2_53)
+    return a + (b - a) * _hash_to_float01(":".join(map(str, clave)))
+
+_VEC_MIN = 64
+
+def _es_vector(p: Any) -> bool:
+    return isinstance(p, (list, tuple, np.ndarray))
+
+def _as_list(p: Any) -> list:
+    return p.tolist() if isinstance(p, np.ndarray) else list(p)
+
+def _as_uint64_np(p: Any, n: int) -> np.ndarray:
+    if not _es_vector(p):
+        return np.full(n, _as_int64(p), dtype=np.uint64)
+    if isinstance(p, np.ndarray) and p.dtype.kind in "iu":
+        return p.astype(np.uint64)
+    return np.fromiter((_as_int64(v) for v in _as_list(p)), dtype=np.uint64, count=n)
+
+def _randu_vec(clave: Tuple, a: float = 0.0, b: float = 1.0) -> np.ndarray:
+    """
+    Versión vectorizada de _randu: las partes que son listas/arrays (misma longitud)
+    se recorren elemento a elemento y el resto se repite. Mismos valores que el escalar.
+    """
+    n = max(len(p) for p in clave if _es_vector(p))
+    if RNG_MODE == "counter" and n < _VEC_MIN:  # vectores cortos: NumPy no compensa
+        cols = [_as_list(p) if _es_vector(p) else [p] * n for p in clave]
+        return np.fromiter((_randu(k, a, b) for k in zip(*cols)), dtype=np.float64, count=n)
+    if RNG_MODE == "counter":
+        x = np.full(n, _counter_root(clave[0]), dtype=np.uint64)
+        for p in clave[1:]:
+            x = _splitmix64_np(x ^ _as_uint64_np(p, n))
+        u = (x >> np.uint64(11)).astype(np.float64) * _INV_2_53
+    else:
+        cols = [list(map(str, _as_list(p))) if _es_vector(p) else [str(p)] * n for p in clave]
+        u = np.fromiter((_hash_to_float01(":".join(k)) for k in zip(*cols)), dtype=np.float64, count=n)
+    return a + (b - a) * u
 
-def _randn(key: str, mean: float = 0.0, sd: float = 1.0) -> float:
-    u1 = max(_randu(key + ":u1"), 1e-12)
-    u2 = _randu(key + ":u2")
+def _randn(clave: Tuple, mean: float = 0.0, sd: float = 1.0) -> float:
+    u1 = max(_randu(clave + ("u1",)), 1e-12)
+    u2 = _randu(clave + ("u2",))
     z = math.sqrt(-2.0 * math.log(u1)) * math.cos(2.0 * math.pi * u2)
     return mean + sd * z
 
+def _ym(y: int, m: int) -> int:
+    """Parte 'YYYYMM' de las claves (str(_ym) == f"{y:04d}{m:02d}")."""
+    return y * 100 + m
+
 def _clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
 
@@ -161,16 +256,15 @@ def _normalize(d: Dict[str, float]) -> Dict[str, float]:
     return {k: max(v, 0.0) / s for k, v in d.items()}
 
 def _jitter_dict_mult(d: Dict[str, float], label: str, amp: float) -> Dict[str, float]:
-    out = {}
-    for k, v in d.items():
-        eps = _randu(f"jitter:{label}:{k}", -amp, amp)
-        out[k] = v * (1.0 + eps)
+    keys = list(d)
+    eps = _randu_vec(("jitter", label, keys), -amp, amp)
+    out = {k: d[k] * (1.0 + e) for k, e in zip(keys, eps.tolist())}
     return _normalize(out)
 
 _ANCHOR_CACHE: Dict[str, Dict[str, float]] = {}
 
 def _get_anchor(year_label: str) -> Dict[str, float]:
-    cache_key = f"anchor:{year_label}"
+    cache_key = f"anchor:{year_label}:{PROJECT_SEED}:{RNG_MODE}"
     if cache_key in _ANCHOR_CACHE:
         return _ANCHOR_CACHE[cache_key]
     base = PESOS_CCAA_ANCLA_2017 if year_label == "2017" else PESOS_CCAA_ANCLA_2025
@@ -194,10 +288,9 @@ def _interp_ccaa_weights(dt: date) -> Dict[str, float]:
     mix = {k: (1.0 - t) * a2017.get(k, 0.0) + t * a2025.get(k, 0.0) for k in a2017.keys() | a2025.keys()}
     mix = _normalize(mix)
     y, m = _month_index(dt)
-    out = {}
-    for ccaa, w in mix.items():
-        eps = _randu(f"drift-ccaa:{ccaa}:{y:04d}{m:02d}", -MONTHLY_DRIFT_PROV/2, MONTHLY_DRIFT_PROV/2)
-        out[ccaa] = w * (1.0 + eps)
+    keys = list(mix)
+    eps = _randu_vec(("drift-ccaa", keys, _ym(y, m)), -MONTHLY_DRIFT_PROV/2, MONTHLY_DRIFT_PROV/2)
+    out = {ccaa: mix[ccaa] * (1.0 + e) for ccaa, e in zip(keys, eps.tolist())}
     return _normalize(out)
 
 
@@ -205,16 +298,12 @@ def _interp_ccaa_weights(dt: date) -> Dict[str, float]:
 
 def _intra_ccaa_weights(ccaa: str, dt: date) -> Dict[str, float]:
     base = PESOS_PROVINCIAS_BASE[ccaa]
-    jittered = {}
-    for prov, w in base.items():
-        eps = _randu(f"prov-jitter:{prov}", -BASE_JITTER_PROV, BASE_JITTER_PROV)
-        jittered[prov] = w * (1.0 + eps)
-    jittered = _normalize(jittered)
+    provs = list(base)
+    eps = _randu_vec(("prov-jitter", provs), -BASE_JITTER_PROV, BASE_JITTER_PROV)
+    jittered = _normalize({prov: base[prov] * (1.0 + e) for prov, e in zip(provs, eps.tolist())})
     y, m = _month_index(dt)
-    out = {}
-    for prov, w in jittered.items():
-        eps = _randu(f"drift-prov:{prov}:{y:04d}{m:02d}", -MONTHLY_DRIFT_PROV/2, MONTHLY_DRIFT_PROV/2)
-        out[prov] = w * (1.0 + eps)
+    eps = _randu_vec(("drift-prov", provs, _ym(y, m)), -MONTHLY_DRIFT_PROV/2, MONTHLY_DRIFT_PROV/2)
+    out = {prov: jittered[prov] * (1.0 + e) for prov, e in zip(provs, eps.tolist())}
     return _normalize(out)
 
 
@@ -227,7 +316,7 @@ def _apply_pre_open_growth(prov_weights: Dict[str, float], dt: date) -> Dict[str
         if y in plan:
             target = plan[y]
             month_factor = 1.0 + (target - 1.0) * (dt.month - 1) / 11.0
-            eps = _randu(f"preopen:{prov}:{y:04d}{dt.month:02d}", -0.01, 0.01)
+            eps = _randu(("preopen", prov, _ym(y, dt.month)), -0.01, 0.01)
             scalers[prov] = max(0.0, month_factor * (1.0 + eps))
     if not scalers:
         return prov_weights
@@ -243,62 +332,131 @@ def _apply_pre_open_growth(prov_weights: Dict[str, float], dt: date) -> Dict[str
 
 # Aplicación de reducciones por tiendas y redistribución con perturbaciones
 
+@lru_cache(maxsize=None)
+def _parse_fecha(s: str) -> date:
+    return _dt.strptime(s, "%Y-%m-%d").date()
+
 def _fecha_apertura(prov: str) -> Optional[date]:
     s = TIENDAS_FISICAS.get(prov)
     if not s:
         return None
-    return _dt.strptime(s, "%Y-%m-%d").date()
+    return _parse_fecha(s)
 
 def _split_ccaa_amount(prov: str, dt: date) -> float:
     y, m = _month_index(dt)
     lo = SPLIT_CCAA_MEAN - SPLIT_CCAA_WIDTH/2
     hi = SPLIT_CCAA_MEAN + SPLIT_CCAA_WIDTH/2
-    return _clamp(_randu(f"split:{prov}:{y:04d}{m:02d}", lo, hi), lo, hi)
+    return _clamp(_randu(("split", prov, _ym(y, m)), lo, hi), lo, hi)
 
-def _perturb_vector(base: Dict[str, float], label: str) -> Dict[str, float]:
+def _perturb_vector(base: Dict[str, float], label: Tuple) -> Dict[str, float]:
     if not base:
         return {}
-    out = {}
-    for k, v in base.items():
-        eps = _randu(f"ring:{label}:{k}", -PERTURB_WITHIN_RING, PERTURB_WITHIN_RING)
-        out[k] = max(0.0, v * (1.0 + eps))
+    keys = list(base)
+    eps = _randu_vec(("ring",) + label + (keys,), -PERTURB_WITHIN_RING, PERTURB_WITHIN_RING)
+    out = {k: max(0.0, base[k] * (1.0 + e)) for k, e in zip(keys, eps.tolist())}
     return _normalize(out)
 
-def _apply_store_reductions(prov_weights: Dict[str, float], dt: date) -> Dict[str, float]:
-    current = prov_weights.copy()
-    base_intra_by_ccaa = {ccaa: PESOS_PROVINCIAS_BASE[ccaa].copy() for ccaa in PESOS_PROVINCIAS_BASE}
-    activos = [p for p in REDUCCION_PROVINCIA.keys() if (_fecha_apertura(p) and _fecha_apertura(p) <= dt)]
-    for prov in sorted(activos):
-        redu = REDUCCION_PROVINCIA[prov]
-        if prov not in current:
+# Plan de tiendas precalculado: índice fijo de provincias y, por tienda, sus receptores.
+#   - Anillo CCAA: pesos base intra-CCAA perturbados (no dependen del mes) → fijos
+#   - Anillo país: índices de receptores y su perturbación fija; el peso se toma del mes
+# La redistribución queda en unas pocas operaciones NumPy por tienda (para todos los meses a la vez).
+
+PROVINCIAS: Tuple[str, ...] = tuple(PROV_TO_CCAA)
+IDX_PROVINCIA: Dict[str, int] = {p: i for i, p in enumerate(PROVINCIAS)}
+
+@dataclass(frozen=True)
+class _PlanTienda:
+    prov: str
+    idx: int
+    apertura: date
+    reduccion: float
+    idx_ccaa: np.ndarray  # receptores del anillo CCAA
+    w_ccaa: np.ndarray    # pesos ya perturbados y normalizados
+    idx_pais: np.ndarray  # receptores del anillo país
+    eps_pais: np.ndarray  # perturbación relativa por receptor
+
+_PLAN_CACHE: Dict[Tuple, Tuple[_PlanTienda, ...]] = {}
+
+def _plan_tiendas() -> Tuple[_PlanTienda, ...]:
+    clave = (PROJECT_SEED, RNG_MODE, tuple(sorted(TIENDAS_FISICAS.items())), tuple(sorted(REDUCCION_PROVINCIA.items())))
+    if clave in _PLAN_CACHE:
+        return _PLAN_CACHE[clave]
+    planes = []
+    for prov in sorted(REDUCCION_PROVINCIA):
+        fa = _fecha_apertura(prov)
+        if fa is None or prov not in IDX_PROVINCIA:
+            continue
+        ccaa = PROV_TO_CCAA[prov]
+        rc_ccaa = {q: w for q, w in PESOS_PROVINCIAS_BASE[ccaa].items() if q != prov}
+        rc_ccaa = _perturb_vector(rc_ccaa, (prov, "ccaa", ccaa))
+
+        excluded_ccaa = None
+        if _is_island(ccaa):
+            excluded_ccaa = ("Baleares" if ccaa == "Canarias" else "Canarias")
+        pais = [q for q in PROVINCIAS if PROV_TO_CCAA[q] != ccaa and PROV_TO_CCAA[q] != excluded_ccaa]
+        eps_pais = _randu_vec(("ring", prov, "country", pais), -PERTURB_WITHIN_RING, PERTURB_WITHIN_RING) \
+            if pais else np.zeros(0)
+
+        planes.append(_PlanTienda(
+            prov=prov,
+            idx=IDX_PROVINCIA[prov],
+            apertura=fa,
+            reduccion=REDUCCION_PROVINCIA[prov],
+            idx_ccaa=np.array([IDX_PROVINCIA[q] for q in rc_ccaa], dtype=np.intp),
+            w_ccaa=np.array(list(rc_ccaa.values()), dtype=np.float64),
+            idx_pais=np.array([IDX_PROVINCIA[q] for q in pais], dtype=np.intp),
+            eps_pais=eps_pais,
+        ))
+    _PLAN_CACHE[clave] = tuple(planes)
+    return _PLAN_CACHE[clave]
+
+def _normalize_filas(w: np.ndarray) -> np.ndarray:
+    """_normalize por filas (o sobre un vector 1-D)."""
+    w = np.maximum(w, 0.0)
+    s = w.sum(axis=-1, keepdims=True)
+    if (s <= 0).any():
+        raise ValueError("Normalización fallida: suma <= 0")
+    return w / s
+
+def _reducciones_tiendas(pre: np.ndarray, fechas: Sequence[date]) -> np.ndarray:
+    """
+    Reducciones por tienda para una matriz (fechas × PROVINCIAS).
+    Las tiendas se aplican en orden y cada una opera a la vez sobre todas las filas en que está abierta.
+    """
+    current = pre.copy()
+    ym = np.array([_ym(f.year, f.month) for f in fechas], dtype=np.int64)
+    lo = SPLIT_CCAA_MEAN - SPLIT_CCAA_WIDTH/2
+    hi = SPLIT_CCAA_MEAN + SPLIT_CCAA_WIDTH/2
+    for t in _plan_tiendas():
+        filas = np.array([i for i, f in enumerate(fechas) if t.apertura <= f], dtype=np.intp)
+        if not len(filas):
             continue
-        old = current[prov]
-        new = old * (1.0 - redu)
+        old = current[filas, t.idx]
+        new = old * (1.0 - t.reduccion)
         delta = old - new
-        if delta <= 0:
+        ok = delta > 0
+        filas, new, delta = filas[ok], new[ok], delta[ok]
+        if not len(filas):
             continue
-        current[prov] = new
+        current[filas, t.idx] = new
 
-        ccaa = PROV_TO_CCAA[prov]
-        split_ccaa = _split_ccaa_amount(prov, dt)
+        split_ccaa = np.clip(_randu_vec(("split", t.prov, ym[filas]), lo, hi), lo, hi)
         amt_ccaa = delta * split_ccaa
         amt_country = delta - amt_ccaa
 
-        rc_ccaa = {q: base_intra_by_ccaa[ccaa][q] for q in base_intra_by_ccaa[ccaa] if q != prov}
-        rc_ccaa = _perturb_vector(rc_ccaa, f"{prov}:ccaa:{ccaa}")
-
-        excluded_ccaa = None
-        if _is_island(ccaa):
-            excluded_ccaa = ("Baleares" if ccaa == "Canarias" else "Canarias")
-        rc_country = {q: current[q] for q in current if PROV_TO_CCAA[q] != ccaa and PROV_TO_CCAA[q] != excluded_ccaa}
-        rc_country = _perturb_vector(rc_country, f"{prov}:country")
+        if len(t.idx_ccaa):
+            current[np.ix_(filas, t.idx_ccaa)] += amt_ccaa[:, None] * t.w_ccaa
+        if len(t.idx_pais):
+            sub = np.ix_(filas, t.idx_pais)
+            rc_country = _normalize_filas(current[sub] * (1.0 + t.eps_pais))
+            current[sub] += amt_country[:, None] * rc_country
 
-        for dest, w in rc_ccaa.items():
-            current[dest] += amt_ccaa * w
-        for dest, w in rc_country.items():
-            current[dest] += amt_country * w
+    return _normalize_filas(current)
 
-    return _normalize(current)
+def _apply_store_reductions(prov_weights: Dict[str, float], dt: date) -> Dict[str, float]:
+    vec = np.array([[prov_weights.get(p, 0.0) for p in PROVINCIAS]], dtype=np.float64)
+    out = _reducciones_tiendas(vec, [dt])[0]
+    return dict(zip(PROVINCIAS, out.tolist()))
 
 
 # Suelos/techos relativos al peso previo a reducción del mes
@@ -313,9 +471,113 @@ def _apply_floor_ceil(current: Dict[str, float], pre_reduce: Dict[str, float]) -
     return _normalize(out)
 
 
+# Motor de pesos sobre arrays
+#   - Provincias (orden PROVINCIAS) y CCAA con ids enteros fijos
+#   - Todas las fases sobre matrices float64 (fechas × provincias), todas las fechas en una pasada
+#   - Las funciones por dict de arriba quedan como implementación de referencia (verificar_motor)
+
+CCAAS: Tuple[str, ...] = tuple(PESOS_PROVINCIAS_BASE)
+
+class MotorPesos:
+    """Pipeline completo de pesos online para muchas fechas a la vez."""
+
+    def __init__(self):
+        self.provincias = PROVINCIAS
+        self.ccaas = CCAAS
+        idx_ccaa = {c: i for i, c in enumerate(CCAAS)}
+        self.ccaa_id = np.array([idx_ccaa[PROV_TO_CCAA[p]] for p in PROVINCIAS], dtype=np.intp)
+        self._onehot = np.zeros((len(PROVINCIAS), len(CCAAS)))
+        self._onehot[np.arange(len(PROVINCIAS)), self.ccaa_id] = 1.0
+
+        a2017, a2025 = _get_anchor("2017"), _get_anchor("2025")
+        self.ancla_2017 = np.array([a2017.get(c, 0.0) for c in CCAAS])
+        self.ancla_2025 = np.array([a2025.get(c, 0.0) for c in CCAAS])
+
+        base = np.array([PESOS_PROVINCIAS_BASE[PROV_TO_CCAA[p]][p] for p in PROVINCIAS])
+        eps = _randu_vec(("prov-jitter", list(PROVINCIAS)), -BASE_JITTER_PROV, BASE_JITTER_PROV)
+        self.intra_jitter = self._normalize_ccaa(base * (1.0 + eps))
+
+        # Rango del proyecto precalculado (mismas filas que la tabla de pesos)
+        self.fechas = _fechas_tabla()
+        self.pre, self.final = self.calcular(self.fechas)
+        self.pre.flags.writeable = False
+        self.final.flags.writeable = False
+
+    def _normalize_ccaa(self, w: np.ndarray) -> np.ndarray:
+        """Normaliza cada CCAA a 1.0 dentro de cada fila."""
+        w = np.maximum(w, 0.0)
+        s = w @ self._onehot
+        if (s <= 0).any():
+            raise ValueError("Normalización fallida: suma <= 0")
+        return w / s[..., self.ccaa_id]
+
+    def calcular(self, fechas: Sequence[date]) -> Tuple[np.ndarray, np.ndarray]:
+        """Devuelve (pre_reducción, final) como matrices (fechas × provincias)."""
+        n, n_ccaa, n_prov = len(fechas), len(self.ccaas), len(self.provincias)
+        ym = np.array([_ym(f.year, f.month) for f in fechas], dtype=np.int64)
+
+        # CCAA: interpolación de anclas + deriva mensual
+        total_months = (PROJECT_END.year - PROJECT_START.year) * 12 + (PROJECT_END.month - PROJECT_START.month)
+        cur_months = np.array([(f.year - PROJECT_START.year) * 12 + (f.month - PROJECT_START.month) for f in fechas])
+        t = np.clip(cur_months / max(total_months, 1), 0.0, 1.0)[:, None]
+        mix = _normalize_filas((1.0 - t) * self.ancla_2017 + t * self.ancla_2025)
+        eps = _randu_vec(("drift-ccaa", list(self.ccaas) * n, np.repeat(ym, n_ccaa)),
+                         -MONTHLY_DRIFT_PROV/2, MONTHLY_DRIFT_PROV/2).reshape(n, n_ccaa)
+        ccaa_w = _normalize_filas(mix * (1.0 + eps))
+
+        # Provincias: jitter base (fijo) + deriva mensual, renormalizado por CCAA
+        eps = _randu_vec(("drift-prov", list(self.provincias) * n, np.repeat(ym, n_prov)),
+                         -MONTHLY_DRIFT_PROV/2, MONTHLY_DRIFT_PROV/2).reshape(n, n_prov)
+        intra = self._normalize_ccaa(self.intra_jitter * (1.0 + eps))
+        pre = _normalize_filas(intra * ccaa_w[:, self.ccaa_id])
+
+        # Growth pre-apertura
+        escaladas = np.zeros(n, dtype=bool)
+        for prov, plan in CRECIMIENTO_PRE_APERTURA.items():
+            filas = np.array([i for i, f in enumerate(fechas) if f.year in plan], dtype=np.intp)
+            if not len(filas):
+                continue
+            escaladas[filas] = True
+            if prov not in IDX_PROVINCIA:
+                continue
+            target = np.array([plan[fechas[i].year] for i in filas])
+            month_factor = 1.0 + (target - 1.0) * (np.array([fechas[i].month for i in filas]) - 1) / 11.0
+            eps = _randu_vec(("preopen", prov, ym[filas]), -0.01, 0.01)
+            pre[filas, IDX_PROVINCIA[prov]] *= np.maximum(0.0, month_factor * (1.0 + eps))
+        if escaladas.any():
+            s = pre[escaladas].sum(axis=1, keepdims=True)
+            pre[escaladas] = np.where(s > 0, pre[escaladas] / s, pre[escaladas])
+
+        # Tiendas + suelos/techos relativos al peso previo a reducción
+        post = _reducciones_tiendas(pre, fechas)
+        final = _normalize_filas(np.clip(post, FLOOR_RATIO * pre, CEIL_RATIO * pre))
+        return pre, final
+
+    def fila(self, dt: date) -> Tuple[np.ndarray, np.ndarray]:
+        """(pre, final) vigentes en dt; fuera del rango del proyecto se calculan al vuelo."""
+        if self.fechas[0] <= dt and (dt.year, dt.month) <= (PROJECT_END.year, PROJECT_END.month):
+            i = bisect_right(self.fechas, dt) - 1
+            return self.pre[i], self.final[i]
+        pre, final = self.calcular([dt])
+        return pre[0], final[0]
+
+_MOTOR: Dict[Tuple[str, str], MotorPesos] = {}  # por (PROJECT_SEED, RNG_MODE)
+
+def motor_pesos() -> MotorPesos:
+    motor = _MOTOR.get((PROJECT_SEED, RNG_MODE))
+    if motor is None:
+        motor = _MOTOR[(PROJECT_SEED, RNG_MODE)] = MotorPesos()
+    return motor
+
+
 # API principal
 
 def pesos_online_por_fecha(dt: date) -> Dict[str, float]:
+    _, final = motor_pesos().fila(dt)
+    return dict(zip(PROVINCIAS, final.tolist()))
+
+def _pesos_online_por_fecha_dict(dt: date) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Implementación de referencia por dicts: devuelve (pre_reducción, final)."""
     ccaa_w = _interp_ccaa_weights(dt)
     prov_intra: Dict[str, float] = {}
     for ccaa in PESOS_PROVINCIAS_BASE.keys():
@@ -325,7 +587,117 @@ def pesos_online_por_fecha(dt: date) -> Dict[str, float]:
     prov_pre_reduce = _apply_pre_open_growth(_normalize(prov_intra), dt)
     prov_post_reduce = _apply_store_reductions(prov_pre_reduce, dt)
     final = _apply_floor_ceil(prov_post_reduce, prov_pre_reduce)
-    return final
+    return prov_pre_reduce, final
+
+
+# Tabla precalculada de pesos (PROJECT_START..PROJECT_END)
+#   - Una fila por mes con la distribución acumulada sobre las provincias ordenadas
+#   - Fila extra en los meses con apertura de tienda a mitad de mes (el peso cambia ese día)
+#   - Se construye una vez por PROJECT_SEED y se guarda en CACHE_DIR
+
+_TABLA_VERSION = 3
+
+@dataclass(frozen=True)
+class TablaPesos:
+    provincias: Tuple[str, ...]
+    fechas: Tuple[date, ...]  # inicio de vigencia de cada fila (orden creciente)
+    acumulados: Tuple[Tuple[float, ...], ...]
+
+    def acumulado(self, dt: date) -> Optional[Tuple[float, ...]]:
+        """Distribución acumulada vigente en dt, o None si dt cae fuera del rango del proyecto."""
+        if dt < self.fechas[0] or (dt.year, dt.month) > (PROJECT_END.year, PROJECT_END.month):
+            return None
+        return self.acumulados[bisect_right(self.fechas, dt) - 1]
+
+    @cached_property
+    def matriz(self) -> np.ndarray:
+        """Acumulados como matriz (filas × provincias) de solo lectura."""
+        m = np.array(self.acumulados, dtype=np.float64)
+        m.flags.writeable = False
+        return m
+
+    @cached_property
+    def fechas_np(self) -> np.ndarray:
+        f = np.array(self.fechas, dtype="datetime64[D]")
+        f.flags.writeable = False
+        return f
+
+def _fechas_tabla() -> Tuple[date, ...]:
+    fechas = []
+    y, m = PROJECT_START.year, PROJECT_START.month
+    while (y, m) <= (PROJECT_END.year, PROJECT_END.month):
+        fechas.append(date(y, m, 1))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    for prov in REDUCCION_PROVINCIA:
+        fa = _fecha_apertura(prov)
+        if fa is not None and fa.day > 1 and fechas[0] <= fa and (fa.year, fa.month) <= (PROJECT_END.year, PROJECT_END.month):
+            fechas.append(fa)
+    return tuple(sorted(fechas))
+
+def _clave_tabla() -> str:
+    params = repr((
+        _TABLA_VERSION, PROJECT_SEED, RNG_MODE, PROJECT_START, PROJECT_END,
+        BASE_JITTER_PROV, ANCHOR_JITTER_CCAA, MONTHLY_DRIFT_PROV, SPLIT_CCAA_MEAN, SPLIT_CCAA_WIDTH,
+        PERTURB_WITHIN_RING, FLOOR_RATIO, CEIL_RATIO, REDUCCION_PROVINCIA, PESOS_PROVINCIAS_BASE,
+        PESOS_CCAA_ANCLA_2017, PESOS_CCAA_ANCLA_2025, TIENDAS_FISICAS, CRECIMIENTO_PRE_APERTURA,
+    ))
+    return hashlib.sha256(params.encode("utf-8")).hexdigest()[:16]
+
+def _construir_tabla_pesos() -> TablaPesos:
+    motor = motor_pesos()
+    provincias = tuple(sorted(PROVINCIAS))
+    orden = [IDX_PROVINCIA[p] for p in provincias]
+    acumulados = np.cumsum(motor.final[:, orden], axis=1)
+    return TablaPesos(provincias, motor.fechas, tuple(tuple(row) for row in acumulados.tolist()))
+
+def _leer_tabla(path: Path, clave: str) -> Optional[TablaPesos]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            raw = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if raw.get("clave") != clave:
+        return None
+    return TablaPesos(
+        provincias=tuple(raw["provincias"]),
+        fechas=tuple(date.fromisoformat(f) for f in raw["fechas"]),
+        acumulados=tuple(tuple(row) for row in raw["acumulados"]),
+    )
+
+def _guardar_tabla(path: Path, clave: str, tabla: TablaPesos) -> None:
+    raw = {
+        "clave": clave,
+        "seed": PROJECT_SEED,
+        "rng_mode": RNG_MODE,
+        "provincias": list(tabla.provincias),
+        "fechas": [f.isoformat() for f in tabla.fechas],
+        "acumulados": [list(row) for row in tabla.acumulados],
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(raw, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # la caché en disco es opcional
+
+_TABLA_PESOS: Dict[Tuple[str, str], TablaPesos] = {}  # por (PROJECT_SEED, RNG_MODE)
+
+def tabla_pesos(usar_disco: bool = True) -> TablaPesos:
+    """Tabla precalculada para PROJECT_SEED/RNG_MODE (memoria → disco → construcción)."""
+    tabla = _TABLA_PESOS.get((PROJECT_SEED, RNG_MODE))
+    if tabla is not None:
+        return tabla
+    clave = _clave_tabla()
+    path = CACHE_DIR / f"pesos_online_{clave}.json"
+    tabla = _leer_tabla(path, clave) if usar_disco else None
+    if tabla is None:
+        tabla = _construir_tabla_pesos()
+        if usar_disco:
+            _guardar_tabla(path, clave, tabla)
+    _TABLA_PESOS[(PROJECT_SEED, RNG_MODE)] = tabla
+    return tabla
 
 
 # asignar_provincia (compat extendida)
@@ -407,17 +779,17 @@ def asignar_provincia(*args, **kwargs):
     if key_id is None:
         key_id = "anon"
 
-    weights = pesos_online_por_fecha(dt)
-    items = sorted(weights.items())
-    u = _randu(f"pick:{key_id}:{dt.year:04d}{dt.month:02d}")
-
-    cum = 0.0
-    prov_sel = items[-1][0]
-    for prov, w in items:
-        cum += w
-        if u <= cum:
-            prov_sel = prov
-            break
+    u = _randu(("pick", key_id, _ym(dt.year, dt.month)))
+    tabla = tabla_pesos()
+    cum = tabla.acumulado(dt)
+    if cum is None:  # fuera del rango precalculado
+        provincias = tuple(sorted(PROV_TO_CCAA))
+        weights = pesos_online_por_fecha(dt)
+        cum = tuple(accumulate(weights[p] for p in provincias))
+    else:
+        provincias = tabla.provincias
+    idx = bisect_left(cum, u)
+    prov_sel = provincias[min(idx, len(provincias) - 1)]
     ccaa_sel = PROV_TO_CCAA[prov_sel]
 
     if return_only == 'provincia':
@@ -425,18 +797,78 @@ def asignar_provincia(*args, **kwargs):
     return prov_sel, ccaa_sel
 
 
+# asignar_provincias_batch (vectorizada)
+
+def _hash_pick_batch(ids, meses: np.ndarray) -> np.ndarray:
+    """
+    Reproduce _randu(("pick", id, YYYYMM)) para muchos clientes. En modo "counter" es un
+    único _randu_vec; en "legacy", un SHA-256 por clave reutilizando el prefijo ya hasheado.
+    """
+    if RNG_MODE == "counter":
+        ym = (meses // 12 + 1970) * 100 + meses % 12 + 1
+        return _randu_vec(("pick", ids, ym))
+    if isinstance(ids, np.ndarray):
+        ids = ids.tolist()
+    prefijo = hashlib.sha256((PROJECT_SEED + "|pick:").encode("utf-8"))
+    ym_txt = {int(k): f"{k // 12 + 1970:04d}{k % 12 + 1:02d}" for k in np.unique(meses)}
+    buf = bytearray(8 * len(ids))
+    for i, (cid, k) in enumerate(zip(ids, meses.tolist())):
+        h = prefijo.copy()
+        h.update(f"{cid}:{ym_txt[k]}".encode("utf-8"))
+        buf[8 * i:8 * i + 8] = h.digest()[:8]
+    n = np.frombuffer(bytes(buf), dtype=">u8").astype(np.uint64)
+    return (n & np.uint64((1 << 53) - 1)).astype(np.float64) / float(1 << 53)
+
+def asignar_provincias_batch(customer_ids, dates) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equivalente vectorizado de asignar_provincia(cliente_id=..., dt=...) para arrays de clientes
+    (y de asignar_provincia(year, period, random_state=id) con fechas a día 1).
+    - customer_ids: array/Series/lista de ids (se formatean igual que en el camino escalar)
+    - dates: fechas (date, datetime64, Timestamp o 'YYYY-MM-DD'); cuenta el día por las aperturas
+    Devuelve (provincias, comunidades) como arrays de objetos, idénticos al resultado escalar.
+    """
+    ids = np.asarray(customer_ids)
+    if ids.dtype.kind not in "iu":
+        ids = np.asarray(customer_ids, dtype=object).tolist()
+    dias = np.asarray(dates, dtype="datetime64[D]").reshape(-1)
+    if len(ids) != len(dias):
+        raise ValueError("customer_ids y dates deben tener la misma longitud")
+    if np.isnat(dias).any():
+        raise ValueError("dates contiene fechas nulas")
+
+    meses = dias.astype("datetime64[M]").astype(np.int64)
+    u = _hash_pick_batch(ids, meses)
+
+    tabla = tabla_pesos()
+    provincias = np.array(tabla.provincias, dtype=object)
+    ultimo_mes = (PROJECT_END.year - 1970) * 12 + PROJECT_END.month - 1
+    fila = np.searchsorted(tabla.fechas_np, dias, side="right") - 1
+    fila[(dias < tabla.fechas_np[0]) | (meses > ultimo_mes)] = -1
+
+    idx = np.empty(len(ids), dtype=np.int64)
+    orden = np.argsort(fila, kind="stable")
+    filas_unicas, inicios = np.unique(fila[orden], return_index=True)
+    limites = np.append(inicios, len(orden))
+    for f, a, b in zip(filas_unicas.tolist(), limites[:-1], limites[1:]):
+        sel = orden[a:b]
+        if f >= 0:
+            idx[sel] = np.searchsorted(tabla.matriz[f], u[sel], side="left")
+            continue
+        for d in np.unique(dias[sel]):  # fuera del rango precalculado
+            sub = sel[dias[sel] == d]
+            w = pesos_online_por_fecha(d.astype(date))
+            cum = np.fromiter(accumulate(w[p] for p in tabla.provincias), dtype=np.float64)
+            idx[sub] = np.searchsorted(cum, u[sub], side="left")
+
+    idx = np.minimum(idx, len(provincias) - 1)
+    ccaa = np.array([PROV_TO_CCAA[p] for p in tabla.provincias], dtype=object)
+    return provincias[idx], ccaa[idx]
+
+
 # Validaciones/debug
 
 def resumen_mes(dt: date) -> Dict[str, Any]:
-    ccaa = _interp_ccaa_weights(dt)
-    pre = {}
-    for c in PESOS_PROVINCIAS_BASE:
-        intra = _intra_ccaa_weights(c, dt)
-        for p, w in intra.items():
-            pre[p] = w * ccaa.get(c, 0.0)
-    pre = _apply_pre_open_growth(_normalize(pre), dt)
-    post = _apply_store_reductions(pre, dt)
-    final = _apply_floor_ceil(post, pre)
+    final = pesos_online_por_fecha(dt)
 
     suma = sum(final.values())
     activos = [p for p in REDUCCION_PROVINCIA if (_fecha_apertura(p) and _fecha_apertura(p) <= dt)]
@@ -448,7 +880,63 @@ def resumen_mes(dt: date) -> Dict[str, Any]:
         "top10": sorted(final.items(), key=lambda kv: kv[1], reverse=True)[:10],
     }
 
+def verificar_motor(tol: float = 1e-12) -> float:
+    """
+    Regresión: compara MotorPesos con la implementación por dicts en todas las filas del
+    proyecto (y un mes fuera de rango). Devuelve la diferencia máxima; error si supera tol.
+    """
+    motor = motor_pesos()
+    fechas = list(motor.fechas) + [date(PROJECT_END.year + 1, 1, 1)]
+    max_diff = 0.0
+    for f in fechas:
+        ref_pre, ref_final = _pesos_online_por_fecha_dict(f)
+        pre, final = motor.fila(f)
+        for ref, arr in ((ref_pre, pre), (ref_final, final)):
+            diff = max(abs(ref[p] - arr[i]) for i, p in enumerate(PROVINCIAS))
+            max_diff = max(max_diff, diff)
+            if diff > tol:
+                raise AssertionError(f"MotorPesos difiere de la referencia en {f}: {diff:.3e}")
+    return max_diff
+
+def benchmark_rng(n_clientes: int = 200_000, n_meses: int = 24) -> Dict[str, Dict[str, float]]:
+    """
+    Compara RNG_MODE "legacy" vs "counter" (segundos):
+      - tabla: construcción completa de la tabla de pesos (sin caché)
+      - batch: asignar_provincias_batch para n_clientes repartidos en n_meses
+      - sorteos: n_clientes uniformes sueltos con _randu_vec
+    """
+    import time
+    global RNG_MODE
+    modo_original = RNG_MODE
+    ids = np.arange(1, n_clientes + 1)
+    meses = np.datetime64(PROJECT_START, "M") + (ids % n_meses)
+    fechas = meses.astype("datetime64[D]")
+    out: Dict[str, Dict[str, float]] = {}
+    try:
+        for modo in ("legacy", "counter"):
+            RNG_MODE = modo
+            t0 = time.perf_counter()
+            _construir_tabla_pesos()
+            t1 = time.perf_counter()
+            asignar_provincias_batch(ids, fechas)
+            t2 = time.perf_counter()
+            _randu_vec(("bench", ids))
+            t3 = time.perf_counter()
+            out[modo] = {"tabla": t1 - t0, "batch": t2 - t1, "sorteos": t3 - t2}
+    finally:
+        RNG_MODE = modo_original
+    for modo, tiempos in out.items():
+        print(modo.ljust(8), "  ".join(f"{k}={v:.3f}s" for k, v in tiempos.items()))
+    return out
+
 if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        benchmark_rng()
+        sys.exit(0)
+    if "--check" in sys.argv:
+        print("max |motor - dict| =", verificar_motor())
+        sys.exit(0)
     for y, m in [(2018, 11), (2019, 6), (2020, 3), (2021, 10), (2022, 5), (2023, 6), (2024, 11), (2025, 4)]:
         dt = date(y, m, 1)
         print(resumen_mes(dt))
@@ -1,7 +1,11 @@
 from dataclasses import dataclass
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, Iterator, List, Mapping, Sequence, Union
 import math
 
+import numpy as np
+import pandas as pd
+
 from calendario import (
     build_project_months,
     PROJECT_START,
@@ -10,6 +14,7 @@ from calendario import (
     SimpleLCG,
     DEFAULT_OVERRIDES,
     black_friday_day,
+    minstd_first_rand,
 )
 
 @dataclass(frozen=True)
@@ -43,27 +48,23 @@ def _day_weights_for_month(year: int, month: int, dim: int) -> List[float]:
     Diciembre: refuerzo 10–24 y final de mes.
     """
     rng = SimpleLCG(stable_int_seed("day-bias", f"{year:04d}-{month:02d}"))
-    w = [1.0 for _ in range(dim)]
-
-    for i in range(dim):
-        w[i] *= 1.0 + (rng.rand() * 0.10 - 0.05)
+    # Los sorteos se consumen en bloques con rng.rand_array, en el mismo orden que rand() uno a uno
+    w = 1.0 * (1.0 + (rng.rand_array(dim) * 0.10 - 0.05))
 
     if month == 1:
         start = min(7, dim)
         length = min(14, max(1, dim - start + 1))
         bump = 1.10 + rng.rand() * 0.25
-        for d in range(start, start + length):
-            dist = d - start
-            decay = 1.0 - 0.30 * (dist / (length - 1 + 1e-9))
-            w[d - 1] *= bump * max(0.80, decay)
+        dist = np.arange(length)
+        decay = 1.0 - 0.30 * (dist / (length - 1 + 1e-9))
+        w[start - 1:start - 1 + length] *= bump * np.maximum(0.80, decay)
 
     if month == 7:
         length = min(10, dim)
         bump = 1.10 + rng.rand() * 0.20
-        for d in range(1, length + 1):
-            dist = d - 1
-            decay = 1.0 - 0.25 * (dist / (length - 1 + 1e-9))
-            w[d - 1] *= bump * max(0.85, decay)
+        dist = np.arange(length)
+        decay = 1.0 - 0.25 * (dist / (length - 1 + 1e-9))
+        w[:length] *= bump * np.maximum(0.85, decay)
 
     if month == 11:
         bf = DEFAULT_OVERRIDES.get_fixed_day(year, 11)
@@ -73,80 +74,190 @@ def _day_weights_for_month(year: int, month: int, dim: int) -> List[float]:
         if 1 <= bf <= dim:
             spike = 1.80 + rng.rand() * 0.60
             w[bf - 1] *= spike
-            for delta in (-3, -2, -1, 1, 2, 3):
-                d = bf + delta
-                if 1 <= d <= dim:
-                    base = 1.10 + (0.20 * (1 - abs(delta) / 3.0))
-                    w[d - 1] *= base * (1.0 + (rng.rand() * 0.06 - 0.03))
+            deltas = np.array([d for d in (-3, -2, -1, 1, 2, 3) if 1 <= bf + d <= dim])
+            base = 1.10 + (0.20 * (1 - np.abs(deltas) / 3.0))
+            w[bf + deltas - 1] *= base * (1.0 + (rng.rand_array(len(deltas)) * 0.06 - 0.03))
 
     if month == 12:
         start, end = 10, min(24, dim)
         bump_mid = 1.10 + rng.rand() * 0.20
-        for d in range(start, end + 1):
-            w[d - 1] *= bump_mid * (1.0 + (rng.rand() * 0.06 - 0.03))
-        for d in range(min(dim, 26), dim + 1):
-            w[d - 1] *= 1.05 + rng.rand() * 0.10
+        n_mid = max(0, end - start + 1)
+        w[start - 1:end] *= bump_mid * (1.0 + (rng.rand_array(n_mid) * 0.06 - 0.03))
+        tail = min(dim, 26)
+        w[tail - 1:dim] *= 1.05 + rng.rand_array(dim - tail + 1) * 0.10
 
+    w = w.tolist()
     mean = sum(w) / dim if dim > 0 else 1.0
     if mean > 0:
         w = [x / mean for x in w]
     return w
 
-def build_monthly_new_customers(config: GrowthConfig) -> List[dict]:
+@dataclass(frozen=True)
+class GrowthBase:
+    """
+    Partes de la curva que dependen solo de la semilla y del calendario (se calculan una vez):
+    índice logístico, ruido mensual y matriz de pesos diarios (meses × 31, enmascarada > n_días).
+    """
+    periods: np.ndarray
+    years: np.ndarray
+    months: np.ndarray
+    days_in_month: np.ndarray
+    base: np.ndarray
+    noise: np.ndarray
+    day_weights: np.ma.MaskedArray
+
+@lru_cache(maxsize=1)
+def growth_base() -> GrowthBase:
     months = build_project_months(PROJECT_START, PROJECT_END)
     n = len(months)
-    base = _logistic_index(n, k=6.0)
+    dims = np.array([meta["days_in_month"] for meta in months], dtype=np.int64)
+    noise = minstd_first_rand(np.array([stable_int_seed("month-noise", meta["period"]) for meta in months]))
 
-    adjusted = []
+    dw = np.zeros((n, 31), dtype=np.float64)
     for i, meta in enumerate(months):
-        m = meta["month"]
-        mult = config.seasonality.by_month.get(m, 1.0)
-        rng = SimpleLCG(stable_int_seed("month-noise", meta["period"]))
-        mult_noise = 1.0 + (rng.rand() * 0.08 - 0.04)
-        adjusted.append(base[i] * mult * mult_noise)
+        dw[i, :dims[i]] = _day_weights_for_month(meta["year"], meta["month"], int(dims[i]))
+    mask = np.arange(1, 32)[None, :] > dims[:, None]
+
+    arrays = dict(
+        periods=np.array([meta["period"] for meta in months]),
+        years=np.array([meta["year"] for meta in months], dtype=np.int64),
+        months=np.array([meta["month"] for meta in months], dtype=np.int64),
+        days_in_month=dims,
+        base=np.array(_logistic_index(n, k=6.0)),
+        noise=1.0 + (noise * 0.08 - 0.04),
+        day_weights=np.ma.masked_array(dw, mask=mask),
+    )
+    for a in arrays.values():
+        a.flags.writeable = False
+    return GrowthBase(**arrays)
+
+def _new_customers_matrix(configs: Sequence[GrowthConfig]) -> np.ndarray:
+    """
+    Altas mensuales para K escenarios a la vez (K × meses), con las mismas operaciones y
+    el mismo orden de suma por año que la versión escalar (resultados idénticos).
+    """
+    gb = growth_base()
+    seas = np.array([[c.seasonality.by_month.get(m, 1.0) for m in range(1, 13)] for c in configs])
+    adjusted = (gb.base[None, :] * seas[:, gb.months - 1]) * gb.noise[None, :]
+
+    years = np.unique(gb.years)
+    targets = np.array([[c.targets_by_year.get(int(y), 0) for y in years] for c in configs], dtype=np.int64)
+    out = np.zeros_like(adjusted, dtype=np.int64)
+    for j, y in enumerate(years):
+        cols = np.flatnonzero(gb.years == y)
+        seg = adjusted[:, cols]
+        total_raw = np.cumsum(seg, axis=1)[:, -1:]  # suma secuencial, como sum()
+        share = np.divide(seg, total_raw, out=np.zeros_like(seg), where=total_raw > 0)
+        out[:, cols] = np.round(share * targets[:, j:j + 1]).astype(np.int64)
+    return out
+
+def build_growth_scenarios(
+    configs: Union[Sequence[GrowthConfig], Mapping[str, GrowthConfig]],
+) -> pd.DataFrame:
+    """
+    Evalúa muchos GrowthConfig de una vez. Devuelve una tabla columnar (un registro por
+    escenario y mes): scenario, period, year, month, days_in_month, new_customers.
+    Los pesos diarios comunes están en growth_base().day_weights (alineados por mes).
+    """
+    if isinstance(configs, Mapping):
+        names, cfgs = list(configs.keys()), list(configs.values())
+    else:
+        cfgs = list(configs)
+        names = list(range(len(cfgs)))
+    gb = growth_base()
+    n = len(gb.periods)
+    counts = _new_customers_matrix(cfgs) if cfgs else np.zeros((0, n), dtype=np.int64)
+    return pd.DataFrame({
+        "scenario": np.repeat(np.array(names, dtype=object), n),
+        "period": np.tile(gb.periods, len(cfgs)),
+        "year": np.tile(gb.years, len(cfgs)),
+        "month": np.tile(gb.months, len(cfgs)),
+        "days_in_month": np.tile(gb.days_in_month, len(cfgs)),
+        "new_customers": counts.reshape(-1),
+    })
+
+def build_monthly_new_customers(config: GrowthConfig) -> List[dict]:
+    gb = growth_base()
+    counts = _new_customers_matrix([config])[0]
 
     out = []
-    by_year = {}
-    for i, meta in enumerate(months):
-        by_year.setdefault(meta["year"], []).append((i, adjusted[i]))
-
-    for year, vals in by_year.items():
-        target = config.targets_by_year.get(year, 0)
-
-        if target == 0:
-            for idx, _ in vals:
-                meta = months[idx]
-                dim = meta["days_in_month"]
-                out.append({
-                    "period": meta["period"],
-                    "year": meta["year"],
-                    "month": meta["month"],
-                    "days_in_month": dim,
-                    "new_customers": 0,
-                    "day_weights": [1.0] * dim,
-                })
-            continue
-
-        total_raw = sum(v for _, v in vals)
-        for idx, v in vals:
-            meta = months[idx]
-            dim = meta["days_in_month"]
-            share = v / total_raw if total_raw > 0 else 0.0
-            new_customers = int(round(share * target))
-
-            day_weights = _day_weights_for_month(meta["year"], meta["month"], dim)
-
-            out.append({
-                "period": meta["period"],
-                "year": meta["year"],
-                "month": meta["month"],
-                "days_in_month": dim,
-                "new_customers": new_customers,
-                "day_weights": day_weights,
-            })
+    for i in range(len(gb.periods)):
+        dim = int(gb.days_in_month[i])
+        year = int(gb.years[i])
+        if config.targets_by_year.get(year, 0) == 0:
+            day_weights = [1.0] * dim
+        else:
+            day_weights = gb.day_weights.data[i, :dim].tolist()
+        out.append({
+            "period": str(gb.periods[i]),
+            "year": year,
+            "month": int(gb.months[i]),
+            "days_in_month": dim,
+            "new_customers": int(counts[i]),
+            "day_weights": day_weights,
+        })
 
     return out
 
+def _largest_remainder(total: int, weights: np.ndarray) -> np.ndarray:
+    """
+    Reparte un total entero proporcionalmente a weights (método de restos mayores).
+    Determinista: a igualdad de resto gana el día anterior.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if total <= 0 or weights.sum() <= 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    quotas = weights / weights.sum() * total
+    counts = np.floor(quotas).astype(np.int64)
+    rest = int(total - counts.sum())
+    if rest > 0:
+        order = np.argsort(-(quotas - counts), kind="stable")
+        counts[order[:rest]] += 1
+    return counts
+
+def build_daily_new_customers(monthly: List[dict]) -> pd.DataFrame:
+    """
+    Expande la tabla mensual (build_monthly_new_customers) a altas por día usando
+    day_weights y redondeo por restos mayores: la suma de cada mes coincide con new_customers.
+    Columnas: fecha (datetime64[D]), period, new_customers.
+    """
+    fechas, periods, counts = [], [], []
+    for row in monthly:
+        dim = row["days_in_month"]
+        first = np.datetime64(f"{row['year']:04d}-{row['month']:02d}-01", "D")
+        fechas.append(first + np.arange(dim))
+        periods.append(np.full(dim, row["period"], dtype=object))
+        counts.append(_largest_remainder(row["new_customers"], np.asarray(row["day_weights"][:dim])))
+    if not monthly:
+        return pd.DataFrame({"fecha": np.array([], dtype="datetime64[D]"), "period": [], "new_customers": []})
+    return pd.DataFrame({
+        "fecha": np.concatenate(fechas),
+        "period": np.concatenate(periods),
+        "new_customers": np.concatenate(counts),
+    })
+
+def iter_signup_batches(
+    daily: pd.DataFrame,
+    chunk_size: int = 100_000,
+    start_id: int = 1,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Genera las altas individuales en bloques de como mucho chunk_size filas:
+    {"customer_id": int64 correlativo desde start_id, "fecha_alta": datetime64[D]}.
+    Solo se materializa un bloque cada vez (la memoria no crece con el volumen total).
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size debe ser > 0")
+    fechas = daily["fecha"].to_numpy(dtype="datetime64[D]")
+    cum = np.cumsum(daily["new_customers"].to_numpy(dtype=np.int64))
+    total = int(cum[-1]) if len(cum) else 0
+    for start in range(0, total, chunk_size):
+        pos = np.arange(start, min(start + chunk_size, total), dtype=np.int64)
+        yield {
+            "customer_id": pos + start_id,
+            "fecha_alta": fechas[np.searchsorted(cum, pos, side="right")],
+        }
+
 def example_config() -> GrowthConfig:
     targets = {
         2017: 2960,
@@ -0,0 +1,479 @@
+# items_venta.py
+# Autor: proyecto "ropa"
+# Objetivo: generación de items_1 a partir de tickets (SKU por catálogo activo + promociones):
+#   - Catálogo activo por día resuelto con un índice de intervalos (lanzamiento..retiro):
+#     el conjunto activo solo cambia en las fechas de corte → un segmento por tramo
+#   - Promociones activas resueltas con un join de intervalos (fecha_inicio..fecha_fin) ×
+#     días presentes en los items, sin recorrer día a día
+#   - Mismo resultado que el cálculo por día: selección determinista con hash_unitario
+#   - construir_items_1: tickets repartidos por hash estable de cliente y procesados por
+#     particiones (en paralelo si se pide); cada partición escribe su parte de Parquet y
+#     lleva la posición global de sus filas → mismo items_1 que el cálculo secuencial
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Tuple
+import hashlib
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from almacen import directorio_temporal, escribir_parte_items, publicar_items
+from tickets_online import PARTICIONES, particion_estable
+
+
+# 0) Hash determinista
+
+def hash_unitario(*valores) -> float:
+    """
+    Pseudo-aleatoriedad determinista en [0, 1) a partir de una clave compuesta.
+    Se usa para asignar SKUs de forma estable sin depender del orden de ejecución.
+    """
+    key = "|".join(map(str, valores))
+    h = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return int(h[:16], 16) / float(0xFFFFFFFFFFFFFFFF)
+
+def _orden_por_dia(dias: pd.Series) -> np.ndarray:
+    """Orden de filas de un groupby(día, sort=False): días por primera aparición, filas estables."""
+    return np.argsort(pd.factorize(dias)[0], kind="stable")
+
+
+# 1) Índices de intervalos
+
+def variantes_activas_por_dia(lanzamiento: np.ndarray,
+                              retiro: np.ndarray,
+                              dias: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Variantes activas (lanzamiento <= día y (retiro nulo o día < retiro)) para cada día.
+    Devuelve (seg, inicio, pos): las activas del día i son pos[inicio[seg[i]]:inicio[seg[i] + 1]],
+    en el orden original del catálogo. Los días del mismo tramo entre cortes comparten segmento.
+    """
+    cortes = np.unique(np.concatenate([lanzamiento[~np.isnat(lanzamiento)], retiro[~np.isnat(retiro)]]))
+    seg_dia = np.searchsorted(cortes, dias, side="right") - 1  # -1: antes del primer corte → ninguna
+    usados, seg = np.unique(seg_dia, return_inverse=True)
+    rep = cortes[np.maximum(usados, 0)][:, None]
+    A = (~np.isnat(lanzamiento))[None, :] & (lanzamiento[None, :] <= rep) & (np.isnat(retiro)[None, :] | (rep < retiro[None, :]))
+    A[usados < 0] = False
+    filas, pos = np.nonzero(A)
+    inicio = np.searchsorted(filas, np.arange(len(usados) + 1))
+    return seg, inicio, pos
+
+def promociones_por_dia(inicio: np.ndarray, fin: np.ndarray, dias: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Join de intervalos promo × día: pares (promo, día) con inicio <= día <= fin, con `dias`
+    ordenado. Devuelve (i_promo, i_dia) en orden de promoción.
+    """
+    a = np.searchsorted(dias, inicio, side="left")
+    b = np.searchsorted(dias, fin, side="right")
+    largos = np.maximum(b - a, 0)
+    largos[np.isnat(inicio) | np.isnat(fin)] = 0
+    i_promo = np.repeat(np.arange(len(inicio)), largos)
+    i_dia = np.repeat(a, largos) + np.arange(int(largos.sum())) - np.repeat(np.cumsum(largos) - largos, largos)
+    return i_promo, i_dia
+
+
+# 2) SKU por item
+
+def asignar_sku_determinista(items_df: pd.DataFrame, variantes_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Asigna un SKU a cada item de forma determinista, respetando el catálogo activo por día.
+    La selección depende de (ticket_id, pos_item). Si un día no hay variantes activas se
+    usa el catálogo completo. Filas agrupadas por día (orden de primera aparición).
+    """
+    items = items_df.copy()
+    items["fecha_item"] = pd.to_datetime(items["fecha_item"], errors="coerce")
+    if items["fecha_item"].isna().any():
+        bad = items.loc[items["fecha_item"].isna(), ["item_id", "ticket_id"]].head(10)
+        raise ValueError("Existen items con fecha_item inválida. Muestra:\n" + bad.to_string(index=False))
+
+    v = variantes_df.copy()
+    v.columns = v.columns.str.strip()
+
+    if "categoría" not in v.columns and "categoria" in v.columns:
+        v = v.rename(columns={"categoria": "categoría"})
+
+    required = ["sku", "id_producto", "categoría", "color", "talla", "precio", "coste bruto", "lanzamiento"]
+    missing = [c for c in required if c not in v.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en productos_variantes.csv: {missing}")
+    if v.empty:
+        raise ValueError("No hay variantes disponibles para asignar SKU.")
+
+    items = items.iloc[_orden_por_dia(items["fecha_item"].dt.floor("D"))].reset_index(drop=True)
+    dias = items["fecha_item"].dt.floor("D").to_numpy(dtype="datetime64[ns]")
+    lanz = pd.to_datetime(v["lanzamiento"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+    ret = pd.to_datetime(v["retiro"], errors="coerce").to_numpy(dtype="datetime64[ns]") \
+        if "retiro" in v.columns else np.full(len(v), np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    seg, inicio, pos = variantes_activas_por_dia(lanz, ret, dias)
+    n_seg = np.diff(inicio)[seg]
+    n = np.where(n_seg > 0, n_seg, len(v))
+
+    h = np.fromiter(
+        (hash_unitario(tid, pos_i) for tid, pos_i in zip(items["ticket_id"].astype(str), items["pos_item"].astype(int))),
+        dtype=np.float64, count=len(items),
+    )
+    k = np.minimum(np.floor(h * n).astype(np.int64), n - 1)
+    fila_v = k.copy()
+    hay = n_seg > 0
+    fila_v[hay] = pos[inicio[seg[hay]] + k[hay]]
+
+    sel = v.iloc[fila_v].reset_index(drop=True)
+    return items.join(
+        sel[
+            ["sku", "id_producto", "categoría", "color", "talla", "precio", "coste bruto"]
+        ].rename(columns={"coste bruto": "coste_bruto"})
+    )
+
+
+# 3) Promociones
+
+def aplicar_promociones(items_df: pd.DataFrame, promos_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica promociones por (fecha, categoría).
+    Si hay solapes, se elige por:
+      1) prioridad mayor
+      2) descuento mayor
+      3) promotion_id mayor (desempate estable)
+    """
+    out = items_df.copy()
+    out["fecha_item"] = pd.to_datetime(out["fecha_item"], errors="coerce")
+    out["fecha_dia"] = out["fecha_item"].dt.floor("D")
+
+    out.drop(columns=["promotion_id", "descuento_pct"], errors="ignore", inplace=True)
+
+    if promos_df is None or promos_df.empty:
+        out["promotion_id"] = pd.NA
+        out["descuento_pct"] = 0.0
+        return out.drop(columns="fecha_dia")
+
+    p = promos_df.copy()
+    p.columns = p.columns.str.strip()
+    if "categoría" not in p.columns and "categoria" in p.columns:
+        p = p.rename(columns={"categoria": "categoría"})
+
+    needed = ["promotion_id", "fecha_inicio", "fecha_fin", "categoría", "descuento_pct"]
+    miss = [c for c in needed if c not in p.columns]
+    if miss:
+        raise ValueError(f"Faltan columnas en promociones.csv: {miss}")
+
+    p["fecha_inicio"] = pd.to_datetime(p["fecha_inicio"], errors="coerce")
+    p["fecha_fin"] = pd.to_datetime(p["fecha_fin"], errors="coerce")
+    p["prioridad"] = pd.to_numeric(p.get("prioridad", 0), errors="coerce").fillna(0).astype(int)
+    p["descuento_pct"] = pd.to_numeric(p["descuento_pct"], errors="coerce").fillna(0.0).astype(float)
+
+    fmin = out["fecha_dia"].min()
+    fmax = out["fecha_dia"].max()
+    p = p.loc[(p["fecha_fin"] >= fmin) & (p["fecha_inicio"] <= fmax)].reset_index(drop=True)
+
+    # pares (promo, día activo) → ganadora por (día, categoría)
+    dias = np.unique(out["fecha_dia"].dropna().to_numpy(dtype="datetime64[ns]"))
+    i_promo, i_dia = promociones_por_dia(
+        p["fecha_inicio"].to_numpy(dtype="datetime64[ns]"),
+        p["fecha_fin"].to_numpy(dtype="datetime64[ns]"),
+        dias,
+    )
+    pares = p.iloc[i_promo][["categoría", "prioridad", "descuento_pct", "promotion_id"]].reset_index(drop=True)
+    pares.insert(0, "fecha_dia", dias[i_dia])
+    winners = pares.sort_values(
+        ["fecha_dia", "categoría", "prioridad", "descuento_pct", "promotion_id"],
+        ascending=[True, True, False, False, False],
+    ).drop_duplicates(["fecha_dia", "categoría"])[["fecha_dia", "categoría", "promotion_id", "descuento_pct"]]
+
+    out = out.iloc[_orden_por_dia(out["fecha_dia"])].reset_index(drop=True)
+    out = out.merge(winners, on=["fecha_dia", "categoría"], how="left")
+    out["promotion_id"] = out["promotion_id"].astype("string")
+    out["descuento_pct"] = out["descuento_pct"].fillna(0.0).astype(float)
+    return out.drop(columns="fecha_dia")
+
+
+# 4) Expansión, tiendas, economía y validación
+
+def normaliza_texto(s: pd.Series) -> pd.Series:
+    """
+    Normalización consistente para claves textuales usadas en cruces y validaciones.
+    Hace el match case-insensitive y evita discrepancias por espacios.
+    """
+    return (
+        s.astype("string")
+         .str.strip()
+         .str.replace(r"\s+", " ", regex=True)
+         .str.lower()
+    )
+
+def expandir_tickets_a_items(tickets_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte tickets en items individuales.
+    No añade store_id aquí: store_id se asigna después solo para canal físico.
+    """
+    df = tickets_df.copy()
+
+    if "n_items" not in df.columns:
+        df["n_items"] = 0
+
+    df["n_items"] = (
+        pd.to_numeric(df["n_items"], errors="coerce")
+          .fillna(0)
+          .astype(int)
+          .clip(lower=0)
+    )
+
+    base = df.loc[df.index.repeat(df["n_items"])].copy()
+    if base.empty:
+        return pd.DataFrame(
+            columns=[
+                "item_id", "ticket_id", "pos_item",
+                "customer_id", "canal", "provincia", "fecha_item"
+            ]
+        )
+
+    base["pos_item"] = base.groupby("ticket_id").cumcount() + 1
+    base = base.rename(columns={"fecha_ticket": "fecha_item"})
+
+    base["item_id"] = (
+        base["ticket_id"].astype(str)
+        + "-"
+        + base["pos_item"].astype(str).str.zfill(3)
+    )
+
+    return base[
+        [
+            "item_id", "ticket_id", "pos_item",
+            "customer_id", "canal", "provincia", "fecha_item"
+        ]
+    ]
+
+def asignar_store_id_items(items_df: pd.DataFrame, tiendas_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Asigna store_id a items físicos usando tiendas.csv.
+    El match es por provincia normalizada (case-insensitive).
+    Online queda con store_id vacío (NA).
+    """
+    out = items_df.copy()
+
+    if "store_id" in out.columns:
+        out.drop(columns=["store_id"], inplace=True)
+
+    out["canal"] = normaliza_texto(out["canal"])
+    out["provincia"] = normaliza_texto(out["provincia"])
+
+    tiendas = tiendas_df.copy()
+    if "store_id" not in tiendas.columns or "provincia" not in tiendas.columns:
+        raise ValueError("tiendas.csv debe tener columnas 'store_id' y 'provincia'.")
+
+    tiendas["store_id"] = tiendas["store_id"].astype("string").str.strip()
+    tiendas["provincia"] = normaliza_texto(tiendas["provincia"])
+
+    if tiendas["provincia"].isna().any() or tiendas["store_id"].isna().any():
+        raise ValueError("tiendas.csv contiene provincias o store_id nulos. Revisa el fichero.")
+
+    dup = tiendas["provincia"].duplicated(keep=False)
+    if dup.any():
+        sample = tiendas.loc[dup, ["provincia", "store_id"]].head(10)
+        raise ValueError(
+            "tiendas.csv tiene provincias duplicadas (match no es 1:1). Muestra:\n"
+            + sample.to_string(index=False)
+        )
+
+    prov_to_store = tiendas.set_index("provincia")["store_id"].to_dict()
+
+    out["store_id"] = pd.NA
+    mask_fisico = out["canal"].eq("fisico")
+    out.loc[mask_fisico, "store_id"] = out.loc[mask_fisico, "provincia"].map(prov_to_store)
+
+    missing = out.loc[mask_fisico & out["store_id"].isna(), ["ticket_id", "item_id", "provincia", "fecha_item"]]
+    if not missing.empty:
+        raise ValueError(
+            "Hay items físicos sin store_id. Revisa provincia en tickets_total vs tiendas.csv.\n"
+            + missing.head(20).to_string(index=False)
+        )
+
+    return out
+
+def calcular_economia_unitaria(items_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula PVP, descuento, neto, coste y margen por item.
+    """
+    out = items_df.copy()
+
+    out["pvp_unitario"] = pd.to_numeric(out["precio"], errors="coerce").astype(float)
+    out["descuento_pct"] = pd.to_numeric(out["descuento_pct"], errors="coerce").fillna(0.0).astype(float)
+    out["precio_neto_unit"] = out["pvp_unitario"] * (1.0 - out["descuento_pct"])
+
+    out["coste_bruto"] = pd.to_numeric(out["coste_bruto"], errors="coerce").astype(float)
+    out["margen_unit"] = out["precio_neto_unit"] - out["coste_bruto"]
+
+    return out
+
+def validar_consistencia(items_df: pd.DataFrame, tickets_df: pd.DataFrame, clientes_df: pd.DataFrame) -> None:
+    """
+    Validaciones de contrato entre tablas:
+    - items por ticket coincide con n_items de tickets
+    - store_id presente para canal físico y ausente para online
+    - provincia online coincide con clientes
+    """
+    recuento_items = items_df.groupby("ticket_id").size().rename("n_items_calc")
+    chk = tickets_df.set_index("ticket_id")["n_items"].rename("n_items_decl")
+
+    comp = pd.concat([chk, recuento_items], axis=1).fillna(0)
+    comp["n_items_decl"] = comp["n_items_decl"].astype(int)
+    comp["n_items_calc"] = comp["n_items_calc"].astype(int)
+
+    bad = comp.loc[comp["n_items_decl"] != comp["n_items_calc"]]
+    if not bad.empty:
+        raise ValueError(
+            "El número de items no coincide con tickets. Muestra:\n"
+            + bad.head(20).to_string()
+        )
+
+    claves = ["item_id", "ticket_id", "pos_item", "canal", "fecha_item", "sku", "id_producto", "categoría"]
+    faltan = [c for c in claves if c not in items_df.columns]
+    if faltan:
+        raise ValueError(f"Faltan columnas clave en items: {faltan}")
+
+    if items_df[claves].isna().any().any():
+        cols_nan = [c for c in claves if items_df[c].isna().any()]
+        sample = items_df.loc[items_df[cols_nan].isna().any(axis=1), claves].head(20)
+        raise ValueError(
+            "Hay NaN en columnas clave: "
+            + ", ".join(cols_nan)
+            + "\nMuestra:\n"
+            + sample.to_string(index=False)
+        )
+
+    canal_norm = normaliza_texto(items_df["canal"])
+    mask_fisico = canal_norm.eq("fisico")
+    mask_online = canal_norm.eq("online")
+
+    if mask_fisico.any():
+        miss_store = items_df.loc[mask_fisico & items_df["store_id"].isna(), ["item_id", "provincia"]].head(20)
+        if not miss_store.empty:
+            raise ValueError("Existen items físicos sin store_id. Muestra:\n" + miss_store.to_string(index=False))
+
+    if mask_online.any():
+        if items_df.loc[mask_online, "store_id"].notna().any():
+            sample = items_df.loc[mask_online & items_df["store_id"].notna(), ["item_id", "store_id"]].head(20)
+            raise ValueError("Existen items online con store_id (no debe). Muestra:\n" + sample.to_string(index=False))
+
+        clientes = clientes_df.copy()
+        if "customer_id" not in clientes.columns or "provincia" not in clientes.columns:
+            raise ValueError("clientes.csv debe tener customer_id y provincia para validar online.")
+
+        clientes["customer_id"] = clientes["customer_id"].astype("string")
+        clientes["provincia"] = normaliza_texto(clientes["provincia"])
+        prov_map = clientes.set_index("customer_id")["provincia"].to_dict()
+
+        online = items_df.loc[mask_online].copy()
+        online["provincia_norm"] = normaliza_texto(online["provincia"])
+        online["prov_expected"] = online["customer_id"].astype("string").map(prov_map)
+
+        badp = online.loc[
+            online["customer_id"].notna()
+            & online["prov_expected"].notna()
+            & (online["provincia_norm"] != online["prov_expected"]),
+            ["ticket_id", "customer_id", "provincia", "prov_expected"]
+        ].head(20)
+
+        if not badp.empty:
+            raise ValueError("Provincia online no coincide con clientes. Muestra:\n" + badp.to_string(index=False))
+
+
+# 5) items_1 por particiones
+
+COLUMNAS_ITEMS_1 = [
+    "item_id", "ticket_id", "pos_item",
+    "customer_id", "canal", "store_id", "provincia", "fecha_item",
+    "sku", "id_producto", "categoría", "color", "talla",
+    "pvp_unitario", "descuento_pct", "precio_neto_unit", "coste_bruto", "margen_unit",
+    "promotion_id",
+]
+
+# tipos fijos: una partición sin items físicos (store_id todo nulo) escribe lo mismo que las demás
+ESQUEMA_ITEMS_1 = pa.schema([
+    ("item_id", pa.string()), ("ticket_id", pa.string()), ("pos_item", pa.int64()),
+    ("customer_id", pa.string()), ("canal", pa.string()), ("store_id", pa.string()),
+    ("provincia", pa.string()), ("fecha_item", pa.timestamp("ns")),
+    ("sku", pa.string()), ("id_producto", pa.string()), ("categoría", pa.string()),
+    ("color", pa.string()), ("talla", pa.string()),
+    ("pvp_unitario", pa.float64()), ("descuento_pct", pa.float64()), ("precio_neto_unit", pa.float64()),
+    ("coste_bruto", pa.float64()), ("margen_unit", pa.float64()),
+    ("promotion_id", pa.string()),
+])
+
+def filas_items_por_ticket(tickets_df: pd.DataFrame) -> np.ndarray:
+    """
+    Posición global del primer item de cada ticket en items_1 secuencial: días por primera
+    aparición (como asignar_sku_determinista) y, dentro del día, tickets en su orden.
+    Solo cuentan los tickets con items: uno vacío no abre día. Los vacíos quedan con 0.
+    """
+    n = pd.to_numeric(tickets_df["n_items"], errors="coerce").fillna(0).astype(int).clip(lower=0).to_numpy()
+    dia = pd.to_datetime(tickets_df["fecha_ticket"], errors="coerce").dt.floor("D")
+    con_items = np.flatnonzero(n > 0)
+    orden = con_items[_orden_por_dia(dia.iloc[con_items].reset_index(drop=True))]
+    fila0 = np.zeros(len(n), dtype=np.int64)
+    fila0[orden] = np.cumsum(n[orden]) - n[orden]
+    return fila0
+
+def _items_particion(args: tuple) -> int:
+    """Pipeline completo de items_1 para los tickets de una partición; escribe su parte."""
+    tickets_p, fila0, tiendas_df, variantes_df, promos_df, clientes_p, directorio, parte = args
+    items = expandir_tickets_a_items(tickets_p)
+    items["fecha_item"] = pd.to_datetime(items["fecha_item"], errors="coerce")
+
+    items = asignar_store_id_items(items, tiendas_df)
+    items = asignar_sku_determinista(items, variantes_df)
+    items = aplicar_promociones(items, promos_df)
+    items = calcular_economia_unitaria(items)
+    items = items[COLUMNAS_ITEMS_1]
+
+    validar_consistencia(items, tickets_p, clientes_p)
+
+    fila_ticket = pd.Series(fila0, index=tickets_p["ticket_id"].to_numpy())
+    filas = fila_ticket.reindex(items["ticket_id"].to_numpy()).to_numpy() + items["pos_item"].to_numpy() - 1
+    return escribir_parte_items(items, directorio, filas, parte=parte, esquema=ESQUEMA_ITEMS_1)
+
+def construir_items_1(tickets_df: pd.DataFrame,
+                      tiendas_df: pd.DataFrame,
+                      variantes_df: pd.DataFrame,
+                      promos_df: pd.DataFrame,
+                      clientes_df: pd.DataFrame,
+                      *,
+                      etapa: str = "items_1",
+                      particiones: int = PARTICIONES,
+                      procesos: int = 1) -> Tuple[Path, int]:
+    """
+    Genera items_1 por particiones de clientes (tickets físicos sin cliente: por ticket_id)
+    y publica la etapa. Cada partición expande, asigna tienda/SKU/promoción, valida y escribe
+    su parte directamente, sin juntar todos los items en memoria. Devuelve (ruta, filas).
+    """
+    tickets_df = tickets_df.reset_index(drop=True)
+    fila0 = filas_items_por_ticket(tickets_df)
+    clave = tickets_df["customer_id"].astype(object).where(
+        tickets_df["customer_id"].notna(), "ticket|" + tickets_df["ticket_id"].astype(str)
+    )
+    parte = particion_estable(clave, particiones)
+    clientes_df = clientes_df[["customer_id", "provincia"]]
+
+    tmp = directorio_temporal(etapa)
+    tareas = []
+    for p in range(particiones):
+        pos = np.flatnonzero(parte == p)
+        if len(pos) == 0:
+            continue
+        tk = tickets_df.iloc[pos]
+        cl = clientes_df.loc[clientes_df["customer_id"].isin(tk["customer_id"].dropna())]
+        tareas.append((tk, fila0[pos], tiendas_df, variantes_df, promos_df, cl, tmp, p))
+
+    try:
+        if procesos > 1 and len(tareas) > 1:
+            with ProcessPoolExecutor(max_workers=procesos) as ex:
+                filas = sum(ex.map(_items_particion, tareas))
+        else:
+            filas = sum(_items_particion(t) for t in tareas)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return publicar_items(tmp, etapa, COLUMNAS_ITEMS_1, filas), filas
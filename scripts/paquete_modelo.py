@@ -0,0 +1,268 @@
+# paquete_modelo.py
+# Autor: proyecto "ropa"
+# Objetivo: paquete versionado del modelo de devoluciones (un directorio: manifest.json + .npy):
+#   - Sustituye a preprocess.pkl / platt.pkl / isotonic.pkl / prod_profile_train.pkl + JSON sueltos
+#   - Vocabularios one-hot e imputaciones, puntos de corte isotónicos (np.interp), Platt como
+#     floats, perfil de producto por columnas y los árboles compilados (arboles_numpy)
+#   - Arrays abiertos con mmap_mode="r": N workers comparten las mismas páginas
+#   - Abrir un paquete no necesita sklearn, pandas ni xgboost; solo el exportador lee los pickles
+#   - El manifiesto guarda el sha256 de los artefactos de origen: si no coinciden (reentreno
+#     sin re-exportar) cargar_modelo vuelve a los pickles. El booster no se copia, se referencia
+
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+from arboles_numpy import BosqueCompilado, cargar_bosque
+
+
+# 0) Rutas y formato
+
+ROOT_DIR    = Path(__file__).resolve().parent.parent
+MODEL_DIR   = ROOT_DIR / "modelos" / "xgb_devoluciones"
+PAQUETE_DIR = MODEL_DIR / "paquete"
+
+FORMATO    = "ropa-modelo"
+VERSION    = 1
+MANIFIESTO = "manifest.json"
+BOOSTER    = "xgb_booster.json"
+PLATT_EPS  = 1e-6  # clip de p_raw antes del logit (igual que al ajustar Platt en el notebook)
+
+# artefactos de los que sale el paquete (su huella va en el manifiesto)
+FUENTES = ("config.json", "prod_meta_train.json", "preprocess.pkl", "platt.pkl",
+           "isotonic.pkl", "prod_profile_train.pkl", BOOSTER)
+
+_CAMPOS_ARBOL = ("feature", "umbral", "izq", "der", "defecto_izq", "valor")
+
+
+# 1) Paquete en memoria
+
+@dataclass(frozen=True)
+class PaqueteModelo:
+    """
+    Manifiesto + arrays por nombre. Abierto con abrir_paquete los arrays son np.memmap de solo
+    lectura; con leer_pickles están en memoria. `directorio` es donde está el booster JSON.
+    """
+    manifiesto: dict
+    arrays: Dict[str, np.ndarray]
+    directorio: Path
+
+    @property
+    def config(self) -> dict:
+        return self.manifiesto["config"]
+
+    @property
+    def cat_features(self) -> List[str]:
+        return list(self.config["cat_features"])
+
+    @property
+    def num_features(self) -> List[str]:
+        return list(self.config["num_features"])
+
+    @property
+    def iteraciones(self) -> int:
+        """Rondas a usar al predecir (best_iteration + 1)."""
+        return int(self.config["best_iteration"]) + 1
+
+    @property
+    def prod_meta(self) -> dict:
+        return self.manifiesto["prod_meta"]
+
+    def vocabulario(self, feature: str) -> np.ndarray:
+        """Categorías del one-hot de `feature` en el orden de sus columnas."""
+        return self.arrays[f"vocab_{feature}"]
+
+    def perfil(self) -> Dict[str, np.ndarray]:
+        """Perfil de producto de train por columnas (id_producto, prod_mean_des_smooth, …)."""
+        return {c: self.arrays[f"perfil_{c}"] for c in self.manifiesto["perfil_columnas"]}
+
+    def calibrar_isotonica(self, p_raw: np.ndarray) -> np.ndarray:
+        """IsotonicRegression(out_of_bounds="clip").predict ≡ interpolación entre puntos de corte."""
+        return np.interp(p_raw, self.arrays["iso_x"], self.arrays["iso_y"])
+
+    def calibrar_platt(self, p_raw: np.ndarray) -> np.ndarray:
+        """Platt sobre el logit de p_raw: sigmoid(coef · logit(p) + intercept)."""
+        pl = self.manifiesto["platt"]
+        p = np.clip(np.asarray(p_raw, dtype=np.float64), pl["eps"], 1 - pl["eps"])
+        z = np.log(p / (1 - p))
+        return 1.0 / (1.0 + np.exp(-(pl["coef"] * z + pl["intercept"])))
+
+    def bosque(self) -> BosqueCompilado:
+        """Árboles compilados (sobre los arrays del paquete, sin copiar)."""
+        b = self.manifiesto["bosque"]
+        return BosqueCompilado(
+            **{c: self.arrays[f"arbol_{c}"] for c in _CAMPOS_ARBOL},
+            profundidad=int(b["profundidad"]), margen_base=float(b["margen_base"]),
+            objetivo=b["objetivo"], n_features=int(b["n_features"]),
+        )
+
+    @property
+    def ruta_booster(self) -> Path:
+        if not self.manifiesto.get("booster"):
+            raise FileNotFoundError("El paquete no incluye el booster de XGBoost")
+        return self.directorio / self.manifiesto["booster"]
+
+
+# 2) Lectura de los artefactos actuales (pickles)
+
+def huellas_fuentes(model_dir: Union[str, Path] = MODEL_DIR) -> Dict[str, str]:
+    """sha256 de cada artefacto de FUENTES presente en `model_dir`."""
+    out = {}
+    for nombre in FUENTES:
+        path = Path(model_dir) / nombre
+        if path.exists():
+            h = hashlib.sha256()
+            with open(path, "rb") as fh:
+                for trozo in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(trozo)
+            out[nombre] = h.hexdigest()
+    return out
+
+def leer_pickles(model_dir: Union[str, Path] = MODEL_DIR) -> PaqueteModelo:
+    """Paquete en memoria a partir de los artefactos guardados por recomendador_tallas.ipynb."""
+    import pickle
+
+    model_dir = Path(model_dir)
+    with open(model_dir / "config.json", "r", encoding="utf-8") as fh:
+        config = json.load(fh)
+    with open(model_dir / "prod_meta_train.json", "r", encoding="utf-8") as fh:
+        meta = json.load(fh)
+    with open(model_dir / "preprocess.pkl", "rb") as fh:
+        preprocess = pickle.load(fh)
+    with open(model_dir / "platt.pkl", "rb") as fh:
+        platt = pickle.load(fh)
+    with open(model_dir / "isotonic.pkl", "rb") as fh:
+        iso = pickle.load(fh)
+    with open(model_dir / "prod_profile_train.pkl", "rb") as fh:
+        perfil = pickle.load(fh)["prod_profile_train"]
+
+    arrays: Dict[str, np.ndarray] = {}
+
+    # preprocess: imputación + one-hot (categóricas), imputación (numéricas)
+    cat_pipe = preprocess.named_transformers_["cat"]
+    num_pipe = preprocess.named_transformers_["num"]
+    for feature, cats in zip(config["cat_features"], cat_pipe.named_steps["ohe"].categories_):
+        arrays[f"vocab_{feature}"] = np.asarray(cats, dtype=str)
+    arrays["imputar_cat"] = np.asarray(cat_pipe.named_steps["imputer"].statistics_, dtype=str)
+    arrays["imputar_num"] = np.asarray(num_pipe.named_steps["imputer"].statistics_, dtype=np.float64)
+
+    # isotónica (puntos de corte tal cual, sin cambiar dtype)
+    arrays["iso_x"] = np.asarray(iso.X_thresholds_)
+    arrays["iso_y"] = np.asarray(iso.y_thresholds_)
+
+    # perfil de producto por columnas (texto como unicode fijo: se puede mapear)
+    for c in perfil.columns:
+        v = perfil[c].to_numpy()
+        arrays[f"perfil_{c}"] = v.astype(str) if v.dtype == object else v
+
+    # árboles compilados
+    bosque = cargar_bosque(model_dir / BOOSTER, iteraciones=int(config["best_iteration"]) + 1)
+    for c in _CAMPOS_ARBOL:
+        arrays[f"arbol_{c}"] = getattr(bosque, c)
+
+    manifiesto = {
+        "formato": FORMATO,
+        "version": VERSION,
+        "config": config,
+        "prod_meta": meta,
+        "platt": {"coef": float(platt.coef_.ravel()[0]), "intercept": float(platt.intercept_.ravel()[0]), "eps": PLATT_EPS},
+        "isotonic": {"out_of_bounds": iso.out_of_bounds, "increasing": bool(iso.increasing_)},
+        "columnas": [f"{f}={v}" for f in config["cat_features"] for v in arrays[f"vocab_{f}"]] + list(config["num_features"]),
+        "perfil_columnas": [str(c) for c in perfil.columns],
+        "bosque": {"profundidad": bosque.profundidad, "margen_base": bosque.margen_base,
+                   "objetivo": bosque.objetivo, "n_features": bosque.n_features},
+        "booster": BOOSTER,
+        "fuentes": huellas_fuentes(model_dir),
+    }
+    return PaqueteModelo(manifiesto=manifiesto, arrays=arrays, directorio=model_dir)
+
+
+# 3) Exportar y abrir
+
+def exportar_paquete(model_dir: Union[str, Path] = MODEL_DIR,
+                     destino: Optional[Union[str, Path]] = None,
+                     *,
+                     incluir_booster: bool = True) -> Path:
+    """
+    Convierte los pickles de `model_dir` en un paquete (por defecto model_dir/paquete). Se escribe
+    en un directorio temporal y se intercambia por el anterior al final (como almacen).
+    El booster no se copia: el manifiesto apunta (ruta relativa) al de `model_dir`.
+    """
+    model_dir = Path(model_dir)
+    destino = Path(destino) if destino is not None else model_dir / PAQUETE_DIR.name
+    paquete = leer_pickles(model_dir)
+
+    tmp = destino.with_name(f".{destino.name}.{uuid.uuid4().hex[:8]}")
+    tmp.mkdir(parents=True)
+    try:
+        indice = {}
+        for nombre, arr in paquete.arrays.items():
+            arr = np.ascontiguousarray(arr)
+            np.save(tmp / f"{nombre}.npy", arr, allow_pickle=False)
+            indice[nombre] = {"fichero": f"{nombre}.npy", "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        manifiesto = dict(paquete.manifiesto, arrays=indice, escrito=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        manifiesto["booster"] = (
+            Path(os.path.relpath(model_dir / BOOSTER, destino)).as_posix() if incluir_booster else None
+        )
+        with open(tmp / MANIFIESTO, "w", encoding="utf-8") as fh:
+            json.dump(manifiesto, fh, ensure_ascii=False, indent=1)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    if destino.exists():
+        viejo = destino.with_name(f".{destino.name}.old")
+        shutil.rmtree(viejo, ignore_errors=True)
+        os.replace(destino, viejo)
+        os.replace(tmp, destino)
+        shutil.rmtree(viejo, ignore_errors=True)
+    else:
+        os.replace(tmp, destino)
+    return destino
+
+def abrir_paquete(directorio: Union[str, Path] = PAQUETE_DIR, *, mmap: bool = True) -> PaqueteModelo:
+    """Abre un paquete; con mmap=True los arrays se mapean en solo lectura (páginas compartidas)."""
+    directorio = Path(directorio)
+    with open(directorio / MANIFIESTO, "r", encoding="utf-8") as fh:
+        manifiesto = json.load(fh)
+    if manifiesto.get("formato") != FORMATO:
+        raise ValueError(f"{directorio} no es un paquete {FORMATO}")
+    if int(manifiesto.get("version", 0)) > VERSION:
+        raise ValueError(f"Versión de paquete {manifiesto['version']} no soportada (máx. {VERSION})")
+
+    arrays = {}
+    for nombre, info in manifiesto["arrays"].items():
+        arr = np.load(directorio / info["fichero"], mmap_mode="r" if mmap else None, allow_pickle=False)
+        if arr.dtype.str != info["dtype"] or list(arr.shape) != info["shape"]:
+            raise ValueError(f"{info['fichero']} no coincide con el manifiesto")
+        arrays[nombre] = arr
+    return PaqueteModelo(manifiesto=manifiesto, arrays=arrays, directorio=directorio)
+
+def paquete_vigente(paquete: PaqueteModelo, model_dir: Union[str, Path] = MODEL_DIR) -> bool:
+    """True si las huellas del manifiesto coinciden con los artefactos actuales de `model_dir`."""
+    fuentes = paquete.manifiesto.get("fuentes")
+    return bool(fuentes) and fuentes == huellas_fuentes(model_dir)
+
+def cargar_modelo(model_dir: Union[str, Path] = MODEL_DIR) -> PaqueteModelo:
+    """
+    Paquete si `model_dir` es uno, o model_dir/paquete si sigue vigente respecto a los
+    artefactos de `model_dir`; si no (sin paquete o desactualizado), los pickles.
+    """
+    model_dir = Path(model_dir)
+    if (model_dir / MANIFIESTO).exists():
+        return abrir_paquete(model_dir)
+    d = model_dir / PAQUETE_DIR.name
+    if (d / MANIFIESTO).exists():
+        paquete = abrir_paquete(d)
+        if paquete_vigente(paquete, model_dir):
+            return paquete
+    return leer_pickles(model_dir)
@@ -0,0 +1,322 @@
+# perfil_producto.py
+# Autor: proyecto "ropa"
+# Objetivo: perfil de producto (prod_mean_des_smooth, prod_bias_strength, …) como almacén de
+# estadísticos suficientes actualizable de forma incremental:
+#   - Por producto (id denso entero): nº de filas, nº de desajustes válidos, suma del desajuste
+#     y suma de su valor absoluto → añadir ítems es O(1) por ítem, sin releer el histórico
+#   - Fotos inmutables en un instante (p. ej. cut_train_end, cut_calib_end) para los cortes
+#     temporales train/calib/test
+#   - Mismos valores que add_product_profile_features / apply_prod_profile del notebook
+#     (suavizado hacia la media global, min_n, prior_strength), sin merge: gather por id denso
+
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+# 0) Parámetros (prod_meta_train.json)
+
+MIN_N = 15
+PRIOR_STRENGTH = 50.0
+
+COLUMNAS_PERFIL = [
+    "prod_n",
+    "prod_has_history",
+    "prod_mean_des_smooth",
+    "prod_mean_abs_smooth",
+    "prod_bias_dir",
+    "prod_bias_strength",
+]
+
+
+# 1) Foto del perfil en un instante
+
+@dataclass(frozen=True)
+class FotoPerfil:
+    """Estadísticos congelados (copias) y parámetros de suavizado; índice = id denso."""
+    claves: Tuple[Hashable, ...]
+    n: np.ndarray         # filas por producto (prod_n)
+    n_valido: np.ndarray  # filas con desajuste no nulo
+    suma: np.ndarray      # Σ desajuste
+    suma_abs: np.ndarray  # Σ |desajuste|
+    min_n: int = MIN_N
+    prior_strength: float = PRIOR_STRENGTH
+    hasta: Optional[pd.Timestamp] = None
+
+    @property
+    def global_mean(self) -> float:
+        return float(self.suma.sum() / self.n_valido.sum())
+
+    @property
+    def global_abs(self) -> float:
+        return float(self.suma_abs.sum() / self.n_valido.sum())
+
+    def meta(self) -> dict:
+        """Mismo contenido que prod_meta_train.json."""
+        return {
+            "global_mean_des": self.global_mean,
+            "global_mean_abs": self.global_abs,
+            "min_n": self.min_n,
+            "prior_strength": self.prior_strength,
+        }
+
+    def _suavizado(self) -> Tuple[np.ndarray, np.ndarray]:
+        n = self.n.astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            media = self.suma / self.n_valido
+            media_abs = self.suma_abs / self.n_valido
+        k = self.prior_strength
+        return (n * media + k * self.global_mean) / (n + k), (n * media_abs + k * self.global_abs) / (n + k)
+
+    def perfil(self, prod_col: str = "id_producto") -> pd.DataFrame:
+        """Tabla por producto (ordenada por id_producto, como el groupby del notebook)."""
+        des, abs_ = self._suavizado()
+        prof = pd.DataFrame({
+            prod_col: pd.Series(self.claves, dtype=object),
+            "prod_n": self.n.astype(np.int64),
+            "prod_has_history": (self.n >= self.min_n).astype("int8"),
+            "prod_mean_des_smooth": des,
+            "prod_mean_abs_smooth": abs_,
+            "prod_bias_dir": np.sign(des).astype("int8"),
+            "prod_bias_strength": np.abs(des).astype("float32"),
+        })
+        return prof.sort_values(prod_col, kind="stable", na_position="last", ignore_index=True)
+
+    def codigos(self, ids: pd.Series) -> np.ndarray:
+        """Id denso por fila (-1 si el producto no está en la foto)."""
+        valores = ids.to_numpy(dtype=object)
+        nulo = pd.isna(valores)
+        cod = pd.Index(self.claves, dtype=object).get_indexer(np.where(nulo, "", valores))
+        i_nulo = self.claves.index(None) if None in self.claves else -1
+        return np.where(nulo, i_nulo, cod)
+
+    def tabla(self) -> Dict[str, np.ndarray]:
+        """
+        Columnas de perfil por id denso + una fila final para productos desconocidos (medias
+        globales, como los fillna de apply_prod_profile). Mismos dtypes que el notebook.
+        """
+        des, abs_ = self._suavizado()
+        gm, ga = self.global_mean, self.global_abs
+        sin_media = np.isnan(des)
+        des = np.where(sin_media, gm, des)
+        abs_ = np.where(np.isnan(abs_), ga, abs_)
+        return {
+            "prod_n": np.append(self.n, 0).astype(np.int64),
+            "prod_has_history": np.append(self.n >= self.min_n, False).astype("int8"),
+            "prod_mean_des_smooth": np.append(des, gm).astype("float32"),
+            "prod_mean_abs_smooth": np.append(abs_, ga).astype("float32"),
+            "prod_bias_dir": np.append(np.where(sin_media, 0, np.sign(des)), 0).astype("int8"),
+            "prod_bias_strength": np.append(np.where(sin_media, abs(gm), np.abs(des)), abs(gm)).astype("float32"),
+        }
+
+    def features(self, codigos: np.ndarray) -> Dict[str, np.ndarray]:
+        """Columnas de perfil por fila a partir de ids densos (-1 → desconocido)."""
+        codigos = np.asarray(codigos, dtype=np.int64)
+        idx = np.where(codigos >= 0, codigos, len(self.claves))
+        return {c: v[idx] for c, v in self.tabla().items()}
+
+    def aplicar(self, df: pd.DataFrame, prod_col: str = "id_producto") -> pd.DataFrame:
+        """
+        df con las columnas de perfil añadidas (≡ apply_prod_profile: índice reiniciado,
+        columnas al final). Sin merge: un get_indexer y un gather por columna.
+        """
+        out = df.reset_index(drop=True)
+        for col, v in self.features(self.codigos(out[prod_col])).items():
+            out[col] = v
+        return out
+
+
+# 2) Almacén incremental
+
+_TIPOS_CLAVE = {"s": str, "i": int, "f": float, "n": str}
+
+def _tipo_clave(clave) -> str:
+    """Código del tipo de una clave para guardar: s (texto), i (entero), f (float), n (nula)."""
+    if clave is None:
+        return "n"
+    if isinstance(clave, (bool, np.bool_)):
+        raise TypeError(f"id_producto booleano no soportado al guardar: {clave!r}")
+    if isinstance(clave, str):
+        return "s"
+    if isinstance(clave, (int, np.integer)):
+        return "i"
+    if isinstance(clave, (float, np.floating)):
+        return "f"
+    raise TypeError(f"id_producto de tipo {type(clave).__name__} no soportado al guardar: {clave!r}")
+
+
+class PerfilProductos:
+    """
+    Estadísticos suficientes por producto. Cada producto recibe un id denso (0, 1, …) en orden
+    de aparición; los arrays crecen por duplicación, así que añadir un ítem es O(1) amortizado.
+    """
+
+    def __init__(self, min_n: int = MIN_N, prior_strength: float = PRIOR_STRENGTH, capacidad: int = 64):
+        self.min_n = int(min_n)
+        self.prior_strength = float(prior_strength)
+        self.ids: Dict[Hashable, int] = {}
+        self.claves: List[Hashable] = []
+        self.hasta: Optional[pd.Timestamp] = None
+        self._n = np.zeros(capacidad, dtype=np.int64)
+        self._n_valido = np.zeros(capacidad, dtype=np.int64)
+        self._suma = np.zeros(capacidad, dtype=np.float64)
+        self._suma_abs = np.zeros(capacidad, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.claves)
+
+    # -- ids densos
+
+    def _crecer(self, n: int) -> None:
+        cap = len(self._n)
+        if n <= cap:
+            return
+        while cap < n:
+            cap *= 2
+        for nombre in ("_n", "_n_valido", "_suma", "_suma_abs"):
+            v = getattr(self, nombre)
+            nuevo = np.zeros(cap, dtype=v.dtype)
+            nuevo[:len(v)] = v
+            setattr(self, nombre, nuevo)
+
+    @staticmethod
+    def _clave(id_producto) -> Hashable:
+        return None if pd.isna(id_producto) else id_producto
+
+    def id_denso(self, id_producto) -> int:
+        """Id denso del producto (se registra si es nuevo)."""
+        clave = self._clave(id_producto)
+        i = self.ids.get(clave)
+        if i is None:
+            i = self.ids[clave] = len(self.claves)
+            self.claves.append(clave)
+            self._crecer(len(self.claves))
+        return i
+
+    def ids_densos(self, ids: pd.Series) -> np.ndarray:
+        """Id denso por fila, registrando los productos nuevos."""
+        codigos, uniq = pd.factorize(ids, use_na_sentinel=False)
+        mapa = np.fromiter((self.id_denso(u) for u in uniq), dtype=np.int64, count=len(uniq))
+        return mapa[codigos]
+
+    # -- actualización
+
+    def actualizar(self, id_producto, desajuste: float) -> None:
+        """Un ítem nuevo: O(1)."""
+        i = self.id_denso(id_producto)
+        self._n[i] += 1
+        if not pd.isna(desajuste):
+            self._n_valido[i] += 1
+            self._suma[i] += float(desajuste)
+            self._suma_abs[i] += abs(float(desajuste))
+
+    def actualizar_lote(self, ids: pd.Series, desajuste: pd.Series, fechas: Optional[pd.Series] = None) -> None:
+        """Varios ítems a la vez (bincount por id denso). `fechas` actualiza `hasta`."""
+        cod = self.ids_densos(ids)
+        des = pd.to_numeric(desajuste, errors="coerce").to_numpy(dtype=np.float64)
+        valido = ~np.isnan(des)
+        m = len(self.claves)
+        self._n[:m] += np.bincount(cod, minlength=m)
+        self._n_valido[:m] += np.bincount(cod[valido], minlength=m)
+        self._suma[:m] += np.bincount(cod[valido], weights=des[valido], minlength=m)
+        self._suma_abs[:m] += np.bincount(cod[valido], weights=np.abs(des[valido]), minlength=m)
+        if fechas is not None and len(fechas):
+            f = pd.to_datetime(fechas, errors="coerce").max()
+            if pd.notna(f) and (self.hasta is None or f > self.hasta):
+                self.hasta = f
+
+    # -- lectura
+
+    def foto(self, hasta: Optional[pd.Timestamp] = None) -> FotoPerfil:
+        """Copia inmutable del estado actual (O(nº de productos))."""
+        m = len(self.claves)
+        return FotoPerfil(
+            claves=tuple(self.claves),
+            n=self._n[:m].copy(), n_valido=self._n_valido[:m].copy(),
+            suma=self._suma[:m].copy(), suma_abs=self._suma_abs[:m].copy(),
+            min_n=self.min_n, prior_strength=self.prior_strength,
+            hasta=hasta if hasta is not None else self.hasta,
+        )
+
+    # -- persistencia
+
+    def guardar(self, path: Union[str, Path]) -> Path:
+        """
+        Estado en un .npz (sin pickle): claves como texto + tipo de cada clave (texto, entero o
+        float) y máscara de clave nula, para que al cargar sigan siendo las mismas claves.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        m = len(self.claves)
+        with open(path, "wb") as fh:
+            np.savez(
+                fh,
+                claves=np.asarray(["" if k is None else str(k) for k in self.claves], dtype=str),
+                clave_tipo=np.asarray([_tipo_clave(k) for k in self.claves], dtype=str),
+                clave_nula=np.asarray([k is None for k in self.claves], dtype=bool),
+                n=self._n[:m], n_valido=self._n_valido[:m], suma=self._suma[:m], suma_abs=self._suma_abs[:m],
+                parametros=np.asarray([self.min_n, self.prior_strength], dtype=np.float64),
+                hasta=np.asarray(str(self.hasta.date()) if self.hasta is not None else ""),
+            )
+        return path
+
+    @classmethod
+    def cargar(cls, path: Union[str, Path]) -> "PerfilProductos":
+        with np.load(path, allow_pickle=False) as z:
+            min_n, prior = z["parametros"]
+            perfil = cls(min_n=int(min_n), prior_strength=float(prior), capacidad=max(64, len(z["n"])))
+            # ficheros sin clave_tipo: claves de texto
+            tipos = z["clave_tipo"].tolist() if "clave_tipo" in z.files else ["s"] * len(z["claves"])
+            for k, t, nula in zip(z["claves"].tolist(), tipos, z["clave_nula"]):
+                perfil.id_denso(None if nula else _TIPOS_CLAVE[t](k))
+            m = len(perfil.claves)
+            perfil._n[:m], perfil._n_valido[:m] = z["n"], z["n_valido"]
+            perfil._suma[:m], perfil._suma_abs[:m] = z["suma"], z["suma_abs"]
+            hasta = str(z["hasta"])
+            perfil.hasta = pd.Timestamp(hasta) if hasta else None
+        return perfil
+
+
+# 3) Construcción desde el histórico con cortes temporales
+
+def perfiles_por_corte(df: pd.DataFrame,
+                       cortes: Sequence[pd.Timestamp],
+                       *,
+                       prod_col: str = "id_producto",
+                       des_col: str = "desajuste",
+                       fecha_col: str = "fecha_item",
+                       min_n: int = MIN_N,
+                       prior_strength: float = PRIOR_STRENGTH,
+                       perfil: Optional[PerfilProductos] = None) -> Tuple[Dict[pd.Timestamp, FotoPerfil], PerfilProductos]:
+    """
+    Una sola pasada por el histórico: foto del perfil con los ítems de fecha < corte para cada
+    corte (≡ add_product_profile_features sobre ese tramo). Devuelve también el almacén
+    actualizado con todas las filas con fecha, para seguir sumando ítems nuevos.
+    """
+    perfil = perfil if perfil is not None else PerfilProductos(min_n=min_n, prior_strength=prior_strength)
+    fechas = pd.to_datetime(df[fecha_col], errors="coerce")
+    fotos: Dict[pd.Timestamp, FotoPerfil] = {}
+    desde = None
+    for corte in sorted(pd.Timestamp(c) for c in cortes):
+        m = (fechas < corte) if desde is None else ((fechas >= desde) & (fechas < corte))
+        perfil.actualizar_lote(df.loc[m, prod_col], df.loc[m, des_col], fechas[m])
+        fotos[corte] = perfil.foto(hasta=corte)
+        desde = corte
+    resto = fechas.notna() if desde is None else (fechas >= desde)
+    perfil.actualizar_lote(df.loc[resto, prod_col], df.loc[resto, des_col], fechas[resto])
+    return fotos, perfil
+
+def perfil_desde_items(df: pd.DataFrame,
+                       *,
+                       prod_col: str = "id_producto",
+                       des_col: str = "desajuste",
+                       min_n: int = MIN_N,
+                       prior_strength: float = PRIOR_STRENGTH) -> FotoPerfil:
+    """Foto con todas las filas de df (sin cortes)."""
+    perfil = PerfilProductos(min_n=min_n, prior_strength=prior_strength)
+    perfil.actualizar_lote(df[prod_col], df[des_col])
+    return perfil.foto()
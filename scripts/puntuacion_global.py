@@ -0,0 +1,262 @@
+# puntuacion_global.py
+# Autor: proyecto "ropa"
+# Objetivo: p_dev_global (modelo modelos/devoluciones/xgb_final.json) para todos los ítems en
+# streaming, con memoria acotada:
+#   - X_train/X_test.parquet leídos por lotes (iter_batches), solo las columnas del modelo;
+#     el índice (train_index/test_index.parquet) se relee al mismo tamaño de lote
+#   - Cada lote se copia desde Arrow a un buffer float32 reutilizable (sin DataFrame ni DMatrix)
+#   - Pool de procesos con el modelo cargado una vez por worker y como mucho 2 lotes por
+#     worker en vuelo: la memoria no depende del tamaño de la tabla
+#   - Salida Parquet escrita lote a lote (ids + p_dev_global + calibradas), publicada al final
+
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import json
+import os
+import uuid
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from almacen import COMPRESION, DATA_DIR, ROOT_DIR
+
+
+# 0) Rutas y parámetros
+
+MODEL_DIR        = ROOT_DIR / "modelos" / "devoluciones"
+MODELO           = MODEL_DIR / "xgb_final.json"
+COLUMNAS_JSON    = MODEL_DIR / "metadata" / "cols_final.json"
+CALIBRACION_JSON = MODEL_DIR / "calibracion.json"
+PROCESSED_DIR    = DATA_DIR / "processed" / "devoluciones"
+
+FUENTES = [
+    (PROCESSED_DIR / "X_train.parquet", PROCESSED_DIR / "train_index.parquet"),
+    (PROCESSED_DIR / "X_test.parquet",  PROCESSED_DIR / "test_index.parquet"),
+]
+COLUMNAS_ID = ["fecha_compra", "ticket_id", "item_id", "customer_id", "devuelto"]
+
+FILAS_POR_LOTE = 65_536  # buffer por worker: FILAS_POR_LOTE × nº columnas × 4 B
+LOTES_EN_VUELO = 2       # por worker
+
+
+# 1) Calibración (opcional)
+
+@dataclass(frozen=True)
+class Calibracion:
+    """Platt sobre el logit de p_raw y/o isotónica por puntos de corte (np.interp, clip)."""
+    platt_coef: Optional[float] = None
+    platt_intercept: Optional[float] = None
+    platt_eps: float = 1e-6
+    iso_x: Optional[np.ndarray] = None
+    iso_y: Optional[np.ndarray] = None
+
+    def aplicar(self, p_raw: np.ndarray) -> Dict[str, np.ndarray]:
+        """Columnas calibradas (p_dev_global_platt, p_dev_global_iso) para p_raw."""
+        out: Dict[str, np.ndarray] = {}
+        if self.platt_coef is not None:
+            p = np.clip(np.asarray(p_raw, dtype=np.float64), self.platt_eps, 1 - self.platt_eps)
+            z = self.platt_coef * np.log(p / (1 - p)) + self.platt_intercept
+            out["p_dev_global_platt"] = (1.0 / (1.0 + np.exp(-z))).astype(np.float32)
+        if self.iso_x is not None:
+            out["p_dev_global_iso"] = np.interp(p_raw, self.iso_x, self.iso_y).astype(np.float32)
+        return out
+
+    def columnas(self) -> List[str]:
+        return list(self.aplicar(np.array([0.5])).keys())
+
+    def guardar_json(self, path: Union[str, Path] = CALIBRACION_JSON) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        d = {
+            "platt": None if self.platt_coef is None else
+                     {"coef": self.platt_coef, "intercept": self.platt_intercept, "eps": self.platt_eps},
+            "isotonic": None if self.iso_x is None else
+                        {"x": np.asarray(self.iso_x).tolist(), "y": np.asarray(self.iso_y).tolist()},
+        }
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(d, fh, indent=1)
+        return path
+
+    @classmethod
+    def desde_json(cls, path: Union[str, Path] = CALIBRACION_JSON) -> "Calibracion":
+        with open(path, "r", encoding="utf-8") as fh:
+            d = json.load(fh)
+        pl, iso = d.get("platt"), d.get("isotonic")
+        return cls(
+            platt_coef=None if pl is None else float(pl["coef"]),
+            platt_intercept=None if pl is None else float(pl["intercept"]),
+            platt_eps=1e-6 if pl is None else float(pl["eps"]),
+            iso_x=None if iso is None else np.asarray(iso["x"], dtype=np.float64),
+            iso_y=None if iso is None else np.asarray(iso["y"], dtype=np.float64),
+        )
+
+def ajustar_calibracion(p_raw: np.ndarray, y: np.ndarray, *, eps: float = 1e-6) -> Calibracion:
+    """Ajusta Platt (LogisticRegression sobre el logit) e isotónica como en recomendador_tallas."""
+    from sklearn.isotonic import IsotonicRegression
+    from sklearn.linear_model import LogisticRegression
+
+    p = np.clip(np.asarray(p_raw, dtype=np.float64), eps, 1 - eps)
+    z = np.log(p / (1 - p)).reshape(-1, 1)
+    platt = LogisticRegression(max_iter=2000, solver="lbfgs").fit(z, y)
+    iso = IsotonicRegression(out_of_bounds="clip").fit(p_raw, y)
+    return Calibracion(
+        platt_coef=float(platt.coef_.ravel()[0]), platt_intercept=float(platt.intercept_.ravel()[0]), platt_eps=eps,
+        iso_x=np.asarray(iso.X_thresholds_, dtype=np.float64), iso_y=np.asarray(iso.y_thresholds_, dtype=np.float64),
+    )
+
+
+# 2) Worker: modelo y buffer cargados una vez por proceso
+
+_ESTADO: Dict[str, object] = {}
+
+def _inicializar(ruta_modelo: str, columnas: List[str], iteraciones: Optional[int], motor: str, filas: int) -> None:
+    """Carga el modelo y reserva el buffer (initializer del pool, o en el propio proceso)."""
+    if motor == "numpy":
+        from arboles_numpy import cargar_bosque
+        # None = todos los árboles, como booster.predict sin iteration_range
+        modelo = cargar_bosque(ruta_modelo, iteraciones=iteraciones if iteraciones else 1 << 30)
+        if modelo.n_features != len(columnas):
+            raise ValueError(f"El modelo espera {modelo.n_features} columnas y se pasan {len(columnas)}")
+    else:
+        import xgboost as xgb
+        modelo = xgb.Booster()
+        modelo.load_model(ruta_modelo)
+        if modelo.feature_names and list(modelo.feature_names) != list(columnas):
+            raise ValueError("Las columnas no coinciden con feature_names del modelo (mismo orden)")
+    _ESTADO.update(
+        modelo=modelo, motor=motor, columnas=list(columnas),
+        rango=(0, int(iteraciones) if iteraciones else 0),
+        buffer=np.empty((filas, len(columnas)), dtype=np.float32),
+    )
+
+def codificar_lote(lote: pa.RecordBatch, buffer: np.ndarray) -> np.ndarray:
+    """Copia las columnas del lote (en orden) al buffer float32; nulos → NaN. Devuelve la vista usada."""
+    n = lote.num_rows
+    X = buffer[:n]
+    for j in range(lote.num_columns):
+        X[:, j] = lote.column(j).cast(pa.float32(), safe=False).to_numpy(zero_copy_only=False)
+    return X
+
+def _puntuar_lote(lote: pa.RecordBatch) -> np.ndarray:
+    X = codificar_lote(lote, _ESTADO["buffer"])
+    if _ESTADO["motor"] == "numpy":
+        return _ESTADO["modelo"].predecir(X)
+    return _ESTADO["modelo"].inplace_predict(X, iteration_range=_ESTADO["rango"], missing=np.nan)
+
+
+# 3) Lectura alineada
+
+def _lotes_alineados(ruta_x: Path, ruta_idx: Path, columnas: List[str], ids: List[str], extra: List[str],
+                     filas: int) -> Iterator[Tuple[pa.RecordBatch, pa.Table]]:
+    """(lote de X con las columnas del modelo, filas del índice + columnas extra de X) del mismo tamaño."""
+    fx, fi = pq.ParquetFile(ruta_x), pq.ParquetFile(ruta_idx)
+    if fx.metadata.num_rows != fi.metadata.num_rows:
+        raise ValueError(f"{ruta_x.name} ({fx.metadata.num_rows}) y {ruta_idx.name} ({fi.metadata.num_rows}) no coinciden en filas.")
+    faltan = [c for c in columnas + extra if c not in fx.schema_arrow.names]
+    if faltan:
+        raise ValueError(f"{ruta_x.name} no tiene columnas del modelo: {faltan[:10]}")
+
+    ids_presentes = [c for c in ids if c in fi.schema_arrow.names]
+    it_idx = fi.iter_batches(batch_size=filas, columns=ids_presentes)
+    pendiente = pa.schema([fi.schema_arrow.field(c) for c in ids_presentes]).empty_table()
+    for lote in fx.iter_batches(batch_size=filas, columns=columnas + extra):
+        n = lote.num_rows
+        while pendiente.num_rows < n:
+            pendiente = pa.concat_tables([pendiente, pa.Table.from_batches([next(it_idx)])], promote_options="default")
+        meta = pendiente.slice(0, n)
+        pendiente = pendiente.slice(n)
+        for c in extra:
+            meta = meta.append_column(c, lote.column(lote.schema.get_field_index(c)))
+        yield lote.select(columnas), meta
+
+
+# 4) Etapa completa
+
+def columnas_modelo(path: Union[str, Path] = COLUMNAS_JSON) -> List[str]:
+    """Columnas del modelo global en su orden (cols_final.json)."""
+    with open(path, "r", encoding="utf-8") as fh:
+        return list(json.load(fh))
+
+def iteraciones_modelo(path: Union[str, Path] = MODELO) -> Optional[int]:
+    """best_iteration + 1 guardado en el modelo (lo que usa XGBClassifier.predict_proba), o None."""
+    with open(path, "r", encoding="utf-8") as fh:
+        best = json.load(fh)["learner"].get("attributes", {}).get("best_iteration")
+    return int(best) + 1 if best is not None else None
+
+def puntuar_items(destino: Union[str, Path],
+                  fuentes: Sequence[Tuple[Union[str, Path], Union[str, Path]]] = FUENTES,
+                  *,
+                  modelo: Union[str, Path] = MODELO,
+                  columnas: Optional[Sequence[str]] = None,
+                  iteraciones: Optional[int] = None,
+                  calibracion: Optional[Calibracion] = None,
+                  columnas_id: Sequence[str] = COLUMNAS_ID,
+                  columnas_x: Sequence[str] = (),
+                  procesos: int = 1,
+                  filas: int = FILAS_POR_LOTE,
+                  motor: str = "xgboost") -> int:
+    """
+    Puntúa cada (X.parquet, índice.parquet) de `fuentes` en orden y escribe en `destino` (Parquet):
+    columnas_id presentes en el índice + columnas_x copiadas de X + p_dev_global (+ calibradas).
+    `iteraciones` None = todos los árboles (booster.predict por defecto). Devuelve nº de filas.
+    """
+    destino = Path(destino)
+    columnas = list(columnas) if columnas is not None else columnas_modelo()
+    extra = list(columnas_x)
+    args = (str(modelo), columnas, iteraciones, motor, int(filas))
+
+    tmp = destino.with_name(f".{destino.name}.{uuid.uuid4().hex[:8]}")
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    escritor: Optional[pq.ParquetWriter] = None
+    n_total = 0
+
+    def _escribir(meta: pa.Table, p: np.ndarray) -> None:
+        nonlocal escritor, n_total
+        tabla = meta.append_column("p_dev_global", pa.array(np.asarray(p, dtype=np.float32)))
+        if calibracion is not None:
+            for c, v in calibracion.aplicar(p).items():
+                tabla = tabla.append_column(c, pa.array(v))
+        if escritor is None:
+            escritor = pq.ParquetWriter(tmp, tabla.schema, compression=COMPRESION)
+        escritor.write_table(tabla.cast(escritor.schema))
+        n_total += tabla.num_rows
+
+    lotes = (
+        par
+        for ruta_x, ruta_idx in fuentes
+        for par in _lotes_alineados(Path(ruta_x), Path(ruta_idx), columnas, list(columnas_id), extra, filas)
+    )
+    try:
+        if procesos > 1:
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar, initargs=args) as ex:
+                en_vuelo: deque = deque()
+                for lote, meta in lotes:
+                    en_vuelo.append((ex.submit(_puntuar_lote, lote), meta))
+                    if len(en_vuelo) >= LOTES_EN_VUELO * procesos:
+                        fut, m = en_vuelo.popleft()
+                        _escribir(m, fut.result())
+                while en_vuelo:
+                    fut, m = en_vuelo.popleft()
+                    _escribir(m, fut.result())
+        else:
+            _inicializar(*args)
+            for lote, meta in lotes:
+                _escribir(meta, _puntuar_lote(lote))
+    except BaseException:
+        if escritor is not None:
+            escritor.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        _ESTADO.clear()
+
+    if escritor is None:
+        raise ValueError("No hay filas que puntuar")
+    escritor.close()
+    os.replace(tmp, destino)
+    return n_total
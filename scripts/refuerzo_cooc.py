@@ -0,0 +1,217 @@
+# refuerzo_cooc.py
+# Autor: proyecto "ropa"
+# Objetivo: reforzar co-ocurrencias A→B (lift objetivo) con swaps puros de bundles:
+#   - Por bloque (ym, o ym+canal): matriz entera ticket × categoría con conteos de filas,
+#     actualizada en cada swap → nA, nB, nAB y lift en O(1)
+#   - Candidatos (tickets con A sin B / con B sin A) elegidos por lotes y vectorizados;
+#     el lote se corta en el swap exacto en que se alcanza el objetivo
+#   - Los bundles no se mueven fila a fila: se acumula una permutación y se aplica al final
+#   - Bloques independientes (filas disjuntas) → reparto opcional entre procesos
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# 0) Parámetros
+
+LOTE = 256  # swaps candidatos por iteración
+
+Regla = Tuple[str, str, float]  # (A, B, lift objetivo)
+
+
+# 1) Lift y estructura del bloque
+
+def lift(nAB: float, nA: float, nB: float, N: float) -> float:
+    """lift(A→B) = P(B|A) / P(B); NaN si A o B no aparecen."""
+    if nA == 0 or nB == 0 or N == 0:
+        return np.nan
+    return (nAB / nA) / (nB / N)
+
+def _conteos(tick: np.ndarray, cat: np.ndarray, T: int, K: int) -> np.ndarray:
+    """M[t, c] = filas del ticket t con categoría c (cat < 0 no cuenta)."""
+    v = cat >= 0
+    return np.bincount(tick[v] * K + cat[v], minlength=T * K).reshape(T, K).astype(np.int32)
+
+def _elegir_filas(rng: np.random.Generator,
+                  ts: np.ndarray,
+                  elegible: np.ndarray,
+                  orden: np.ndarray,
+                  inicio: np.ndarray,
+                  e: np.ndarray) -> np.ndarray:
+    """Una fila elegible al azar de cada ticket de `ts` (todos con e[t] > 0)."""
+    largos = inicio[ts + 1] - inicio[ts]
+    seg = np.repeat(np.arange(len(ts)), largos)
+    pos = np.arange(int(largos.sum())) - np.repeat(np.cumsum(largos) - largos, largos) + np.repeat(inicio[ts], largos)
+    filas = orden[pos]
+    el = elegible[filas]
+    u = (rng.random(len(ts)) * e[ts]).astype(np.int64)
+    rango = np.cumsum(el) - np.repeat(np.cumsum(e[ts]) - e[ts], largos) - 1
+    return filas[el & (rango == u[seg])]
+
+
+# 2) Un bloque
+
+def _reforzar_bloque(tick: np.ndarray,
+                     cat: np.ndarray,
+                     activo: np.ndarray,
+                     reglas: Sequence[Tuple[int, int, float]],
+                     K: int,
+                     semilla: Sequence[int],
+                     solo_multicat: bool,
+                     max_swaps: Optional[int],
+                     tiempo_max_s: Optional[float],
+                     lote: int) -> Tuple[np.ndarray, List[Dict[str, object]]]:
+    """
+    Aplica las reglas (códigos de categoría) en orden sobre un bloque. Devuelve la
+    permutación local de bundles (fila ← fila origen) y una fila de resumen por regla.
+    """
+    rng = np.random.default_rng(list(semilla))
+    cat = cat.copy()
+    n = len(cat)
+    perm = np.arange(n)
+    T = int(tick.max()) + 1 if n else 0
+    orden = np.argsort(tick, kind="stable")
+    inicio = np.searchsorted(tick[orden], np.arange(T + 1))
+    M = _conteos(tick, cat, T, K)
+    # universo de tickets fijo para todo el bloque (multi-categoría si se pide)
+    U = ((M > 0).sum(axis=1) >= 2) if solo_multicat else np.ones(T, dtype=bool)
+    N = int(U.sum())
+
+    out: List[Dict[str, object]] = []
+    for a, b, objetivo in reglas:
+        if a < 0 or b < 0 or a == b:
+            out.append({"lift0": np.nan, "lift1": np.nan, "swaps": 0, "status": "skip(no_cat)"})
+            continue
+        if N == 0:
+            out.append({"lift0": np.nan, "lift1": np.nan, "swaps": 0, "status": "skip(no_tickets)"})
+            continue
+
+        PA, PB = (M[:, a] > 0) & U, (M[:, b] > 0) & U
+        nA, nB, nAB = int(PA.sum()), int(PB.sum()), int((PA & PB).sum())
+        if nA == 0 or nB == 0:  # A o B no están en el bloque
+            out.append({"lift0": np.nan, "lift1": np.nan, "swaps": 0, "status": "skip(no_cat)"})
+            continue
+        l0 = lift(nAB, nA, nB, N)
+        if l0 >= objetivo:
+            out.append({"lift0": l0, "lift1": l0, "swaps": 0, "status": "already"})
+            continue
+
+        t0 = time.perf_counter()
+        swaps, estado = 0, "partial"
+        while True:
+            if max_swaps is not None and swaps >= max_swaps:
+                break
+            if tiempo_max_s is not None and time.perf_counter() - t0 >= tiempo_max_s:
+                break
+            # filas que pueden salir del ticket A (ni A ni B) y filas B que pueden salir del ticket B
+            el_a = activo & (cat >= 0) & (cat != a) & (cat != b)
+            el_b = activo & (cat == b)
+            e_a = np.bincount(tick[el_a], minlength=T)
+            e_b = np.bincount(tick[el_b], minlength=T)
+            PA, PB = (M[:, a] > 0) & U, (M[:, b] > 0) & U
+            tA = np.flatnonzero(PA & ~PB & (e_a > 0))
+            tB = np.flatnonzero(PB & ~PA & (e_b > 0))
+            k = min(len(tA), len(tB), lote, (max_swaps - swaps) if max_swaps is not None else lote)
+            if k == 0:
+                estado = "no_capacity" if swaps == 0 else "partial"
+                break
+
+            ta = rng.choice(tA, size=k, replace=False)
+            tb = rng.choice(tB, size=k, replace=False)
+            # cada swap: ta gana B (nAB+1, nB+1); tb pierde B si era su única fila B
+            pierde = (M[tb, b] == 1).astype(np.int64)
+            nAB_k = nAB + np.arange(1, k + 1)
+            nB_k = nB + np.arange(1, k + 1) - np.cumsum(pierde)
+            alcanza = np.flatnonzero(nAB_k * N >= objetivo * nA * nB_k)
+            if len(alcanza):
+                k = int(alcanza[0]) + 1
+                ta, tb = ta[:k], tb[:k]
+                estado = "target"
+
+            ia = _elegir_filas(rng, ta, el_a, orden, inicio, e_a)
+            ib = _elegir_filas(rng, tb, el_b, orden, inicio, e_b)
+            o = cat[ia]
+            perm[ia], perm[ib] = perm[ib], perm[ia]
+            cat[ia], cat[ib] = b, o
+            # tickets distintos dentro del lote → índices sin repetición
+            M[ta, o] -= 1
+            M[ta, b] += 1
+            M[tb, b] -= 1
+            M[tb, o] += 1
+            nAB, nB = int(nAB_k[k - 1]), int(nB_k[k - 1])
+            swaps += k
+            if estado == "target":
+                break
+
+        out.append({"lift0": l0, "lift1": lift(nAB, nA, nB, N), "swaps": swaps, "status": estado})
+    return perm, out
+
+def _bloque_worker(args: tuple) -> Tuple[np.ndarray, List[Dict[str, object]]]:
+    return _reforzar_bloque(*args)
+
+
+# 3) Todos los bloques
+
+def reforzar_cooc(df: pd.DataFrame,
+                  claves: Sequence[str],
+                  reglas: Sequence[Regla],
+                  *,
+                  ticket_col: str = "ticket_id",
+                  cat_col: str = "_cat_norm",
+                  activo: Optional[np.ndarray] = None,
+                  solo_multicat: bool = False,
+                  max_swaps: Optional[int] = None,
+                  tiempo_max_s: Optional[float] = None,
+                  lote: int = LOTE,
+                  semilla: int = 42,
+                  procesos: int = 1) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Refuerza cada regla (A, B, lift objetivo) dentro de cada bloque de `claves` con swaps
+    entre tickets del mismo bloque. `activo` (bool por fila) excluye filas del swap (p. ej.
+    producto fuera de calendario). No modifica `df`: devuelve la permutación global de
+    filas (aplicar con `aplicar_permutacion`) y el resumen claves + A, B, target, lift0,
+    lift1, swaps, status (skip(no_cat) | skip(no_tickets) | already | no_capacity | target |
+    partial). Sin `tiempo_max_s` el resultado no depende de `procesos`.
+    """
+    claves = list(claves)
+    cats = np.array(sorted(c for c in df[cat_col].dropna().unique().tolist() if c != ""), dtype=object)
+    K = len(cats)
+    cod_cat = pd.Categorical(df[cat_col], categories=cats).codes.astype(np.int64)
+    pos_cat = {c: i for i, c in enumerate(cats.tolist())}
+    reglas_cod = [(pos_cat.get(A, -1), pos_cat.get(B, -1), float(t)) for A, B, t in reglas]
+    activo = np.ones(len(df), dtype=bool) if activo is None else np.asarray(activo, dtype=bool)
+    cod_ticket = pd.factorize(df[ticket_col])[0]
+
+    bloques = sorted(df.groupby(claves, sort=True).indices.items())
+    tareas = []
+    for i, (_, pos) in enumerate(bloques):
+        tick = pd.factorize(cod_ticket[pos])[0]
+        tareas.append((tick, cod_cat[pos], activo[pos], reglas_cod, K, (semilla, i),
+                       solo_multicat, max_swaps, tiempo_max_s, lote))
+
+    if procesos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as ex:
+            res = list(ex.map(_bloque_worker, tareas, chunksize=max(1, len(tareas) // (4 * procesos))))
+    else:
+        res = [_bloque_worker(t) for t in tareas]
+
+    perm = np.arange(len(df))
+    filas: List[Dict[str, object]] = []
+    for (clave, pos), (perm_local, resumen) in zip(bloques, res):
+        perm[pos] = pos[perm_local]
+        clave = clave if isinstance(clave, tuple) else (clave,)
+        for (A, B, t), r in zip(reglas, resumen):
+            filas.append({**dict(zip(claves, clave)), "A": A, "B": B, "target": float(t), **r})
+    return perm, pd.DataFrame(filas, columns=claves + ["A", "B", "target", "lift0", "lift1", "swaps", "status"])
+
+def aplicar_permutacion(df: pd.DataFrame, perm: np.ndarray, columnas: Sequence[str]) -> pd.DataFrame:
+    """Mueve `columnas` según `perm` (fila i ← fila perm[i]); el resto de columnas no cambia."""
+    df = df.copy()
+    for c in columnas:
+        df[c] = df[c].iloc[perm].array
+    return df
@@ -0,0 +1,317 @@
+# servicio_tallas.py
+# Autor: proyecto "ropa"
+# Objetivo: recomendador de tallas en proceso (checkout) sobre modelos/xgb_devoluciones/:
+#   - Artefactos cargados una sola vez (paquete_modelo: paquete mmap si existe, si no pickles):
+#     booster, vocabularios one-hot, puntos de corte isotónicos (np.interp) y perfil por producto
+#   - Filas candidatas escritas directamente en un buffer NumPy preasignado con el layout del
+#     ColumnTransformer, sin DataFrame, sin transform y sin DMatrix
+#   - Una sola llamada a inplace_predict por petición o por micro-lote
+#   - motor="numpy": árboles evaluados con arboles_numpy (sin importar xgboost)
+#   - Mismas decisiones que recommend_sizes (recomendador_tallas.ipynb): candidatas ±max_step
+#     alrededor de la talla ideal, mínima p_dev calibrada e histéresis min_gain
+
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from paquete_modelo import cargar_modelo
+
+
+# 0) Rutas y espacio de tallas (mismos valores que el notebook)
+
+ROOT_DIR  = Path(__file__).resolve().parent.parent
+MODEL_DIR = ROOT_DIR / "modelos" / "xgb_devoluciones"
+
+ROPA_CATS = {"camiseta", "sudadera", "pantalon", "abrigo", "camisa"}
+TALLAS_ROPA = ["XS", "S", "M", "L", "XL"]
+TALLA_TO_IDX = {talla: i for i, talla in enumerate(TALLAS_ROPA)}
+
+ROPA_RANGES = {
+    "XS": {"h": (150, 165), "w": (40, 70)},
+    "S":  {"h": (158, 172), "w": (48, 80)},
+    "M":  {"h": (166, 180), "w": (58, 95)},
+    "L":  {"h": (174, 188), "w": (68, 115)},
+    "XL": {"h": (182, 210), "w": (78, 140)},
+}
+
+MAX_STEP = 2
+MIN_GAIN = 0.01
+MAX_LOTE = 256  # peticiones que caben en el buffer; lotes mayores se procesan por tramos
+
+
+# 1) Petición y respuesta
+
+@dataclass(frozen=True)
+class PeticionTalla:
+    """Datos de checkout: medidas del cliente, producto y talla elegida."""
+    altura_cm: float
+    peso_kg: float
+    id_producto: str
+    talla: str
+    categoria: Optional[str] = None  # si falta, se toma del catálogo del servicio
+
+@dataclass(frozen=True)
+class RecomendacionTalla:
+    talla: str
+    talla_ideal: str
+    talla_reco: str
+    talla_final: str
+    p_dev_actual: float
+    p_dev_reco: float
+    p_dev_final: float
+    delta_p: float
+    cambia_talla: bool
+    candidatas: Tuple[Tuple[str, float], ...]  # (talla, p_dev) por candidata
+
+
+# 2) Utilidades
+
+def _normaliza(valor) -> Optional[str]:
+    """Sin acentos, minúsculas y sin espacios extremos (normalize_text del notebook)."""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    valor = unicodedata.normalize("NFKD", str(valor))
+    return "".join(c for c in valor if not unicodedata.combining(c)).lower().strip()
+
+def _rangos() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    h = np.array([ROPA_RANGES[t]["h"] for t in TALLAS_ROPA], dtype=float)
+    w = np.array([ROPA_RANGES[t]["w"] for t in TALLAS_ROPA], dtype=float)
+    return h.mean(axis=1), w.mean(axis=1), h[:, 1] - h[:, 0], w[:, 1] - w[:, 0]
+
+_H_MID, _W_MID, _H_SPAN, _W_SPAN = _rangos()
+
+def talla_ideal_idx(altura_cm: np.ndarray, peso_kg: np.ndarray) -> np.ndarray:
+    """Índice de la talla ideal (misma métrica que infer_talla_ideal_ropa)."""
+    dh = (np.asarray(altura_cm, dtype=float)[:, None] - _H_MID[None, :]) / _H_SPAN[None, :]
+    dw = (np.asarray(peso_kg, dtype=float)[:, None] - _W_MID[None, :]) / _W_SPAN[None, :]
+    return np.argmin((dh ** 2) * 0.60 + (dw ** 2) * 0.40, axis=1)
+
+
+# 3) Servicio
+
+class RecomendadorTallas:
+    """
+    Recomendador de tallas para llamadas de baja latencia. Carga el modelo una vez y reutiliza
+    un buffer float32 (filas candidatas × columnas codificadas). No es seguro entre hilos:
+    una instancia por hilo o proceso.
+
+    Layout del buffer = salida de preprocess.pkl: one-hot de categoria e id_producto y después
+    las numéricas. El ColumnTransformer devuelve CSR (densidad < sparse_threshold), así que
+    el booster se entrenó con los ceros como ausentes: en el buffer los ceros van como NaN.
+
+    motor: "xgboost" (inplace_predict) o "numpy" (BosqueCompilado). La probabilidad cruda del
+    booster coincide a 1e-6; la p_dev calibrada puede diferir en un escalón de la isotónica
+    (np.interp sobre iso_x/iso_y) si la cruda cae justo en un punto de corte. Para comparar
+    motores, usar talla_final / cambia_talla, no p_dev.
+    """
+
+    def __init__(self,
+                 model_dir: Union[str, Path] = MODEL_DIR,
+                 categorias: Optional[Mapping[str, str]] = None,
+                 *,
+                 max_step: int = MAX_STEP,
+                 min_gain: float = MIN_GAIN,
+                 max_lote: int = MAX_LOTE,
+                 motor: str = "xgboost"):
+        if motor not in ("xgboost", "numpy"):
+            raise ValueError(f"motor desconocido: {motor}")
+        paquete = cargar_modelo(model_dir)
+        self.paquete = paquete
+
+        self.rango_arboles = (0, paquete.iteraciones)
+        self.motor = motor
+        self.booster = None
+        self._bosque = None
+        if motor == "numpy":
+            self._bosque = paquete.bosque()
+        else:
+            import xgboost as xgb
+            self.booster = xgb.Booster()
+            self.booster.load_model(paquete.ruta_booster)
+        self.max_step = int(max_step)
+        self.min_gain = float(min_gain)
+
+        # layout de columnas codificadas
+        self.num_features: List[str] = paquete.num_features
+        vocab_cat = [str(c) for c in paquete.vocabulario("categoria")]
+        vocab_prod = [str(p) for p in paquete.vocabulario("id_producto")]
+        self._col_cat = {c: i for i, c in enumerate(vocab_cat)}
+        self._col_prod = {p: len(vocab_cat) + i for i, p in enumerate(vocab_prod)}
+        self._col_num0 = len(vocab_cat) + len(vocab_prod)
+        self.n_columnas = self._col_num0 + len(self.num_features)
+
+        # perfil de producto (apply_prod_profile: desconocidos → medias globales de train)
+        gm = float(paquete.prod_meta["global_mean_des"])
+        self._perfil_defecto = (np.float32(gm), np.float32(abs(gm)), 0)
+        perfil = paquete.perfil()
+        self._perfil: Dict[str, Tuple[np.float32, np.float32, int]] = {
+            str(pid): (np.float32(m), np.float32(b), int(h))
+            for pid, m, b, h in zip(perfil["id_producto"], perfil["prod_mean_des_smooth"],
+                                    perfil["prod_bias_strength"], perfil["prod_has_history"])
+        }
+        self._categorias = {str(k): _normaliza(v) for k, v in (categorias or {}).items()}
+
+        # calibración isotónica (out_of_bounds="clip" ≡ np.interp)
+        self._iso_x = np.asarray(paquete.arrays["iso_x"], dtype=np.float64)
+        self._iso_y = np.asarray(paquete.arrays["iso_y"], dtype=np.float64)
+
+        self.max_lote = int(max_lote)
+        self._filas_por_peticion = 2 * self.max_step + 2  # candidatas + talla elegida
+        self._buffer = np.empty((self.max_lote * self._filas_por_peticion, self.n_columnas), dtype=np.float32)
+
+    # -- API
+
+    def recomendar(self, peticion: PeticionTalla) -> Optional[RecomendacionTalla]:
+        """Recomendación para una petición (None si la categoría no tiene tallas de ropa)."""
+        return self.recomendar_lote([peticion])[0]
+
+    def recomendar_lote(self, peticiones: Sequence[PeticionTalla]) -> List[Optional[RecomendacionTalla]]:
+        """Micro-lote: todas las filas candidatas de todas las peticiones en una llamada al modelo."""
+        out: List[Optional[RecomendacionTalla]] = []
+        for i in range(0, len(peticiones), self.max_lote):
+            out.extend(self._recomendar_tramo(peticiones[i:i + self.max_lote]))
+        return out
+
+    def puntuar_filas(self, X: np.ndarray) -> np.ndarray:
+        """p_dev calibrada (isotónica) para filas ya codificadas (ceros como NaN)."""
+        if self._bosque is not None:
+            p_raw = self._bosque.predecir(X)
+        else:
+            p_raw = self.booster.inplace_predict(X, iteration_range=self.rango_arboles, missing=np.nan)
+        return np.interp(p_raw, self._iso_x, self._iso_y).astype(np.float32)
+
+    # -- internos
+
+    def _categoria(self, p: PeticionTalla) -> str:
+        cat = _normaliza(p.categoria) if p.categoria is not None else self._categorias.get(str(p.id_producto))
+        if cat is None:
+            raise ValueError(f"Categoría desconocida para id_producto={p.id_producto}: pásala en la petición o en `categorias`")
+        return cat
+
+    def _recomendar_tramo(self, peticiones: Sequence[PeticionTalla]) -> List[Optional[RecomendacionTalla]]:
+        cats = [self._categoria(p) for p in peticiones]
+        validas = [i for i, c in enumerate(cats) if c in ROPA_CATS]
+        out: List[Optional[RecomendacionTalla]] = [None] * len(peticiones)
+        if not validas:
+            return out
+
+        n = len(validas)
+        ps = [peticiones[i] for i in validas]
+        h = np.array([p.altura_cm for p in ps], dtype=np.float64)
+        w = np.array([p.peso_kg for p in ps], dtype=np.float64)
+        sel = np.empty(n, dtype=np.int64)
+        for j, p in enumerate(ps):
+            t = str(p.talla).strip().upper()
+            if t not in TALLA_TO_IDX:
+                raise ValueError(f"Talla fuera del espacio de ropa: {p.talla!r}")
+            sel[j] = TALLA_TO_IDX[t]
+        ideal = talla_ideal_idx(h, w)
+
+        # filas: candidatas lo..hi de cada petición y al final su talla elegida
+        K = len(TALLAS_ROPA)
+        lo = np.maximum(ideal - self.max_step, 0)
+        n_cand = np.minimum(ideal + self.max_step, K - 1) - lo + 1
+        n_filas = n_cand + 1
+        req = np.repeat(np.arange(n), n_filas)
+        off = np.arange(int(n_filas.sum())) - np.repeat(np.cumsum(n_filas) - n_filas, n_filas)
+        es_cand = off < n_cand[req]
+        talla_idx = np.where(es_cand, lo[req] + off, sel[req])
+
+        # buffer: one-hot + numéricas (ceros → NaN, como en la matriz dispersa de entrenamiento)
+        m = len(req)
+        X = self._buffer[:m]
+        X.fill(np.nan)
+        filas_p = np.cumsum(n_filas) - n_filas
+        for j, (i, p) in enumerate(zip(validas, ps)):
+            a, b = filas_p[j], filas_p[j] + n_filas[j]
+            c = self._col_cat.get(cats[i])
+            if c is not None:
+                X[a:b, c] = 1.0
+            c = self._col_prod.get(str(p.id_producto))  # desconocido → sin one-hot (handle_unknown="ignore")
+            if c is not None:
+                X[a:b, c] = 1.0
+
+        perfil = np.array([self._perfil.get(str(p.id_producto), self._perfil_defecto) for p in ps], dtype=np.float64)
+        bmi = w / (h / 100.0) ** 2
+        desajuste = talla_idx - ideal[req]
+        valores = {
+            "altura_cm": h[req], "peso_kg": w[req], "bmi": bmi[req],
+            "talla_idx": talla_idx, "ideal_idx": ideal[req],
+            "desajuste": desajuste, "desajuste_abs": np.abs(desajuste),
+            "talla_extrema": ((talla_idx == 0) | (talla_idx == K - 1)).astype(np.int64),
+            "prod_mean_des_smooth": perfil[req, 0], "prod_bias_strength": perfil[req, 1],
+            "prod_has_history": perfil[req, 2],
+        }
+        for k, col in enumerate(self.num_features):
+            v = np.asarray(valores[col], dtype=np.float64)
+            X[:, self._col_num0 + k] = np.where(v == 0, np.nan, v)
+
+        p_dev = self.puntuar_filas(X)
+
+        # mejor candidata por petición (primera en orden de talla si hay empate)
+        P = np.full((n, 2 * self.max_step + 1), np.inf, dtype=np.float32)
+        P[req[es_cand], off[es_cand]] = p_dev[es_cand]
+        mejor = np.argmin(P, axis=1)
+        p_reco = P[np.arange(n), mejor]
+        p_actual = p_dev[~es_cand]
+
+        for j, i in enumerate(validas):
+            reco = TALLAS_ROPA[int(lo[j] + mejor[j])]
+            delta = float(np.float32(p_actual[j] - p_reco[j]))
+            cambia = delta >= self.min_gain and reco != TALLAS_ROPA[sel[j]]
+            final = reco if delta >= self.min_gain else TALLAS_ROPA[sel[j]]
+            p_final = float(p_reco[j]) if cambia else float(p_actual[j])
+            a = filas_p[j]
+            out[i] = RecomendacionTalla(
+                talla=TALLAS_ROPA[sel[j]],
+                talla_ideal=TALLAS_ROPA[int(ideal[j])],
+                talla_reco=reco,
+                talla_final=final,
+                p_dev_actual=float(p_actual[j]),
+                p_dev_reco=float(p_reco[j]),
+                p_dev_final=p_final,
+                delta_p=delta,
+                cambia_talla=bool(cambia),
+                candidatas=tuple((TALLAS_ROPA[int(lo[j] + k)], float(p_dev[a + k])) for k in range(int(n_cand[j]))),
+            )
+        return out
+
+
+# 4) Benchmark
+
+def medir_latencia(servicio: RecomendadorTallas,
+                   peticiones: Sequence[PeticionTalla],
+                   *,
+                   lotes: Sequence[int] = (1, 8, 32),
+                   calentamiento: int = 20) -> pd.DataFrame:
+    """
+    Latencia por llamada (p50/p99, ms) y throughput (peticiones/s) recorriendo `peticiones`
+    en llamadas de tamaño `lote` (1 = recomendar, >1 = recomendar_lote).
+    """
+    filas = []
+    for lote in lotes:
+        llamadas = [peticiones[i:i + lote] for i in range(0, len(peticiones) - lote + 1, lote)]
+        for grupo in llamadas[:calentamiento]:
+            servicio.recomendar_lote(grupo)
+        t = np.empty(len(llamadas))
+        for k, grupo in enumerate(llamadas):
+            t0 = time.perf_counter()
+            if lote == 1:
+                servicio.recomendar(grupo[0])
+            else:
+                servicio.recomendar_lote(grupo)
+            t[k] = time.perf_counter() - t0
+        filas.append({
+            "lote": int(lote),
+            "llamadas": len(llamadas),
+            "p50_ms": float(np.percentile(t, 50) * 1e3),
+            "p99_ms": float(np.percentile(t, 99) * 1e3),
+            "peticiones_s": float(lote * len(llamadas) / t.sum()),
+        })
+    return pd.DataFrame(filas)
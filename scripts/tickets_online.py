@@ -0,0 +1,164 @@
+# tickets_online.py
+# Autor: proyecto "ropa"
+# Objetivo: desagregar clientes (n_pedidos, n_items_comprados) en tickets online, por particiones:
+#   - Clientes repartidos por hash estable de customer_id (el mismo reparto que usa items_venta,
+#     así tickets e items de un cliente caen siempre en la misma partición)
+#   - RNG propio por cliente (_seeded_rng_from_id): el resultado no depende del orden de los
+#     clientes, del número de particiones ni de procesos
+#   - ticket_id asignado antes de repartir (T000001… en el orden de clientes.csv)
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import hashlib
+import random
+
+import numpy as np
+import pandas as pd
+
+
+# 0) Parámetros
+
+PARTICIONES = 16
+
+
+# 1) Aleatoriedad y reparto deterministas
+
+def _seeded_rng_from_id(u_id) -> random.Random:
+    # RNG determinista por cliente: el seed depende solo del id
+    h = hashlib.sha256(str(u_id).encode("utf-8")).hexdigest()
+    seed_int = int(h[:16], 16) % (2**31 - 1)
+    return random.Random(seed_int)
+
+def particion_estable(claves: pd.Series, n: int) -> np.ndarray:
+    """Partición 0..n-1 por clave (MD5 de str(clave)): estable entre ejecuciones y máquinas."""
+    raw = b"".join(hashlib.md5(str(k).encode("utf-8")).digest()[:8] for k in claves)
+    return (np.frombuffer(raw, dtype=">u8") % np.uint64(n)).astype(np.int64)
+
+
+# 2) Tickets de un cliente
+
+def _ticket_dates(fp: pd.Timestamp, fu: pd.Timestamp, k: int, rng: random.Random) -> list[pd.Timestamp]:
+    """
+    Genera las fechas de los tickets de un cliente:
+    - 1 pedido  -> fecha primera compra
+    - 2 pedidos -> primera y última compra
+    - ≥3        -> extremos + fechas internas repartidas de forma estable
+    """
+    if k <= 0:
+        return []
+
+    if pd.isna(fp) and pd.isna(fu):
+        base = pd.Timestamp.today().normalize()
+        return [base] * k
+
+    if pd.isna(fp):
+        fp = fu
+    if pd.isna(fu):
+        fu = fp
+
+    if k == 1:
+        return [fp]
+    if k == 2:
+        return sorted([fp, fu])
+
+    delta_days = max(int((fu - fp).days), 0)
+
+    if delta_days <= 1:
+        internas = [fp] * (k - 2)
+    else:
+        need = k - 2
+        if delta_days - 1 >= need:
+            picks = sorted(rng.sample(range(1, delta_days), need))
+        else:
+            picks = list(range(1, delta_days))
+        internas = [fp + pd.Timedelta(days=d) for d in picks]
+        internas += [fp] * (need - len(internas))
+
+    return sorted([fp, fu] + internas)
+
+def _split_items(total_items: int, k_decl: int, rng: random.Random) -> tuple[list[int], int]:
+    """
+    Distribuye el total de ítems entre los tickets:
+    - Se garantiza al menos 1 ítem por ticket si hay suficientes ítems.
+    - Si los ítems son insuficientes, se reduce el nº real de tickets.
+    """
+    if k_decl <= 0:
+        return ([], 0)
+
+    if total_items <= 0:
+        return ([0] * k_decl, k_decl)
+
+    if total_items < k_decl:
+        return ([1] * total_items, total_items)
+
+    items = [1] * k_decl
+    remaining = total_items - k_decl
+    for _ in range(remaining):
+        items[rng.randrange(k_decl)] += 1
+    return (items, k_decl)
+
+def _tickets_particion(args: tuple) -> pd.DataFrame:
+    """Tickets de los clientes de una partición (seq = número de ticket global)."""
+    cids, fps, fus, ks, totales, seq0 = args
+    seq: List[int] = []
+    cust: List[object] = []
+    fechas_out: List[object] = []
+    n_items: List[int] = []
+    for cid, fp, fu, k_decl, total, s0 in zip(cids, fps, fus, ks, totales, seq0):
+        rng = _seeded_rng_from_id(cid)
+        items_per_ticket, k_real = _split_items(int(total), int(k_decl), rng)
+        fechas = _ticket_dates(fp, fu, k_real, rng)
+        for i in range(k_real):
+            seq.append(int(s0) + i)
+            cust.append(cid)
+            fechas_out.append(pd.Timestamp(fechas[i]).date())
+            n_items.append(int(items_per_ticket[i]))
+    return pd.DataFrame({"_seq": seq, "customer_id": cust, "fecha_ticket": fechas_out, "n_items": n_items})
+
+
+# 3) Todos los clientes
+
+def generar_tickets_online(clientes: pd.DataFrame,
+                           *,
+                           particiones: int = PARTICIONES,
+                           procesos: int = 1) -> pd.DataFrame:
+    """
+    Tickets online a partir de clientes (customer_id, fecha_primer_compra, fecha_ultima_compra,
+    n_pedidos, n_items_comprados). Invariantes: nº de tickets ≤ n_pedidos y suma de ítems =
+    n_items_comprados. Columnas: ticket_id, customer_id, canal, fecha_ticket, n_items (orden de
+    ticket_id). `procesos` > 1 reparte las particiones entre procesos.
+    """
+    c = clientes.loc[clientes["customer_id"].notna()].reset_index(drop=True)
+    fp = pd.to_datetime(c["fecha_primer_compra"], errors="coerce") if "fecha_primer_compra" in c else pd.Series(pd.NaT, index=c.index)
+    fu = pd.to_datetime(c["fecha_ultima_compra"], errors="coerce") if "fecha_ultima_compra" in c else pd.Series(pd.NaT, index=c.index)
+    k_decl = pd.to_numeric(c.get("n_pedidos", 0), errors="coerce").fillna(0).astype(int).to_numpy()
+    total = pd.to_numeric(c.get("n_items_comprados", 0), errors="coerce").fillna(0).astype(int).to_numpy()
+    k_decl = np.broadcast_to(k_decl, len(c))
+    total = np.broadcast_to(total, len(c))
+
+    # nº real de tickets (mismas reglas que _split_items) → numeración global antes de repartir
+    k_real = np.where(k_decl <= 0, 0, np.where(total <= 0, k_decl, np.minimum(total, k_decl)))
+    seq0 = np.cumsum(k_real) - k_real + 1
+    activos = np.flatnonzero(k_real > 0)
+
+    parte = particion_estable(c["customer_id"].iloc[activos], particiones)
+    tareas = []
+    for p in range(particiones):
+        pos = activos[parte == p]
+        if len(pos):
+            tareas.append((c["customer_id"].iloc[pos].tolist(), fp.iloc[pos].tolist(), fu.iloc[pos].tolist(),
+                           k_decl[pos].tolist(), total[pos].tolist(), seq0[pos].tolist()))
+
+    if procesos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as ex:
+            partes = list(ex.map(_tickets_particion, tareas))
+    else:
+        partes = [_tickets_particion(t) for t in tareas]
+
+    if not partes:
+        return pd.DataFrame(columns=["ticket_id", "customer_id", "canal", "fecha_ticket", "n_items"])
+    out = pd.concat(partes, ignore_index=True).sort_values("_seq", kind="stable", ignore_index=True)
+    out.insert(0, "ticket_id", [f"T{s:06d}" for s in out["_seq"]])
+    out.insert(2, "canal", "online")
+    return out.drop(columns="_seq")
@@ -0,0 +1,50 @@
+# test_enriquecimiento.py
+# Autor: proyecto "ropa"
+# Objetivo: muestreo_dos_pasos == bucle por fila choice(K, p=...) + choice(n) sobre el mismo
+# Generator (resultados y estado final), incluidos rechazos de Lemire y n = 1
+
+from __future__ import annotations
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from enriquecimiento import muestreo_dos_pasos
+
+
+def _probs(a: str, b: str) -> np.ndarray:
+    w = np.array([1.0 + "abcde".index(a), 2.0 + (b == "x"), 0.5, 1.0])
+    return w / w.sum()
+
+def _bucle(rng: np.random.Generator, A, B, tamanos):
+    out = []
+    for a, b in zip(A, B):
+        c = int(rng.choice(4, p=_probs(a, b)))
+        out.append((c, int(rng.choice(tamanos[c]))))
+    return out
+
+
+@pytest.mark.parametrize("tamanos, previos, n", [
+    ([4, 3, 2, 2], 0, 10_001),
+    ([4, 3, 2, 2], 1, 10_000),               # arranca con un uint32 guardado
+    ([3_000_000_000, 3, 1, 5], 0, 3_000),    # rechazos de Lemire y n = 1
+    ([2, 3_500_000_000, 7, 1], 1, 3_001),
+    ([4, 3, 2, 2], 1, 0),
+])
+def test_mismo_flujo_que_el_bucle(tamanos, previos, n):
+    g = np.random.default_rng(0)
+    A, B = g.choice(list("abcde"), n), g.choice(list("xyz"), n)
+    r1, r2 = np.random.default_rng(42), np.random.default_rng(42)
+    for _ in range(previos):
+        r1.integers(0, 7)
+        r2.integers(0, 7)
+
+    esperado = _bucle(r1, A, B, tamanos)
+    cat, elem = muestreo_dos_pasos(_probs, [pd.Series(A), pd.Series(B)], tamanos, r2)
+
+    assert list(zip(cat.tolist(), elem.tolist())) == esperado
+    assert r1.bit_generator.state == r2.bit_generator.state
@@ -0,0 +1,68 @@
+# test_items_venta.py
+# Autor: proyecto "ropa"
+# Objetivo: items_1 por particiones == pipeline secuencial (mismas filas, mismo orden),
+# incluidos tickets sin items que abren día
+
+from __future__ import annotations
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+import almacen
+import items_venta as iv
+
+
+def _datos(n_tickets: int = 2000, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    tickets = pd.DataFrame({
+        "ticket_id":    [f"T{i:06d}" for i in range(n_tickets)],
+        "customer_id":  [str(x) for x in rng.integers(0, 500, n_tickets)],
+        "canal":        "online",
+        "fecha_ticket": pd.Timestamp("2021-01-01") + pd.to_timedelta(rng.integers(0, 120, n_tickets), unit="D"),
+        "n_items":      rng.integers(0, 4, n_tickets),  # con tickets vacíos
+        "provincia":    "madrid",
+    })
+    # el primer ticket de varios días no tiene items
+    tickets.loc[tickets.groupby("fecha_ticket").head(1).index[::2], "n_items"] = 0
+    clientes = pd.DataFrame({"customer_id": [str(i) for i in range(500)], "provincia": "madrid"})
+    tiendas = pd.DataFrame({"store_id": ["S1"], "provincia": ["madrid"]})
+    nv = 40
+    variantes = pd.DataFrame({
+        "sku": [f"s{i}" for i in range(nv)], "id_producto": [f"p{i}" for i in range(nv)],
+        "categoría": rng.choice(list("ABC"), nv), "color": "c", "talla": "M",
+        "precio": 10.0, "coste bruto": 5.0, "lanzamiento": "2020-01-01",
+    })
+    promos = pd.DataFrame({
+        "promotion_id": ["P1"], "fecha_inicio": [pd.Timestamp("2021-02-01")],
+        "fecha_fin": [pd.Timestamp("2021-03-01")], "categoría": ["A"],
+        "descuento_pct": [0.2], "prioridad": [1],
+    })
+    return tickets, tiendas, variantes, promos, clientes
+
+def _secuencial(tickets, tiendas, variantes, promos) -> pd.DataFrame:
+    items = iv.expandir_tickets_a_items(tickets)
+    items["fecha_item"] = pd.to_datetime(items["fecha_item"])
+    items = iv.asignar_store_id_items(items, tiendas)
+    items = iv.asignar_sku_determinista(items, variantes)
+    items = iv.aplicar_promociones(items, promos)
+    return iv.calcular_economia_unitaria(items)[iv.COLUMNAS_ITEMS_1]
+
+
+@pytest.mark.parametrize("particiones", [1, 4])
+def test_items_1_particionado_igual_que_secuencial(tmp_path, monkeypatch, particiones):
+    monkeypatch.setattr(almacen, "ITEMS_DIR", tmp_path / "items")
+    tickets, tiendas, variantes, promos, clientes = _datos()
+    assert (tickets["n_items"] == 0).any()
+
+    esperado = _secuencial(tickets, tiendas, variantes, promos)
+    _, filas = iv.construir_items_1(tickets, tiendas, variantes, promos, clientes, particiones=particiones)
+    leido = almacen.leer_items("items_1")
+
+    assert filas == len(esperado)
+    assert leido["item_id"].tolist() == esperado["item_id"].tolist()
+    assert leido["sku"].tolist() == esperado["sku"].tolist()
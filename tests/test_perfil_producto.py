@@ -0,0 +1,45 @@
+# test_perfil_producto.py
+# Autor: proyecto "ropa"
+# Objetivo: PerfilProductos.guardar/cargar conserva la identidad de las claves (enteras,
+# texto, float, nula) y se puede seguir actualizando tras cargar
+
+from __future__ import annotations
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from perfil_producto import PerfilProductos
+
+
+@pytest.mark.parametrize("ids", [
+    [1, 2, 1],
+    ["P1", "P2", "P1"],
+    [1.5, 2.0, 1.5],
+    ["P1", None, "P1"],
+])
+def test_guardar_cargar_conserva_claves(tmp_path, ids):
+    perfil = PerfilProductos()
+    perfil.actualizar_lote(pd.Series(ids), pd.Series([0.5, -1.0, 1.0]))
+    perfil.guardar(tmp_path / "perfil.npz")
+
+    cargado = PerfilProductos.cargar(tmp_path / "perfil.npz")
+    assert cargado.claves == perfil.claves
+
+    # seguir sumando ítems: el producto ya conocido no se duplica
+    for p in (perfil, cargado):
+        p.actualizar_lote(pd.Series(ids[:1]), pd.Series([2.0]))
+    assert cargado.claves == perfil.claves
+    a, b = perfil.foto(), cargado.foto()
+    np.testing.assert_array_equal(a.n, b.n)
+    np.testing.assert_array_equal(a.suma, b.suma)
+
+def test_guardar_rechaza_claves_no_soportadas(tmp_path):
+    perfil = PerfilProductos()
+    perfil.actualizar(pd.Timestamp("2020-01-01"), 1.0)
+    with pytest.raises(TypeError):
+        perfil.guardar(tmp_path / "perfil.npz")